@@ -0,0 +1,101 @@
+"""Answers a file of questions with the NL to SQL pipeline, for reports that ask
+the same standard questions on every run.
+
+    python -m applications.batch_questions questions.txt -o results.jsonl
+
+All questions share one model client, one target database pool and the cached
+schema prompt, each question gets its own conversation history. The results are
+written as JSON lines while the questions complete, or to Parquet at the end when
+the output ends with .parquet.
+"""
+
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from autogen_core.models import ChatCompletionClient
+
+from fabric_sql.agents.compliance_agent import Agent as ComplianceAgent
+from fabric_sql.agents.sql_pipeline import SQLPipeline
+from fabric_sql.hosting import container
+from fabric_sql.protocols.i_chat_client import IChatClient
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+from fabric_sql.protocols.i_sql_cache import ISQLCache
+from fabric_sql.protocols.i_target_database import ITargetDatabase
+from fabric_sql.services.batch_runner import (
+    Answer,
+    BatchEnv,
+    BatchResult,
+    ResultWriter,
+    read_questions,
+    run_batch,
+    summarize,
+)
+
+
+def get_answer(llm_client: ChatCompletionClient) -> Answer:
+    async def answer(result: BatchResult) -> None:
+        pipeline = SQLPipeline(await ComplianceAgent().get_agent(llm_client))
+        try:
+            result.answer = await pipeline.run(result.question)
+            if pipeline.error:
+                # the answer only reports the failure, it is not a result.
+                raise QueryException(pipeline.error)
+        finally:
+            result.sql = pipeline.sql
+            result.generate_ms = pipeline.generate_ms
+            result.query_ms = pipeline.query_ms
+            result.repairs = pipeline.repairs
+
+    return answer
+
+
+async def main(questions_path: str, output: str, concurrency: int | None) -> None:
+    questions = read_questions(Path(questions_path))
+    concurrency = concurrency or container[BatchEnv].batch_concurrency
+    llm_client = container[IChatClient].get_model_client()
+
+    writer = ResultWriter(Path(output))
+    started = time.perf_counter()
+    try:
+        # one pool for all the questions, more questions at a time than it has
+        # connections only queue on the pool.
+        async with container[ITargetDatabase]:
+            results = await run_batch(
+                questions, get_answer(llm_client), concurrency, writer.write
+            )
+    finally:
+        writer.close()
+    print(summarize(results, time.perf_counter() - started))
+    print(container[ISQLCache].stats().summary())
+    print(f"Results written to {output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Answers the questions of a file with the NL to SQL pipeline."
+    )
+    parser.add_argument(
+        "questions",
+        help="text file with one question per line, or JSON lines with a "
+        "question field",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="batch_results.jsonl",
+        help="results file, .jsonl or .parquet (requires pyarrow)",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        help="questions answered at the same time, defaults to BATCH_CONCURRENCY",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    asyncio.run(main(args.questions, args.output, args.concurrency))
@@ -1,17 +1,38 @@
 import asyncio
+import signal
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Iterator, Literal, Sequence
 
 from autogen_agentchat.agents import UserProxyAgent
 from autogen_agentchat.base import TaskResult
 from autogen_agentchat.conditions import TextMentionTermination
+from autogen_agentchat.messages import (
+    BaseAgentEvent,
+    BaseChatMessage,
+    ModelClientStreamingChunkEvent,
+)
 from autogen_agentchat.teams import SelectorGroupChat
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
+from lagom.environment import Env
 
+from fabric_sql.agents.cached_sql_agent import extract_sql
 from fabric_sql.agents.compliance_agent import Agent as ComplianceAgent
 from fabric_sql.agents.db_query_agent import Agent as DbQueryAgent
+from fabric_sql.agents.sql_pipeline import SQLPipeline
 from fabric_sql.hosting import container
 from fabric_sql.protocols.i_chat_client import IChatClient
+from fabric_sql.protocols.i_sql_cache import ISQLCache
+from fabric_sql.protocols.i_target_database import ITargetDatabase
+from fabric_sql.protocols.i_turn_tracer import ITurnTracer
+
+
+class ChatAppEnv(Env):
+    # "deterministic" routes compliance agent -> db query agent -> user without a
+    # selector model call, "llm" lets the model pick every speaker and "pipeline"
+    # executes the compliance agent's SQL directly, without the db query agent.
+    chat_routing: Literal["deterministic", "llm", "pipeline"] = "deterministic"
 
-chat_client = container[IChatClient]
 
 selector_prompt = """Select an agent to perform task which best fits the task.
 
@@ -29,10 +50,71 @@ Only select one agent.
 """
 
 
-async def get_team(llm_client: AzureOpenAIChatCompletionClient) -> SelectorGroupChat:
-    compliance_agent = await ComplianceAgent().get_agent(llm_client)
-    db_query_agent = await DbQueryAgent().get_agent(llm_client)
-    user_proxy = UserProxyAgent("user_proxy", input_func=input)
+def get_speaker_router(
+    compliance_agent: str, db_query_agent: str, user_proxy: str
+) -> Callable[[Sequence[BaseAgentEvent | BaseChatMessage]], str | None]:
+    """Fixed speaker graph: user -> compliance agent -> db query agent -> user.
+    Returns None (fall back to the model based selection) when the last message
+    does not fit the graph.
+    """
+
+    def route(messages: Sequence[BaseAgentEvent | BaseChatMessage]) -> str | None:
+        chat_messages = [m for m in messages if isinstance(m, BaseChatMessage)]
+        if not chat_messages:
+            return None
+
+        last = chat_messages[-1]
+        if last.source in ("user", user_proxy):
+            return compliance_agent
+        if last.source == compliance_agent:
+            text = last.to_text().strip()
+            if text.upper() == "NONE":
+                return user_proxy
+            return db_query_agent if extract_sql(text) else None
+        if last.source == db_query_agent:
+            return user_proxy
+        return None
+
+    return route
+
+
+def get_input_func(tracer: ITurnTracer | None) -> Callable[[str], str]:
+    """The user proxy asks for the next message when the team finished a turn, so
+    its input marks the end of a turn and the start of the next one."""
+
+    def traced_input(prompt: str) -> str:
+        if tracer:
+            tracer.end_turn()
+        message = input(prompt)
+        if tracer:
+            tracer.start_turn(message)
+        return message
+
+    return traced_input
+
+
+async def get_team(
+    llm_client: ChatCompletionClient,
+    routing: Literal["deterministic", "llm"] = "deterministic",
+    stream: bool = False,
+    tracer: ITurnTracer | None = None,
+) -> SelectorGroupChat:
+    def get_client(name: str) -> ChatCompletionClient:
+        return tracer.wrap_client(llm_client, name) if tracer else llm_client
+
+    compliance_agent = await ComplianceAgent().get_agent(
+        get_client("compliance_agent"), stream
+    )
+    db_query_agent = await DbQueryAgent().get_agent(
+        get_client("db_query_agent"), stream
+    )
+    user_proxy = UserProxyAgent("user_proxy", input_func=get_input_func(tracer))
+
+    selector_func = (
+        get_speaker_router(compliance_agent.name, db_query_agent.name, user_proxy.name)
+        if routing == "deterministic"
+        else None
+    )
 
     termination = TextMentionTermination("TERMINATE")
     return SelectorGroupChat(
@@ -41,23 +123,134 @@ async def get_team(llm_client: AzureOpenAIChatCompletionClient) -> SelectorGroup
             db_query_agent,
             user_proxy,
         ],
-        model_client=llm_client,
+        model_client=get_client("selector"),
         termination_condition=termination,
         selector_prompt=selector_prompt,
+        selector_func=selector_func,
         allow_repeated_speaker=False,
     )
 
 
-async def main() -> None:
-    llm_client = chat_client.get_model_client()
-    team = await get_team(llm_client=llm_client)
+@contextmanager
+def cancel_on_interrupt(token: CancellationToken) -> Iterator[None]:
+    """Ctrl+C cancels the running turn, including the model generation, instead of
+    exiting the application."""
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGINT, token.cancel)
+    except NotImplementedError:  # no signal handlers on Windows event loops
+        yield
+        return
+
+    try:
+        yield
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+
+
+async def print_chunk(chunk: str) -> None:
+    print(chunk, end="", flush=True)
+
+
+async def print_stream(
+    stream: AsyncIterator[BaseAgentEvent | BaseChatMessage | TaskResult],
+    tracer: ITurnTracer | None = None,
+) -> None:
+    streamed_source = None
+    async for message in stream:
+        if isinstance(message, TaskResult) or message.source == "user_proxy":
+            continue
+        if tracer and message.source != "user":
+            tracer.observe(message.source)
+
+        if isinstance(message, ModelClientStreamingChunkEvent):
+            await print_chunk(message.content)
+            streamed_source = message.source
+        elif message.source == streamed_source:
+            # the complete message of the chunks printed above.
+            print()
+            streamed_source = None
+        else:
+            print(message.content)  # type: ignore
+
+
+async def run_pipeline(
+    llm_client: ChatCompletionClient, stream: bool, tracer: ITurnTracer
+) -> None:
+    pipeline = SQLPipeline(
+        await ComplianceAgent().get_agent(
+            tracer.wrap_client(llm_client, "compliance_agent"), stream
+        )
+    )
+
+    while (input_msg := input("Enter your message: ")).strip() != "TERMINATE":
+        token = CancellationToken()
+        tracer.start_turn(input_msg)
+        with cancel_on_interrupt(token), tracer.span("sql_pipeline", "agent"):
+            try:
+                result = await pipeline.run(
+                    input_msg, token, print_chunk if stream else None
+                )
+            except asyncio.CancelledError:
+                print("\n[turn cancelled]")
+                continue
+            finally:
+                tracer.end_turn()
+
+        if stream:
+            print()
+        print(result)
+
+
+async def run_team(
+    llm_client: ChatCompletionClient,
+    routing: Literal["deterministic", "llm"],
+    stream: bool,
+    tracer: ITurnTracer,
+) -> None:
+    team = await get_team(
+        llm_client=llm_client, routing=routing, stream=stream, tracer=tracer
+    )
 
     input_msg = input("Enter your message: ")
+    while input_msg.strip() != "TERMINATE":
+        token = CancellationToken()
+        tracer.start_turn(input_msg)
+        with cancel_on_interrupt(token):
+            try:
+                await print_stream(
+                    team.run_stream(task=input_msg, cancellation_token=token), tracer
+                )
+                return
+            except asyncio.CancelledError:
+                print("\n[turn cancelled]")
+                await team.reset()
+            finally:
+                tracer.end_turn()
+        input_msg = input("Enter your message: ")
+
+
+async def main() -> None:
+    chat_client = container[IChatClient]
+    chat_app_env = container[ChatAppEnv]
+    tracer = container[ITurnTracer]
+    llm_client = chat_client.get_model_client()
+    stream = chat_client.is_streaming()
+    target_db = container[ITargetDatabase]
+    if tracer.enabled:
+        target_db.add_query_listener(tracer.on_query)
 
-    async for message in team.run_stream(task=input_msg):
-        if type(message) is not TaskResult:
-            if message.source != "user_proxy":  # type: ignore
-                print(message.content)  # type: ignore
+    # keep the target pool, and the query cursors it holds, open between turns.
+    async with target_db:
+        try:
+            if chat_app_env.chat_routing == "pipeline":
+                await run_pipeline(llm_client, stream, tracer)
+            else:
+                await run_team(llm_client, chat_app_env.chat_routing, stream, tracer)
+        finally:
+            print(container[ISQLCache].stats().summary())
+            if tracer.enabled:
+                print(tracer.summary())
 
 
 if __name__ == "__main__":
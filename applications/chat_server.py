@@ -0,0 +1,261 @@
+"""Serves the NL to SQL pipeline to many concurrent chat sessions from one process.
+
+All sessions share one model client, one target database pool and the cached
+schema prompt, each session has its own conversation history.
+
+    POST   /sessions                  -> {"session_id": "..."}
+    POST   /sessions/{id}/messages    {"message": "..."} -> {"response": "..."}
+    DELETE /sessions/{id}
+
+With {"message": "...", "stream": true} the response is streamed as chunked
+JSON lines, {"chunk": "..."} while the model generates and {"response": "..."}
+at the end. Disconnecting cancels the turn.
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Any
+
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
+from lagom.environment import Env
+
+from fabric_sql.agents.compliance_agent import Agent as ComplianceAgent
+from fabric_sql.agents.sql_pipeline import OnChunk, SQLPipeline
+from fabric_sql.hosting import container
+from fabric_sql.protocols.i_chat_client import IChatClient
+from fabric_sql.protocols.i_target_database import ITargetDatabase
+
+MAX_BODY_BYTES = 64 * 1024
+
+
+class ChatServerEnv(Env):
+    chat_server_host: str = "127.0.0.1"
+    chat_server_port: int = 8080
+    chat_server_max_sessions: int = 100
+    # turns running at the same time over all sessions, other turns wait.
+    chat_server_max_concurrent_turns: int = 8
+    chat_server_session_ttl_seconds: int = 60 * 60
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ChatSession:
+    pipeline: SQLPipeline
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    last_active: float = field(default_factory=time.monotonic)
+
+
+class ChatServer:
+    def __init__(self, llm_client: ChatCompletionClient, env: ChatServerEnv) -> None:
+        self.llm_client = llm_client
+        self.env = env
+        self.sessions: dict[str, ChatSession] = {}
+        self.turns = asyncio.Semaphore(env.chat_server_max_concurrent_turns)
+
+    def evict_idle_sessions(self) -> None:
+        now = time.monotonic()
+        for session_id, session in list(self.sessions.items()):
+            idle = now - session.last_active
+            if not session.lock.locked() and (
+                idle > self.env.chat_server_session_ttl_seconds
+            ):
+                del self.sessions[session_id]
+
+    def get_session(self, session_id: str) -> ChatSession:
+        if session_id not in self.sessions:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"Unknown session {session_id}")
+        return self.sessions[session_id]
+
+    async def create_session(self) -> str:
+        self.evict_idle_sessions()
+        if len(self.sessions) >= self.env.chat_server_max_sessions:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many sessions")
+
+        agent = await ComplianceAgent().get_agent(self.llm_client, stream=True)
+        session_id = uuid.uuid4().hex
+        self.sessions[session_id] = ChatSession(pipeline=SQLPipeline(agent))
+        return session_id
+
+    def get_idle_session(self, session_id: str) -> ChatSession:
+        session = self.get_session(session_id)
+        # one turn at a time per session, the history is not safe to interleave.
+        if session.lock.locked():
+            raise HttpError(HTTPStatus.TOO_MANY_REQUESTS, "A turn is already running")
+        return session
+
+    async def send_message(
+        self,
+        session_id: str,
+        message: str,
+        on_chunk: OnChunk | None = None,
+        cancellation_token: CancellationToken | None = None,
+    ) -> str:
+        session = self.get_idle_session(session_id)
+
+        async with session.lock:
+            async with self.turns:
+                session.last_active = time.monotonic()
+                response = await session.pipeline.run(
+                    message, cancellation_token, on_chunk
+                )
+                session.last_active = time.monotonic()
+                return response
+
+    async def stream_message(
+        self, writer: asyncio.StreamWriter, session_id: str, message: str
+    ) -> None:
+        self.get_idle_session(session_id)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: application/x-ndjson\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        token = CancellationToken()
+
+        async def send(payload: dict[str, Any]) -> None:
+            data = (json.dumps(payload) + "\n").encode()
+            writer.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+
+        async def on_chunk(chunk: str) -> None:
+            try:
+                await send({"chunk": chunk})
+            except ConnectionError:
+                # the client is gone, stop generating tokens nobody reads.
+                token.cancel()
+
+        try:
+            response = await self.send_message(session_id, message, on_chunk, token)
+            await send({"response": response})
+        except asyncio.CancelledError:
+            if not token.is_cancelled():
+                raise
+            return
+        except Exception as e:
+            await send({"error": str(e)})
+        writer.write(b"0\r\n\r\n")
+
+    def parse_message(self, body: bytes) -> tuple[str, bool]:
+        try:
+            payload = json.loads(body)
+            return str(payload["message"]), bool(payload.get("stream", False))
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(HTTPStatus.BAD_REQUEST, 'Expected {"message": "..."}')
+
+    async def route(
+        self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter
+    ) -> dict[str, Any] | None:
+        """Handle the request, returns the JSON response or None if the response was
+        streamed to the writer."""
+        parts = [p for p in path.split("/") if p]
+
+        if method == "POST" and parts == ["sessions"]:
+            return {"session_id": await self.create_session()}
+
+        if (
+            method == "POST"
+            and len(parts) == 3
+            and parts[::2] == ["sessions", "messages"]
+        ):
+            message, stream = self.parse_message(body)
+            if stream:
+                await self.stream_message(writer, parts[1], message)
+                return None
+            return {"response": await self.send_message(parts[1], message)}
+
+        if method == "DELETE" and len(parts) == 2 and parts[0] == "sessions":
+            self.get_session(parts[1])
+            del self.sessions[parts[1]]
+            return {}
+
+        raise HttpError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+    @staticmethod
+    async def read_request(reader: asyncio.StreamReader) -> tuple[str, str, bytes]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+
+        headers: dict[str, str] = {}
+        while line := (await reader.readline()).decode("latin-1").strip():
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        content_length = headers.get("content-length", "0")
+        if not content_length.isdecimal():
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        length = int(content_length)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, body
+
+    @staticmethod
+    def write_response(
+        writer: asyncio.StreamWriter, status: HTTPStatus, payload: dict[str, Any]
+    ) -> None:
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode() + body)
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            method, path, body = await self.read_request(reader)
+            payload = await self.route(method, path, body, writer)
+            if payload is not None:
+                self.write_response(writer, HTTPStatus.OK, payload)
+        except HttpError as e:
+            self.write_response(writer, e.status, {"error": str(e)})
+        except Exception as e:
+            self.write_response(
+                writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+            )
+        finally:
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def serve(self) -> None:
+        # keep the shared target pool open for the lifetime of the server.
+        async with container[ITargetDatabase]:
+            server = await asyncio.start_server(
+                self.handle, self.env.chat_server_host, self.env.chat_server_port
+            )
+            print(
+                f"Serving chat sessions on "
+                f"http://{self.env.chat_server_host}:{self.env.chat_server_port}"
+            )
+            async with server:
+                await server.serve_forever()
+
+
+async def main() -> None:
+    chat_client = container[IChatClient]
+    server = ChatServer(chat_client.get_model_client(), container[ChatServerEnv])
+    await server.serve()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
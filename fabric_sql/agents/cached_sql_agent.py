@@ -0,0 +1,110 @@
+import re
+from typing import AsyncGenerator, Sequence
+
+from autogen_agentchat.agents import AssistantAgent, BaseChatAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import BaseAgentEvent, BaseChatMessage, TextMessage
+from autogen_core import CancellationToken
+from autogen_core.models import AssistantMessage
+
+from fabric_sql.protocols.i_sql_cache import ISQLCache
+
+SQL_FENCE_PATTERN = re.compile(r"```(?:sql)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+def extract_sql(text: str) -> str | None:
+    """Extract the SQL statement from an agent response, None if there is no
+    (read only) SQL statement in it."""
+    fenced = SQL_FENCE_PATTERN.search(text)
+    sql = (fenced.group(1) if fenced else text).strip()
+
+    if not re.match(r"^(SELECT|WITH)\b", sql, re.IGNORECASE):
+        return None
+    return sql
+
+
+class CachedSQLAgent(BaseChatAgent):
+    """Serves the SQL for previously answered questions from an ISQLCache and only
+    calls the wrapped agent (and hence the model) on a cache miss. Generated SQL is
+    only proposed to the cache, run_query confirms it once it executed.
+
+    The cache is shared by all conversations, so only the first question of a
+    conversation uses it, later ones can refer to the earlier turns."""
+
+    def __init__(
+        self,
+        agent: AssistantAgent,
+        cache: ISQLCache,
+        schema_fingerprint: str,
+        question_sources: Sequence[str] = ("user", "user_proxy"),
+    ) -> None:
+        super().__init__(agent.name, agent.description)
+        self._agent = agent
+        self._cache = cache
+        self._schema_fingerprint = schema_fingerprint
+        self._question_sources = question_sources
+        # calls since the last reset, the first one starts the conversation.
+        self._turns = 0
+
+    @property
+    def produced_message_types(self) -> Sequence[type[BaseChatMessage]]:
+        return self._agent.produced_message_types
+
+    def get_question(self, messages: Sequence[BaseChatMessage]) -> str | None:
+        """The question that starts the conversation, None for any later turn."""
+        if (
+            self._turns == 0
+            and messages
+            and isinstance(messages[-1], TextMessage)
+            and messages[-1].source in self._question_sources
+        ):
+            return messages[-1].content
+        return None
+
+    async def on_messages(
+        self, messages: Sequence[BaseChatMessage], cancellation_token: CancellationToken
+    ) -> Response:
+        async for message in self.on_messages_stream(messages, cancellation_token):
+            if isinstance(message, Response):
+                return message
+        raise AssertionError("The stream should have returned the final result.")
+
+    async def on_messages_stream(
+        self, messages: Sequence[BaseChatMessage], cancellation_token: CancellationToken
+    ) -> AsyncGenerator[BaseAgentEvent | BaseChatMessage | Response, None]:
+        question = self.get_question(messages)
+        self._turns += 1
+
+        if question is not None:
+            sql = self._cache.get(question, self._schema_fingerprint)
+            if sql is not None:
+                await self.add_to_context(messages, sql)
+                yield Response(chat_message=TextMessage(content=sql, source=self.name))
+                return
+
+        async for message in self._agent.on_messages_stream(
+            messages, cancellation_token
+        ):
+            if (
+                question is not None
+                and isinstance(message, Response)
+                and isinstance(message.chat_message, TextMessage)
+            ):
+                sql = extract_sql(message.chat_message.content)
+                if sql is not None:
+                    self._cache.propose(question, sql, self._schema_fingerprint)
+            yield message
+
+    async def add_to_context(
+        self, messages: Sequence[BaseChatMessage], sql: str
+    ) -> None:
+        """Add a turn served from the cache to the history of the wrapped agent, as
+        if it had answered it."""
+        model_context = self._agent.model_context
+        for message in messages:
+            await model_context.add_message(message.to_model_message())
+        await model_context.add_message(AssistantMessage(content=sql, source=self.name))
+
+    async def on_reset(self, cancellation_token: CancellationToken) -> None:
+        self._turns = 0
+        await self._agent.on_reset(cancellation_token)
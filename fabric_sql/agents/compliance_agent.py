@@ -1,15 +1,18 @@
-from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+import hashlib
 
+from autogen_agentchat.agents import AssistantAgent, BaseChatAgent
+from autogen_core.models import ChatCompletionClient
+
+from fabric_sql.agents.cached_sql_agent import CachedSQLAgent
 from fabric_sql.agents.i_agent import IAgent
 from fabric_sql.hosting import container
 from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
-
-db_definition_service = container[IDatabaseDefinitions]
+from fabric_sql.protocols.i_sql_cache import ISQLCache
 
 
 class Agent(IAgent):
     async def system_message(self) -> str:
+        db_definition_service = container[IDatabaseDefinitions]
         return f"""You are a helpful assistant that generates SQL queries based on natural language. Only respond with the SQL query, no extra text.
 Followings are the columns, tables and views definitions in the database:"
 {await db_definition_service.get_definitions()}
@@ -24,11 +27,17 @@ INSTRUCTIONS:
 """  # noqa E501
 
     async def get_agent(
-        self, llm_client: AzureOpenAIChatCompletionClient
-    ) -> AssistantAgent:
-        return AssistantAgent(
+        self, llm_client: ChatCompletionClient, stream: bool = False
+    ) -> BaseChatAgent:
+        system_message = await self.system_message()
+        agent = AssistantAgent(
             "security_compliance_agent",
             model_client=llm_client,
             description="Security Compliance Agent.",
-            system_message=await self.system_message(),
+            system_message=system_message,
+            model_client_stream=stream,
         )
+        # the system message embeds the schema, cached SQL is only reused as long as
+        # the schema it was generated against is unchanged.
+        schema_fingerprint = hashlib.sha256(system_message.encode()).hexdigest()
+        return CachedSQLAgent(agent, container[ISQLCache], schema_fingerprint)
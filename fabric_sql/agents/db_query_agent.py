@@ -1,23 +1,120 @@
+import asyncio
+
 from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
-from tabulate import tabulate
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
 
 from fabric_sql.agents.i_agent import IAgent
 from fabric_sql.hosting import container
-from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
+from fabric_sql.protocols.i_postgres_db_service import QueryException, QueryPage
+from fabric_sql.protocols.i_query_guard import IQueryGuard
+from fabric_sql.protocols.i_result_renderer import IResultRenderer
+from fabric_sql.protocols.i_sql_cache import ISQLCache
+from fabric_sql.protocols.i_sql_validator import ISQLValidator
 from fabric_sql.protocols.i_target_database import ITargetDatabase
+from fabric_sql.protocols.i_turn_tracer import ITurnTracer
 
-db_definition_service = container[IDatabaseDefinitions]
-target_db = container[ITargetDatabase]
+# rows per page of query_page_tool.
+PAGE_ROWS = 100
 
 
-async def query_tool(query: str) -> str:
+async def run_query(
+    query: str, cancellation_token: CancellationToken | None = None
+) -> str:
+    """Execute the SQL query using the target database and return the result as a
+    string, raises QueryException if the query fails or is rejected. The SQL cache
+    only keeps generated SQL that executed.
+    """
+    target_db = container[ITargetDatabase]
+    result_renderer = container[IResultRenderer]
+    query_guard = container[IQueryGuard]
+    sql_cache = container[ISQLCache]
+
+    with container[ITurnTracer].span("run_query", "tool") as attributes:
+        try:
+            # rejected locally, without a round trip to the database.
+            validated = await container[ISQLValidator].validate(query)
+            attributes["sql_key"] = validated.cache_key
+            async with target_db:
+                # cancelling the task cancels the running statement on the server.
+                task = asyncio.ensure_future(
+                    result_renderer.render(
+                        query_guard.fetch_batches(target_db, validated.sql)
+                    )
+                )
+                if cancellation_token:
+                    cancellation_token.link_future(task)
+                result = await task
+        except QueryException:
+            # never serve the failed SQL from the cache again.
+            sql_cache.reject(query)
+            raise
+        sql_cache.confirm(query)
+        return result
+
+
+async def run_query_page(
+    query: str,
+    cursor: str = "",
+    cancellation_token: CancellationToken | None = None,
+) -> str:
+    """Execute the SQL query, or continue it from the cursor of the previous page,
+    and return one page of the result as a string. Raises QueryException if the
+    query fails or is rejected.
+    """
+    target_db = container[ITargetDatabase]
+    result_renderer = container[IResultRenderer]
+    query_guard = container[IQueryGuard]
+    sql_cache = container[ISQLCache]
+
+    async def fetch() -> QueryPage:
+        if cursor:
+            return await target_db.fetch_next_page(cursor, PAGE_ROWS)
+        validated = await container[ISQLValidator].validate(query)
+        attributes["sql_key"] = validated.cache_key
+        return await query_guard.fetch_page(target_db, validated.sql, PAGE_ROWS)
+
+    with container[ITurnTracer].span("run_query_page", "tool") as attributes:
+        try:
+            async with target_db:
+                task = asyncio.ensure_future(fetch())
+                if cancellation_token:
+                    cancellation_token.link_future(task)
+                page = await task
+        except QueryException:
+            if not cursor:
+                sql_cache.reject(query)
+            raise
+        if not cursor:
+            sql_cache.confirm(query)
+
+    result = result_renderer.render_page(page.rows)
+    if page.cursor:
+        result += f'\n(more rows available, call with cursor="{page.cursor}")'
+    return result
+
+
+async def query_tool(query: str, cancellation_token: CancellationToken) -> str:
     """Execute the SQL query using the target database and return the result as a
     string.
     """
-    async with target_db:
-        result = await target_db.query(query)
-        return tabulate(result, headers="keys", tablefmt="grid")  # type: ignore
+    try:
+        return await run_query(query, cancellation_token)
+    except QueryException as e:
+        return f"Query failed: {e}"
+
+
+async def query_page_tool(
+    query: str, cursor: str, cancellation_token: CancellationToken
+) -> str:
+    """Execute the SQL query and return the first page of the result. To get the
+    next page pass the cursor returned with the previous page, the query is not
+    executed again.
+    """
+    try:
+        return await run_query_page(query, cursor, cancellation_token)
+    except QueryException as e:
+        return f"Query failed: {e}"
 
 
 class Agent(IAgent):
@@ -29,12 +126,13 @@ class Agent(IAgent):
         )
 
     async def get_agent(
-        self, llm_client: AzureOpenAIChatCompletionClient
+        self, llm_client: ChatCompletionClient, stream: bool = False
     ) -> AssistantAgent:
         return AssistantAgent(
             "db_query_agent",
             model_client=llm_client,
             description="Database Query Agent.",
-            tools=[query_tool],
+            tools=[query_tool, query_page_tool],
             system_message=await self.system_message(),
+            model_client_stream=stream,
         )
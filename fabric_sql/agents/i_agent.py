@@ -1,17 +1,18 @@
 from typing import Protocol
 
-from autogen_agentchat.agents import AssistantAgent
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+from autogen_agentchat.agents import BaseChatAgent
+from autogen_core.models import ChatCompletionClient
 
 
 class IAgent(Protocol):
     async def get_agent(
-        self, llm_client: AzureOpenAIChatCompletionClient
-    ) -> AssistantAgent:
+        self, llm_client: ChatCompletionClient, stream: bool = False
+    ) -> BaseChatAgent:
         """
-        Get an instance of AssistantAgent.
+        Get an instance of the agent.
 
         :param llm_client: The language model client.
-        :return: An instance of AssistantAgent.
+        :param stream: Whether the agent streams the model response in chunks.
+        :return: An instance of the agent.
         """
         ...
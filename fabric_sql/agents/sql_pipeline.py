@@ -0,0 +1,95 @@
+import time
+from typing import Awaitable, Callable
+
+from autogen_agentchat.agents import BaseChatAgent
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+from autogen_core import CancellationToken
+
+from fabric_sql.agents.cached_sql_agent import extract_sql
+from fabric_sql.agents.db_query_agent import run_query
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+
+REPAIR_SOURCE = "sql_executor"
+
+OnChunk = Callable[[str], Awaitable[None]]
+
+
+class SQLPipeline:
+    """Executes the SQL produced by the compliance agent directly against the target
+    database. The model is only called again to repair SQL that failed to execute.
+    """
+
+    def __init__(self, compliance_agent: BaseChatAgent, max_repairs: int = 2) -> None:
+        self.compliance_agent = compliance_agent
+        self.max_repairs = max_repairs
+        # the SQL executed by the last run and where its time went.
+        self.sql: str | None = None
+        self.generate_ms = 0.0
+        self.query_ms = 0.0
+        self.repairs = 0
+        # the error of the last query when the repairs ran out.
+        self.error: str | None = None
+
+    async def generate(
+        self,
+        message: TextMessage,
+        cancellation_token: CancellationToken,
+        on_chunk: OnChunk | None = None,
+    ) -> str:
+        started = time.perf_counter()
+        try:
+            async for event in self.compliance_agent.on_messages_stream(
+                [message], cancellation_token
+            ):
+                if isinstance(event, ModelClientStreamingChunkEvent) and on_chunk:
+                    await on_chunk(event.content)
+                elif isinstance(event, Response):
+                    return event.chat_message.to_text()
+        finally:
+            self.generate_ms += (time.perf_counter() - started) * 1000
+        raise AssertionError("The stream should have returned the final result.")
+
+    async def run(
+        self,
+        question: str,
+        cancellation_token: CancellationToken | None = None,
+        on_chunk: OnChunk | None = None,
+    ) -> str:
+        """Answer the question, the generated SQL is forwarded chunk by chunk to
+        on_chunk while the model streams it."""
+        token = cancellation_token or CancellationToken()
+        self.sql, self.generate_ms, self.query_ms, self.repairs = None, 0.0, 0.0, 0
+        self.error = None
+        text = await self.generate(
+            TextMessage(content=question, source="user"), token, on_chunk
+        )
+
+        for attempt in range(self.max_repairs + 1):
+            sql = extract_sql(text)
+            if sql is None:
+                return text
+
+            self.sql = sql
+            started = time.perf_counter()
+            try:
+                return await run_query(sql, token)
+            except QueryException as e:
+                if attempt == self.max_repairs:
+                    self.error = str(e)
+                    return f"Query failed: {e}"
+                error = e
+            finally:
+                self.query_ms += (time.perf_counter() - started) * 1000
+
+            self.repairs += 1
+            repair = TextMessage(
+                content=(
+                    f"The SQL query failed with the error: {error}\n"
+                    "Fix the SQL query. Only respond with the SQL query."
+                ),
+                source=REPAIR_SOURCE,
+            )
+            text = await self.generate(repair, token, on_chunk)
+
+        return text
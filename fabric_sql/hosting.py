@@ -5,22 +5,47 @@ Utilizes the Lagom library for dependency injection, see more at:
 - https://github.com/meadsteve/lagom
 """
 
+import functools
 import logging
 import os
+from typing import Any
 
-from dotenv import load_dotenv
 from lagom import Container, dependency_definition
 
 from fabric_sql.protocols.i_chat_client import IChatClient
 from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
 from fabric_sql.protocols.i_duplicate_db_service import IDuplicateDBService
+from fabric_sql.protocols.i_query_guard import IQueryGuard
+from fabric_sql.protocols.i_result_renderer import IResultRenderer
 from fabric_sql.protocols.i_source_database import ISourceDatabase
+from fabric_sql.protocols.i_sql_cache import ISQLCache
+from fabric_sql.protocols.i_sql_validator import ISQLValidator
 from fabric_sql.protocols.i_target_database import ITargetDatabase
+from fabric_sql.protocols.i_turn_tracer import ITurnTracer
 
-load_dotenv(dotenv_path=".env")
 
+@functools.cache
+def load_env() -> None:
+    from dotenv import load_dotenv
 
-container = Container()
+    load_dotenv(dotenv_path=".env")
+
+
+class LazyContainer(Container):
+    """Loads the .env file on the first resolution instead of on import, so that
+    importing a module that uses the container has no side effects."""
+
+    def resolve(
+        self,
+        dep_type: Any,
+        suppress_error: bool = False,
+        skip_definitions: bool = False,
+    ) -> Any:
+        load_env()
+        return super().resolve(dep_type, suppress_error, skip_definitions)
+
+
+container = LazyContainer()
 """The top level DI container for our application."""
 
 
@@ -67,3 +92,38 @@ def database_definitions() -> IDatabaseDefinitions:
     from fabric_sql.services.database_definitions import DatabaseDefinitions
 
     return container[DatabaseDefinitions]
+
+
+@dependency_definition(container, singleton=True)
+def sql_cache() -> ISQLCache:
+    from fabric_sql.services.sql_cache import SQLCache
+
+    return container[SQLCache]
+
+
+@dependency_definition(container, singleton=True)
+def result_renderer() -> IResultRenderer:
+    from fabric_sql.services.result_renderer import ResultRenderer
+
+    return container[ResultRenderer]
+
+
+@dependency_definition(container, singleton=True)
+def query_guard() -> IQueryGuard:
+    from fabric_sql.services.query_guard import QueryGuard
+
+    return container[QueryGuard]
+
+
+@dependency_definition(container, singleton=True)
+def turn_tracer() -> ITurnTracer:
+    from fabric_sql.services.turn_tracer import TurnTracer
+
+    return container[TurnTracer]
+
+
+@dependency_definition(container, singleton=True)
+def sql_validator() -> ISQLValidator:
+    from fabric_sql.services.sql_validator import SQLValidator
+
+    return container[SQLValidator]
@@ -1,7 +1,13 @@
-from typing import Protocol
+from typing import TYPE_CHECKING, Protocol
 
-from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
+if TYPE_CHECKING:
+    # autogen is slow to import, only load it for the type checker.
+    from autogen_core.models import ChatCompletionClient
 
 
 class IChatClient(Protocol):
-    def get_model_client(self) -> AzureOpenAIChatCompletionClient: ...
+    def get_model_client(self) -> "ChatCompletionClient": ...
+
+    def is_streaming(self) -> bool:
+        """Whether agents should stream the model responses token by token."""
+        ...
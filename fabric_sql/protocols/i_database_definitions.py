@@ -1,8 +1,11 @@
-from typing import Protocol
+from typing import Literal, Protocol
 
 from fabric_sql.models.table_definition import TableDefinition
 from fabric_sql.models.view_definition import ViewDefinition
 
+DefinitionsFormat = Literal["compact", "grid"]
+DEFINITION_FORMATS: tuple[DefinitionsFormat, ...] = ("compact", "grid")
+
 
 class IDatabaseDefinitions(Protocol):
     def get_view_definitions(self) -> list[ViewDefinition]:
@@ -21,6 +24,15 @@ class IDatabaseDefinitions(Protocol):
         """
         ...
 
+    async def get_view_schemas(self) -> dict[str, list[dict[str, str]]]:
+        """Get the columns of every view, fetched from the target database once.
+
+        Returns:
+            dict[str, list[dict[str, str]]]: The columns by schema qualified view
+                name.
+        """
+        ...
+
     async def get_definitions(self) -> str:
         """Get the list of view definitions.
 
@@ -28,3 +40,23 @@ class IDatabaseDefinitions(Protocol):
             list[ViewDefinition]: List of view definitions.
         """
         ...
+
+    async def render_definitions(self, format: DefinitionsFormat | None = None) -> str:
+        """Render the columns, views and view columns for the system messages.
+
+        Args:
+            format (DefinitionsFormat | None): compact or grid, the configured
+                format when None.
+
+        Returns:
+            str: The rendered definitions.
+        """
+        ...
+
+    async def count_definition_tokens(self) -> dict[str, int]:
+        """Count the prompt tokens of the definitions in every format.
+
+        Returns:
+            dict[str, int]: Token count per format.
+        """
+        ...
@@ -1,3 +1,5 @@
+from datetime import datetime
+from pathlib import Path
 from typing import Protocol
 
 from pydantic import BaseModel
@@ -11,18 +13,35 @@ class DuplicateDBServiceConfig(BaseModel):
     is_view: bool = False
 
 
+class SnapshotTable(BaseModel):
+    db_schema: str
+    name: str
+    create_statement: str
+    # Parquet file relative to the snapshot folder, None for an empty table.
+    file: str | None = None
+    rows: int = 0
+
+
+class SnapshotManifest(BaseModel):
+    version: int = 1
+    created_at: datetime
+    tables: list[SnapshotTable]
+
+
 class IDuplicateDBService(Protocol):
     async def duplicate(
         self,
         source_db: IPostgresDBService,
-        target_db: IPostgresDBService,
+        target_db: IPostgresDBService | list[IPostgresDBService],
         config: list[DuplicateDBServiceConfig],
     ) -> None:
         """
-        Duplicate a database from source_db to target_db.
+        Duplicate a database from source_db to target_db. With several targets
+        every table is read from the source once and written to all the targets
+        concurrently.
 
         :param source_db: The source database service.
-        :param target_db: The target database service.
+        :param target_db: The target database service, or a list of them.
         :param config: Configuration for tables and views to duplicate.
         """
         ...
@@ -60,3 +79,32 @@ class IDuplicateDBService(Protocol):
         :param view_name: The materialized view name.
         """
         ...
+
+    async def export_snapshot(
+        self,
+        source_db: IPostgresDBService,
+        config: list[DuplicateDBServiceConfig],
+        snapshot_dir: Path,
+    ) -> SnapshotManifest:
+        """
+        Export the configured tables and views to compressed Parquet files and a
+        manifest.json in snapshot_dir, without touching any target database.
+
+        :param source_db: The source database service.
+        :param config: Configuration for tables and views to export.
+        :param snapshot_dir: The folder the snapshot is written to.
+        :return: The manifest of the snapshot.
+        """
+        ...
+
+    async def load_snapshot(
+        self, target_db: IPostgresDBService, snapshot_dir: Path
+    ) -> None:
+        """
+        Create the tables of a snapshot in the target database and load their rows
+        from the Parquet files, without touching the source database.
+
+        :param target_db: The target database service.
+        :param snapshot_dir: The folder of the snapshot.
+        """
+        ...
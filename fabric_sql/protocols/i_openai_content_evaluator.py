@@ -1,6 +1,7 @@
-from typing import Literal, Protocol
+from typing import AsyncIterator, Literal, Protocol
 
-from openai.types.chat import ChatCompletion
+from openai import AsyncStream
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
 
 
 class ContentSafeException(Exception):
@@ -21,3 +22,33 @@ class IOpenAIContentEvaluator(Protocol):
         :raises ContentSafeException: If the content safety check fails.
         """
         ...
+
+    def chunk_safety_check(
+        self,
+        chunk: ChatCompletionChunk,
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> None:
+        """
+        Perform a content safety check on the annotations of one streamed chunk.
+
+        :param chunk: The ChatCompletionChunk to check.
+        :param threshold: The severity threshold for filtering content.
+        :raises ContentSafeException: If the content safety check fails.
+        """
+        ...
+
+    def content_safety_stream(
+        self,
+        stream: AsyncStream[ChatCompletionChunk],
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        """
+        Check the chunks of a streamed response as they arrive.
+
+        :param stream: The streamed ChatCompletionChunks.
+        :param threshold: The severity threshold for filtering content.
+        :return: The chunks that passed the check.
+        :raises ContentSafeException: On the first chunk that fails the check, the
+            stream is closed so the model stops generating.
+        """
+        ...
@@ -1,30 +1,276 @@
-from typing import Any, Protocol, Self
+from contextlib import AbstractAsyncContextManager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Callable,
+    Literal,
+    Protocol,
+    Self,
+)
+
+from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# read runs on the read only pool when one is configured, write on the primary pool.
+# Reads that must see the caller's own writes use "write".
+Workload = Literal["read", "write"]
+
+
+class QueryException(Exception):
+    pass
+
+
+class QueryPlan(BaseModel):
+    total_cost: float
+    plan_rows: int
+
+
+class QueryPage(BaseModel):
+    rows: list[dict[str, Any]]
+    # token to fetch the next page, None on the last page.
+    cursor: str | None = None
+
+
+# upper bounds of the statement latency histogram, the last bucket counts the
+# statements above the largest bound.
+LATENCY_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class QueryStats(BaseModel):
+    # the statement with its literal values replaced by ?
+    fingerprint: str
+    calls: int = 0
+    errors: int = 0
+    rows: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    # time spent waiting for a pool connection, not part of total_ms.
+    acquire_wait_ms: float = 0.0
+    buckets: list[int] = Field(
+        default_factory=lambda: [0] * (len(LATENCY_BUCKETS_MS) + 1)
+    )
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+    def percentile_ms(self, percentile: float) -> float:
+        """Upper bound of the histogram bucket holding the given percentile."""
+        rank = percentile / 100 * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return float(bound)
+        return self.max_ms
 
 
 class IPostgresDBService(Protocol):
-    async def query(self, query: str) -> list[dict[str, Any]] | None:
+    async def query(
+        self, query: str, workload: Workload = "read"
+    ) -> list[dict[str, Any]] | None:
+        """
+        Execute a SQL query against the PostgreSQL database.
+
+        :param query: The SQL query to execute.
+        :param workload: The pool the query runs on.
+        :return: The results of the query, None if the query failed.
+        """
+        ...
+
+    async def fetch(
+        self, query: str, workload: Workload = "read"
+    ) -> list[dict[str, Any]]:
         """
         Execute a SQL query against the PostgreSQL database.
 
         :param query: The SQL query to execute.
+        :param workload: The pool the query runs on.
         :return: The results of the query.
+        :raises QueryException: If the query failed.
+        """
+        ...
+
+    def fetch_batches(
+        self,
+        query: str,
+        batch_size: int | Callable[[], int] = 1000,
+        statement_timeout_ms: int | None = None,
+        workload: Workload = "read",
+        snapshot: str | None = None,
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Execute a SQL query and stream the results with a server side cursor, at
+        most batch_size rows are held in memory at a time.
+
+        :param query: The SQL query to execute.
+        :param batch_size: The number of rows fetched per batch, or a callable
+            returning the number of rows of the next batch.
+        :param statement_timeout_ms: Server side statement timeout for the query.
+        :param workload: The pool the query runs on.
+        :param snapshot: A snapshot id from exported_snapshot the query reads at.
+        :return: An async iterator over batches of rows.
+        :raises QueryException: If the query failed.
+        """
+        ...
+
+    def exported_snapshot(
+        self, workload: Workload = "read"
+    ) -> AbstractAsyncContextManager[str]:
+        """
+        Open a coordinator transaction at REPEATABLE READ and export its snapshot.
+        Readers on other connections passing the snapshot id to fetch_batches or
+        query_arrow all see the database at the same point in time, as long as the
+        context is open.
+
+        :param workload: The pool the coordinator runs on, the readers must use the
+            same one since a snapshot can only be imported on the server that
+            exported it.
+        :return: An async context manager yielding the snapshot id.
+        :raises QueryException: If the snapshot could not be exported.
+        """
+        ...
+
+    def query_arrow(
+        self,
+        query: str,
+        batch_size: int = 10_000,
+        statement_timeout_ms: int | None = None,
+        workload: Workload = "read",
+        snapshot: str | None = None,
+    ) -> AsyncIterator["pa.RecordBatch"]:
+        """
+        Execute a SQL query and stream the results as Apache Arrow record batches,
+        typed after the result columns. The batches can be handed to pandas, polars
+        or DuckDB without copying. Requires pyarrow.
+
+        :param query: The SQL query to execute.
+        :param batch_size: The number of rows per record batch.
+        :param statement_timeout_ms: Server side statement timeout for the query.
+        :param workload: The pool the query runs on.
+        :param snapshot: A snapshot id from exported_snapshot the query reads at.
+        :return: An async iterator over record batches sharing one schema.
+        :raises QueryException: If the query failed.
         """
         ...
 
-    async def execute(self, query: str) -> None:
+    async def fetch_page(
+        self,
+        query: str,
+        page_size: int = 100,
+        statement_timeout_ms: int | None = None,
+    ) -> QueryPage:
         """
-        Execute a SQL command against the PostgreSQL database.
+        Execute a SQL query and return its first page of rows. The query is held
+        open in a server side cursor while more rows remain, so the next pages are
+        read where the previous one stopped instead of executing the query again.
+
+        :param query: The SQL query to execute.
+        :param page_size: The number of rows per page.
+        :param statement_timeout_ms: Server side statement timeout for each page.
+        :return: The first page and the cursor token for the next one.
+        :raises QueryException: If the query failed.
+        """
+        ...
+
+    async def fetch_next_page(self, cursor: str, page_size: int = 100) -> QueryPage:
+        """
+        Fetch the next page of a query opened with fetch_page.
+
+        :param cursor: The cursor token returned with the previous page.
+        :param page_size: The number of rows per page.
+        :return: The next page and the cursor token for the one after.
+        :raises QueryException: If the cursor is unknown or expired, or the fetch
+            failed.
+        """
+        ...
+
+    async def close_cursor(self, cursor: str) -> None:
+        """
+        Release a cursor before its last page was fetched.
+
+        :param cursor: The cursor token returned with a page.
+        """
+        ...
+
+    async def explain(self, query: str) -> QueryPlan:
+        """
+        Get the planner estimates for a SQL query without executing it.
+
+        :param query: The SQL query to explain.
+        :return: The estimated total cost and number of rows of the query.
+        :raises QueryException: If the query cannot be planned.
+        """
+        ...
+
+    def query_metrics(self) -> list[QueryStats]:
+        """
+        Get the statement metrics recorded since the service was created or the
+        metrics were reset, slowest in total first. Empty unless POSTGRES_METRICS
+        is enabled.
+
+        :return: The metrics per query fingerprint.
+        """
+        ...
+
+    def reset_query_metrics(self) -> None:
+        """
+        Discard the recorded statement metrics.
+        """
+        ...
+
+    def add_query_listener(
+        self, listener: Callable[[str, float, float, int, bool], None]
+    ) -> None:
+        """
+        Call listener after every statement, also when metrics are disabled.
+
+        :param listener: Called with the query fingerprint, the duration and pool
+            wait in milliseconds, the rows and whether the statement failed.
+        """
+        ...
+
+    async def execute(self, query: str, raise_errors: bool = False) -> None:
+        """
+        Execute a SQL command against the PostgreSQL database, always on the write
+        pool.
 
         :param query: The SQL command to execute.
+        :param raise_errors: Raise a failure instead of only printing it, for
+            callers that retry or must not lose the command, e.g. data batches.
+        :raises QueryException: If the command fails and raise_errors is set.
+        """
+        ...
+
+    async def copy_records(
+        self,
+        schema_name: str,
+        table_name: str,
+        columns: list[str],
+        records: list[tuple[Any, ...]],
+    ) -> None:
+        """
+        Bulk load rows into a table with COPY, on the write pool.
+
+        :param schema_name: The schema name.
+        :param table_name: The table name.
+        :param columns: The columns of the records, in order.
+        :param records: The rows to insert.
+        :raises QueryException: If the copy failed.
         """
         ...
 
     async def __aenter__(self) -> Self:
-        """Async context manager entry."""
+        """Async context manager entry, the connection pools are shared by nested
+        and concurrent users."""
         ...
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
-        """Async context manager exit."""
+        """Async context manager exit, the connection pools are closed when the
+        last user exits."""
         ...
 
     async def show_view_definition(
@@ -0,0 +1,52 @@
+from typing import Any, AsyncIterator, Protocol
+
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    QueryException,
+    QueryPage,
+)
+
+
+class QueryRejectedException(QueryException):
+    pass
+
+
+class IQueryGuard(Protocol):
+    async def guard(self, db: IPostgresDBService, query: str) -> str:
+        """
+        Check the planner estimates of a generated SQL query before it is executed.
+        Queries estimated to return too many rows are rewritten with a LIMIT.
+
+        :param db: The database the query will be executed against.
+        :param query: The SQL query.
+        :return: The query to execute, possibly rewritten.
+        :raises QueryRejectedException: If the estimated cost is too high.
+        """
+        ...
+
+    def fetch_batches(
+        self, db: IPostgresDBService, query: str
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        """
+        Guard the query and stream its results under the statement timeout.
+
+        :param db: The database to execute the query against.
+        :param query: The SQL query.
+        :return: An async iterator over batches of rows.
+        :raises QueryException: If the query is rejected or fails.
+        """
+        ...
+
+    async def fetch_page(
+        self, db: IPostgresDBService, query: str, page_size: int
+    ) -> QueryPage:
+        """
+        Guard the query and fetch its first page under the statement timeout.
+
+        :param db: The database to execute the query against.
+        :param query: The SQL query.
+        :param page_size: The rows per page.
+        :return: The first page, with a cursor if more rows are available.
+        :raises QueryException: If the query is rejected or fails.
+        """
+        ...
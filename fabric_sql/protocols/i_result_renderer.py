@@ -0,0 +1,25 @@
+from typing import Any, AsyncIterator, Protocol
+
+
+class IResultRenderer(Protocol):
+    async def render(self, batches: AsyncIterator[list[dict[str, Any]]]) -> str:
+        """
+        Render a streamed query result as compact text for the model, within the
+        configured row and byte caps. Rows beyond the caps are summarized in a
+        footer and optionally spilled to a local file.
+
+        :param batches: The query result batches, see
+            IPostgresDBService.fetch_batches.
+        :return: The rendered result.
+        """
+        ...
+
+    def render_page(self, rows: list[dict[str, Any]]) -> str:
+        """
+        Render one page of a paged query result. Every row of the page is inlined,
+        the rest of the result stays behind the cursor of the page.
+
+        :param rows: The rows of the page.
+        :return: The rendered page.
+        """
+        ...
@@ -0,0 +1,72 @@
+from typing import Protocol
+
+from pydantic import BaseModel
+
+
+class SQLCacheStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"SQL cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate:.0%}), {self.entries} entries, "
+            f"{self.evictions} evictions"
+        )
+
+
+class ISQLCache(Protocol):
+    def get(self, question: str, schema_fingerprint: str) -> str | None:
+        """
+        Look up the SQL previously generated for a question.
+
+        :param question: The natural language question.
+        :param schema_fingerprint: Fingerprint of the schema the SQL was generated
+            against. Entries stored under a different fingerprint are misses.
+        :return: The cached SQL, or None on a cache miss.
+        """
+        ...
+
+    def propose(self, question: str, sql: str, schema_fingerprint: str) -> None:
+        """
+        Hold SQL generated for a question until it executed successfully, it is not
+        served before it is confirmed.
+
+        :param question: The natural language question.
+        :param sql: The SQL generated for the question.
+        :param schema_fingerprint: Fingerprint of the schema the SQL was generated
+            against.
+        """
+        ...
+
+    def confirm(self, sql: str) -> None:
+        """
+        Store the SQL proposed for questions once it executed successfully.
+
+        :param sql: The executed SQL, compared ignoring whitespace.
+        """
+        ...
+
+    def reject(self, sql: str) -> None:
+        """
+        Remove SQL that failed to execute, proposed or stored, including the entries
+        it was served from for similar questions.
+
+        :param sql: The failed SQL, compared ignoring whitespace.
+        """
+        ...
+
+    def stats(self) -> SQLCacheStats:
+        """
+        Get the cache hit/miss and eviction counters.
+
+        :return: A snapshot of the cache statistics.
+        """
+        ...
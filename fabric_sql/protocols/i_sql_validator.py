@@ -0,0 +1,35 @@
+from typing import Protocol
+
+from pydantic import BaseModel
+
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+
+
+class SQLValidationException(QueryException):
+    pass
+
+
+class ValidatedSQL(BaseModel):
+    # the canonical form of the query, the one to execute.
+    sql: str
+    # hash of the canonical form, equal for queries that only differ in whitespace,
+    # comments or keyword and identifier case.
+    cache_key: str
+    # the views and tables the query reads, schema qualified.
+    relations: list[str] = []
+    # the row limit of the canonical form.
+    limit: int | None = None
+
+
+class ISQLValidator(Protocol):
+    async def validate(self, query: str) -> ValidatedSQL:
+        """
+        Parse a generated SQL query locally against the cached schema of the
+        database definitions, before it costs a database round trip.
+
+        :param query: The SQL query.
+        :return: The canonical form of the query, with the row limit enforced.
+        :raises SQLValidationException: If the query is not a single read only
+            statement, does not parse or references unknown views or columns.
+        """
+        ...
@@ -0,0 +1,95 @@
+from typing import TYPE_CHECKING, Any, ContextManager, Literal, Protocol
+
+if TYPE_CHECKING:
+    # autogen is slow to import, only load it for the type checker.
+    from autogen_core.models import ChatCompletionClient
+
+SpanKind = Literal["turn", "agent", "llm", "tool", "db"]
+
+
+class ITurnTracer(Protocol):
+    @property
+    def enabled(self) -> bool:
+        """Whether spans are recorded, all the other methods are no-ops if not."""
+        ...
+
+    def start_turn(self, task: str) -> None:
+        """
+        Start tracing a chat turn, ending the previous one.
+
+        :param task: The user message that started the turn.
+        """
+        ...
+
+    def end_turn(self) -> None:
+        """
+        End the current turn and append its spans to the trace file.
+        """
+        ...
+
+    def span(self, name: str, kind: SpanKind) -> ContextManager[dict[str, Any]]:
+        """
+        Time the enclosed block as a span of the current turn. Spans recorded
+        inside the block, also from tasks it starts, are its children.
+
+        :param name: The name of the span.
+        :param kind: What the span measures.
+        :return: A context manager yielding the attributes of the span.
+        """
+        ...
+
+    def record(
+        self, name: str, kind: SpanKind, duration_ms: float, **attributes: Any
+    ) -> None:
+        """
+        Add a span that just ended to the current turn.
+
+        :param name: The name of the span.
+        :param kind: What the span measures.
+        :param duration_ms: How long it took.
+        :param attributes: Attributes of the span, e.g. token counts.
+        """
+        ...
+
+    def observe(self, source: str) -> None:
+        """
+        Report a message of the team stream, the agent spans are derived from the
+        sources of the messages.
+
+        :param source: The agent that produced the message.
+        """
+        ...
+
+    def on_query(
+        self,
+        fingerprint: str,
+        duration_ms: float,
+        wait_ms: float,
+        rows: int,
+        error: bool,
+    ) -> None:
+        """
+        Query listener of the database services, records a db span.
+        """
+        ...
+
+    def wrap_client(
+        self, client: "ChatCompletionClient", name: str
+    ) -> "ChatCompletionClient":
+        """
+        Wrap a model client so every call is recorded as an llm span with its token
+        usage and whether it was served from the cache.
+
+        :param client: The model client.
+        :param name: The name of the caller, e.g. the agent name.
+        :return: The wrapped client, or client itself when tracing is disabled.
+        """
+        ...
+
+    def summary(self) -> str:
+        """
+        Summarize the spans of all the turns traced so far.
+
+        :return: The time, calls and tokens per span name.
+        """
+        ...
@@ -0,0 +1,90 @@
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class AdaptiveController:
+    """Tunes the concurrency and batch size of a duplication run, AIMD style.
+
+    Every round of batches that stays under the latency target and below the load
+    caps adds one worker and batch_step rows per batch, as long as the throughput
+    of the round did not drop. A slow batch, a failed batch or a database over its
+    load cap halves both.
+    """
+
+    max_concurrency: int
+    batch_rows: int
+    max_batch_rows: int
+    target_latency_s: float
+    # active sessions on the source and targets above which the run backs off.
+    source_max_active: int | None = None
+    target_max_active: int | None = None
+    min_batch_rows: int = 100
+    clock: Callable[[], float] = time.monotonic
+    concurrency: int = field(default=1, init=False)
+    decreases: int = field(default=0, init=False)
+
+    def __post_init__(self) -> None:
+        self.batch_rows = min(
+            max(self.batch_rows, self.min_batch_rows), self.max_batch_rows
+        )
+        self.batch_step = self.batch_rows
+        self._throughput = 0.0
+        self._overloaded = False
+        self._at_cap = False
+        self._start_round()
+
+    def _start_round(self) -> None:
+        self._round_start = self.clock()
+        self._round_rows = 0
+        self._round_batches = 0
+
+    def get_batch_rows(self) -> int:
+        return self.batch_rows
+
+    def decrease(self) -> None:
+        self.concurrency = max(self.concurrency // 2, 1)
+        self.batch_rows = max(self.batch_rows // 2, self.min_batch_rows)
+        self.decreases += 1
+        self._throughput = 0.0
+        self._start_round()
+
+    def record_error(self) -> None:
+        self.decrease()
+
+    def record_batch(self, rows: int, seconds: float) -> None:
+        if seconds > self.target_latency_s:
+            self.decrease()
+            return
+
+        self._round_rows += rows
+        self._round_batches += 1
+        # one adjustment per round, each worker got to run a batch at this setting.
+        if self._round_batches < self.concurrency:
+            return
+
+        elapsed = max(self.clock() - self._round_start, 1e-9)
+        throughput = self._round_rows / elapsed
+        # past the point where more load buys more rows per second, hold.
+        if not self._overloaded and throughput >= self._throughput * 0.9:
+            self.batch_rows = min(
+                self.batch_rows + self.batch_step, self.max_batch_rows
+            )
+            if not self._at_cap:
+                self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+        self._throughput = throughput
+        self._start_round()
+
+    def update_load(
+        self, source_active: int | None, target_active: list[int | None]
+    ) -> None:
+        """Record the active sessions last sampled on the source and the targets."""
+        loads = [(source_active, self.source_max_active)]
+        loads += [(active, self.target_max_active) for active in target_active]
+        loads = [(active, cap) for active, cap in loads if active is not None and cap]
+
+        self._overloaded = any(active > cap for active, cap in loads)
+        self._at_cap = any(active >= cap for active, cap in loads)
+        if self._overloaded:
+            self.decrease()
@@ -0,0 +1,108 @@
+import uuid
+from decimal import Decimal
+from typing import Any, Callable, Sequence
+
+import pyarrow as pa
+from asyncpg.types import Attribute
+
+# Postgres type name -> arrow type, the values asyncpg decodes for these types are
+# accepted by pyarrow as is.
+ARROW_TYPES: dict[str, pa.DataType] = {
+    "bool": pa.bool_(),
+    "int2": pa.int16(),
+    "int4": pa.int32(),
+    "int8": pa.int64(),
+    "oid": pa.int64(),
+    "float4": pa.float32(),
+    "float8": pa.float64(),
+    "text": pa.string(),
+    "varchar": pa.string(),
+    "bpchar": pa.string(),
+    "char": pa.string(),
+    "name": pa.string(),
+    "json": pa.string(),
+    "jsonb": pa.string(),
+    "date": pa.date32(),
+    "time": pa.time64("us"),
+    "timestamp": pa.timestamp("us"),
+    "timestamptz": pa.timestamp("us", tz="UTC"),
+    "interval": pa.duration("us"),
+    "bytea": pa.binary(),
+}
+
+# types read through a conversion of the decoded values.
+CONVERTED_TYPES: dict[str, tuple[pa.DataType, Callable[[Any], Any]]] = {
+    # arrow decimals need a fixed precision and scale, the result columns do not
+    # carry them, the string keeps every digit.
+    "numeric": (pa.string(), str),
+    "uuid": (pa.string(), str),
+}
+
+# the values asyncpg decodes, restored from the strings of the converted types.
+RESTORED_TYPES: dict[str, Callable[[str], Any]] = {
+    "numeric": Decimal,
+    "uuid": uuid.UUID,
+}
+
+# field metadata key of the Postgres type name of a column.
+PG_TYPE = b"pg_type"
+
+
+def convert_items(converter: Callable[[Any], Any]) -> Callable[[list[Any]], Any]:
+    def convert(values: list[Any]) -> list[Any]:
+        return [None if v is None else converter(v) for v in values]
+
+    return convert
+
+
+def get_arrow_type(
+    type_name: str,
+) -> tuple[pa.DataType, Callable[[Any], Any] | None]:
+    if type_name in ARROW_TYPES:
+        return ARROW_TYPES[type_name], None
+    # array types are named after their element type with a leading underscore.
+    if type_name.startswith("_"):
+        element_type, converter = get_arrow_type(type_name[1:])
+        return pa.list_(element_type), converter and convert_items(converter)
+    return CONVERTED_TYPES.get(type_name, (pa.string(), str))
+
+
+def get_restorer(field: pa.Field) -> Callable[[Any], Any] | None:
+    """The conversion of the stored values of a field back to the values asyncpg
+    decodes, None when they are stored as decoded."""
+    type_name = (field.metadata or {}).get(PG_TYPE, b"").decode()
+    element_name = type_name.removeprefix("_")
+    restorer = RESTORED_TYPES.get(element_name)
+    if restorer and element_name != type_name:
+        return convert_items(restorer)
+    return restorer
+
+
+class ArrowConverter:
+    """Converts asyncpg records of one query to arrow record batches with the types
+    of the result columns. Types without an arrow mapping are read as strings, the
+    Postgres type of every column is kept in the field metadata."""
+
+    def __init__(self, attributes: Sequence[Attribute]) -> None:
+        fields = []
+        self.converters: list[Callable[[Any], Any] | None] = []
+
+        for attribute in attributes:
+            type_name = attribute.type.name
+            arrow_type, converter = get_arrow_type(type_name)
+            fields.append(
+                pa.field(attribute.name, arrow_type, metadata={PG_TYPE: type_name})
+            )
+            self.converters.append(converter)
+
+        self.schema = pa.schema(fields)
+
+    def to_record_batch(self, rows: Sequence[Sequence[Any]]) -> pa.RecordBatch:
+        arrays = []
+        for i, (field, converter) in enumerate(zip(self.schema, self.converters)):
+            values = [row[i] for row in rows]
+            if converter:
+                values = convert_items(converter)(values)
+            arrays.append(pa.array(values, type=field.type))
+
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
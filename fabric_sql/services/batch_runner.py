@@ -0,0 +1,138 @@
+import asyncio
+import json
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import IO, Awaitable, Callable
+
+from lagom.environment import Env
+
+
+class BatchEnv(Env):
+    # questions answered at the same time, they share the model client and the
+    # target database pool.
+    batch_concurrency: int = 8
+
+
+@dataclass
+class BatchResult:
+    index: int
+    question: str
+    answer: str | None = None
+    # the SQL executed for the answer, None if the model did not produce any.
+    sql: str | None = None
+    error: str | None = None
+    # epoch seconds
+    started_at: float = 0.0
+    duration_ms: float = 0.0
+    # model generation and query execution, repairs included.
+    generate_ms: float = 0.0
+    query_ms: float = 0.0
+    repairs: int = 0
+
+
+# fills in the answer, sql and the timings of the phases of the result.
+Answer = Callable[[BatchResult], Awaitable[None]]
+OnResult = Callable[[BatchResult], None]
+
+
+def read_questions(path: Path) -> list[str]:
+    """Read one question per line, blank lines and # comments are skipped. A
+    .jsonl file has one {"question": "..."} object per line."""
+    questions = []
+    for line in path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        questions.append(
+            json.loads(line)["question"] if path.suffix == ".jsonl" else line
+        )
+    return questions
+
+
+async def run_batch(
+    questions: list[str],
+    answer: Answer,
+    concurrency: int,
+    on_result: OnResult | None = None,
+) -> list[BatchResult]:
+    """Answer the questions, at most concurrency at a time. A failed question is
+    recorded with its error and does not stop the others."""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(index: int, question: str) -> BatchResult:
+        result = BatchResult(index, question)
+        async with semaphore:
+            result.started_at = time.time()
+            started = time.perf_counter()
+            try:
+                await answer(result)
+            except Exception as e:
+                result.error = f"{type(e).__name__}: {e}"
+            result.duration_ms = (time.perf_counter() - started) * 1000
+        if on_result:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(run(i, q) for i, q in enumerate(questions))))
+
+
+class ResultWriter:
+    """Writes the results to JSON lines as they complete, or to a Parquet file,
+    which requires pyarrow, once the batch is done."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.parquet = path.suffix == ".parquet"
+        self.results: list[BatchResult] = []
+        self.file: IO[str] | None = None
+        if self.parquet:
+            # pyarrow is optional, fail before the questions are answered.
+            import pyarrow.parquet  # noqa: F401
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = path.open("w")
+
+    def write(self, result: BatchResult) -> None:
+        if self.file is None:
+            self.results.append(result)
+            return
+        # flushed per line, the results of a run that is stopped are kept.
+        self.file.write(json.dumps(asdict(result)) + "\n")
+        self.file.flush()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            return
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # explicit types, a column that is None for every result is still a string.
+        types = {int: pa.int64(), float: pa.float64()}
+        schema = pa.schema(
+            [(f.name, types.get(f.type, pa.string())) for f in fields(BatchResult)]  # type: ignore
+        )
+        results = sorted(self.results, key=lambda r: r.index)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(
+            pa.Table.from_pylist([asdict(r) for r in results], schema=schema),
+            self.path,
+        )
+
+
+def summarize(results: list[BatchResult], seconds: float) -> str:
+    durations = sorted(r.duration_ms for r in results)
+    errors = sum(r.error is not None for r in results)
+
+    def percentile(p: float) -> float:
+        return durations[min(int(len(durations) * p), len(durations) - 1)]
+
+    summary = f"{len(results)} questions in {seconds:.1f}s, {errors} failed"
+    if durations:
+        summary += (
+            f", per question p50 {percentile(0.5) / 1000:.1f}s "
+            f"p95 {percentile(0.95) / 1000:.1f}s max {durations[-1] / 1000:.1f}s"
+        )
+    return summary
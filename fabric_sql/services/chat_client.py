@@ -1,10 +1,14 @@
 from dataclasses import dataclass
+from pathlib import Path
 
+from autogen_core.models import ChatCompletionClient
+from autogen_ext.models.cache import ChatCompletionCache
 from autogen_ext.models.openai import AzureOpenAIChatCompletionClient
 from azure.identity import DefaultAzureCredential
 from lagom.environment import Env
 
 from fabric_sql.protocols.i_chat_client import IChatClient
+from fabric_sql.services.llm_cache import DiskCacheStore, LLMCacheMode, ReplayOnlyClient
 
 
 class ChatClientEnv(Env):
@@ -12,6 +16,12 @@ class ChatClientEnv(Env):
     azure_openai_api_key: str | None = None
     azure_openai_api_version: str
     azure_openai_model_name: str
+    azure_openai_stream: bool = True
+    # off: always call the model, read_through: serve recorded responses and record
+    # the misses, replay: only serve recorded responses, misses fail.
+    azure_openai_cache_mode: LLMCacheMode = "off"
+    azure_openai_cache_dir: str = ".cache/llm"
+    azure_openai_cache_max_bytes: int = 256 * 1024 * 1024
 
 
 @dataclass
@@ -27,6 +37,15 @@ class ChatClient(IChatClient):
                 api_version=self.env.azure_openai_api_version,
             )
 
+        if self.env.azure_openai_cache_mode == "replay":
+            # the model is never called in replay mode, skip the token request.
+            return AzureOpenAIChatCompletionClient(
+                azure_endpoint=self.env.azure_openai_endpoint,
+                api_key="replay",
+                model=self.env.azure_openai_model_name,
+                api_version=self.env.azure_openai_api_version,
+            )
+
         azure_ad_token = (
             DefaultAzureCredential()
             .get_token("https://cognitiveservices.azure.com/.default")
@@ -40,8 +59,25 @@ class ChatClient(IChatClient):
             api_version=self.env.azure_openai_api_version,
         )
 
+    def get_cached_client(self, client: ChatCompletionClient) -> ChatCompletionClient:
+        if self.env.azure_openai_cache_mode == "off":
+            return client
+
+        if self.env.azure_openai_cache_mode == "replay":
+            client = ReplayOnlyClient(client)
+
+        # the request hash covers the messages and tools, the model is the folder.
+        store = DiskCacheStore(
+            Path(self.env.azure_openai_cache_dir) / self.env.azure_openai_model_name,
+            self.env.azure_openai_cache_max_bytes,
+        )
+        return ChatCompletionCache(client, store)
+
     def __post_init__(self) -> None:
-        self.model_client = self.get_client()
+        self.model_client = self.get_cached_client(self.get_client())
 
-    def get_model_client(self) -> AzureOpenAIChatCompletionClient:
+    def get_model_client(self) -> ChatCompletionClient:
         return self.model_client
+
+    def is_streaming(self) -> bool:
+        return self.env.azure_openai_stream
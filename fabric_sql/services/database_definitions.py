@@ -1,25 +1,169 @@
-from dataclasses import dataclass
+import functools
+import hashlib
+import os
+import pickle
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
 
 import yaml
-from tabulate import tabulate
+from lagom.environment import Env
 
 from fabric_sql import DB_DEFINITION_PATH
 from fabric_sql.models.database_definition import DatabaseDefinition
 from fabric_sql.models.table_definition import TableDefinition
 from fabric_sql.models.view_definition import ViewDefinition
-from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
+from fabric_sql.protocols.i_database_definitions import (
+    DEFINITION_FORMATS,
+    DefinitionsFormat,
+    IDatabaseDefinitions,
+)
 from fabric_sql.protocols.i_target_database import ITargetDatabase
 
+# bump when the cached format or the definition models change.
+CACHE_VERSION = 1
+
+# the libyaml loader is much faster than the pure python one.
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+class DatabaseDefinitionsEnv(Env):
+    # folder of the validated definitions cache, empty to always parse the YAML.
+    db_definitions_cache_dir: str = ".cache/definitions"
+    # compact or grid, how the schema is rendered into the system messages.
+    db_definitions_format: str = "compact"
+
+
+# information_schema type names spelled the way they are written in queries.
+SHORT_TYPES = {
+    "character varying": "varchar",
+    "character": "char",
+    "integer": "int",
+    "boolean": "bool",
+    "double precision": "float8",
+    "timestamp without time zone": "timestamp",
+    "timestamp with time zone": "timestamptz",
+    "time without time zone": "time",
+    "time with time zone": "timetz",
+}
+# the length or precision only tells the model something for these types.
+SIZED_TYPES = ("character varying", "character", "numeric")
+
+
+def one_line(text: str) -> str:
+    # folded YAML descriptions end with a newline, collapse all the whitespace.
+    return " ".join(text.split())
+
+
+def compact_type(column: dict[str, Any]) -> str:
+    data_type = str(column.get("data_type") or "")
+    short = SHORT_TYPES.get(data_type, data_type)
+    full_type = str(column.get("full_data_type") or "")
+    if data_type in SIZED_TYPES and full_type.startswith(data_type):
+        short += full_type[len(data_type) :]
+    return short
+
+
+def ordinal(column: dict[str, Any]) -> int:
+    try:
+        return int(column.get("ordinal_position") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+@functools.cache
+def _get_encoding() -> Any:
+    # tiktoken comes with the openai extra but downloads its encodings on first
+    # use, offline the count falls back to the usual 4 characters per token.
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def parse_definition(content: bytes) -> DatabaseDefinition:
+    return DatabaseDefinition(**yaml.load(content, Loader=YamlLoader))
+
+
+def load_definition(path: Path, cache_dir: str) -> DatabaseDefinition:
+    """Load the definitions file, the validated model is cached so the YAML is only
+    parsed again after the file changed."""
+    if not cache_dir:
+        return parse_definition(path.read_bytes())
+
+    stat = path.stat()
+    path_key = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    cache_path = Path(cache_dir) / f"{path.stem}_{path_key}.pickle"
+
+    cached = None
+    try:
+        with open(cache_path, "rb") as file:
+            cached = pickle.load(file)
+    except FileNotFoundError:
+        pass
+    except Exception:
+        # written by another version of the models, parse the file again.
+        cached = None
+
+    if cached and cached["version"] == CACHE_VERSION:
+        if (cached["mtime_ns"], cached["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return cached["definition"]
+
+    content = path.read_bytes()
+    content_hash = hashlib.sha256(content).hexdigest()
+    if (
+        cached
+        and cached["version"] == CACHE_VERSION
+        and (cached["content_hash"] == content_hash)
+    ):
+        # touched but not edited, keep the model and refresh the stat below.
+        definition = cached["definition"]
+    else:
+        definition = parse_definition(content)
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as file:
+            pickle.dump(
+                {
+                    "version": CACHE_VERSION,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "content_hash": content_hash,
+                    "definition": definition,
+                },
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        tmp_path.replace(cache_path)
+    except OSError:
+        # a read only folder only costs the parse on the next start.
+        pass
+
+    return definition
+
 
 @dataclass
 class DatabaseDefinitions(IDatabaseDefinitions):
     target_db: ITargetDatabase
     view_definitions: dict[str, list[dict[str, str]]]
+    env: DatabaseDefinitionsEnv = field(default_factory=DatabaseDefinitionsEnv)
 
     def __post_init__(self) -> None:
-        with open(DB_DEFINITION_PATH, "r") as file:
-            definitions = yaml.safe_load(file)
-            self.defn = DatabaseDefinition(**definitions)
+        self.defn = load_definition(
+            Path(DB_DEFINITION_PATH), self.env.db_definitions_cache_dir
+        )
+        self.definitions: str | None = None
 
     def get_view_definitions(self) -> list[ViewDefinition]:
         return self.defn.views
@@ -39,6 +183,55 @@ class DatabaseDefinitions(IDatabaseDefinitions):
         return self.view_definitions
 
     async def get_definitions(self) -> str:
+        if self.definitions is None:
+            self.definitions = await self.render_definitions()
+        return self.definitions
+
+    async def render_definitions(self, format: DefinitionsFormat | None = None) -> str:
+        format = format or self.env.db_definitions_format  # type: ignore
+        if format not in DEFINITION_FORMATS:
+            raise ValueError(
+                f"Unknown definitions format {format}, "
+                f"expected one of {', '.join(DEFINITION_FORMATS)}"
+            )
+        if format == "grid":
+            return await self.render_grid()
+        return await self.render_compact()
+
+    async def render_compact(self) -> str:
+        """One line per column and per view with its typed columns. Everything is
+        sorted so the rendering, and with it the system message prefix the model
+        provider caches, is byte identical across sessions."""
+        columns = [
+            f"{c.name}: {one_line(c.description)}"
+            for c in sorted(self.defn.columns, key=lambda c: c.name)
+        ]
+        view_schemas = await self.get_view_schemas()
+        views = []
+        for view in sorted(self.defn.views, key=lambda v: (v.db_schema, v.name)):
+            view_name = f"{view.db_schema}.{view.name}"
+            cols = sorted(view_schemas.get(view_name) or [], key=ordinal)
+            typed = ", ".join(
+                f"{c.get('column_name')} {compact_type(c)}".rstrip() for c in cols
+            )
+            views.append(f"{view_name}({typed}) -- {one_line(view.description)}")
+
+        return (
+            "Columns, name: description\n"
+            + "\n".join(columns)
+            + "\n\nViews, schema.view(column type, ...) -- description\n"
+            + "\n".join(views)
+        )
+
+    async def count_definition_tokens(self) -> dict[str, int]:
+        return {
+            format: count_tokens(await self.render_definitions(format))
+            for format in DEFINITION_FORMATS
+        }
+
+    async def render_grid(self) -> str:
+        from tabulate import tabulate
+
         col_definitions = tabulate(
             [c.str_definition() for c in self.defn.columns],
             headers="keys",
@@ -1,11 +1,247 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Sequence, TypeVar
+
+from lagom.environment import Env
+
 from fabric_sql.protocols.i_duplicate_db_service import (
     DuplicateDBServiceConfig,
     IDuplicateDBService,
+    SnapshotManifest,
+    SnapshotTable,
+)
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    Workload,
 )
-from fabric_sql.protocols.i_postgres_db_service import IPostgresDBService
+from fabric_sql.services.adaptive_controller import AdaptiveController
+from fabric_sql.services.fan_out import PipelineMetrics, TargetWriter
+
+T = TypeVar("T")
+
+# direct partitions of a table.
+PARTITIONS_QUERY = """
+SELECT
+    n.nspname AS db_schema,
+    c.relname AS name,
+    pg_get_expr(c.relpartbound, c.oid) AS bound,
+    CASE WHEN c.relkind = 'p' THEN pg_get_partkeydef(c.oid) END AS partition_key,
+    obj_description(c.oid, 'pg_class') AS comment
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE i.inhparent = '{schema_name}.{table_name}'::regclass
+ORDER BY c.relname;
+"""
+
+# the rows of a partition and the transactions that wrote them, every insert,
+# update or delete changes it. xmin is replicated, unlike the write statistics,
+# so it is the same on a replica.
+FINGERPRINT_QUERY = """
+SELECT count(*) || ':' || coalesce(sum(xmin::text::bigint), 0) AS fingerprint
+FROM {qualified_name};
+"""
+
+# marks the fingerprint of the copied data in the comment of a target table.
+FINGERPRINT_PREFIX = "fabric_sql:"
+
+ACTIVE_SESSIONS_QUERY = """
+SELECT count(*) AS active FROM pg_stat_activity
+WHERE state = 'active' AND datname = current_database();
+"""
+
+
+@dataclass
+class Partition:
+    db_schema: str
+    name: str
+    parent: str
+    # FOR VALUES ... or DEFAULT
+    bound: str
+    # set when the partition is partitioned itself.
+    partition_key: str | None
+    # of the source data, read in the snapshot the partition is copied from.
+    fingerprint: str | None = None
+    comment: str | None = None
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{self.db_schema}.{self.name}"
+
+    @property
+    def create_statement(self) -> str:
+        statement = (
+            f"CREATE TABLE {self.qualified_name} PARTITION OF {self.parent} "
+            f"{self.bound}"
+        )
+        if self.partition_key:
+            statement += f" PARTITION BY {self.partition_key}"
+        return statement + ";"
+
+
+class DuplicateDBEnv(Env):
+    # rows read from the source per batch when copying to several targets.
+    dup_batch_rows: int = 1000
+    # batches buffered per target before the target applies backpressure.
+    dup_queue_batches: int = 8
+    # when set, batches a slow target cannot keep up with are spooled to this
+    # folder instead of holding back the source and the other targets.
+    dup_spool_dir: str | None = None
+    # tables copied at a time, above 1 the readers share one exported snapshot of
+    # the source. The source pool needs a connection more than this for the
+    # coordinator transaction.
+    dup_parallel_tables: int = 1
+    # tune the tables in flight (up to dup_parallel_tables) and the rows per batch
+    # (from dup_batch_rows up to dup_max_batch_rows) from the observed batches.
+    dup_adaptive: bool = False
+    dup_max_batch_rows: int = 10_000
+    # a batch slower than this makes the run back off.
+    dup_target_batch_seconds: float = 2.0
+    # back off while more sessions than this are active on the source or a target.
+    dup_source_max_active: int | None = None
+    dup_target_max_active: int | None = None
+    # how often the active sessions are sampled while tables are in flight.
+    dup_load_sample_seconds: float = 5.0
+    # partitions of a partitioned table copied at a time.
+    dup_parallel_partitions: int = 4
+    # keep the partitions on the target whose source data did not change since
+    # they were copied, judged by the row count and writing transactions.
+    dup_skip_unchanged_partitions: bool = False
+
+
+@dataclass
+class DuplicateDBService(IDuplicateDBService):
+    env: DuplicateDBEnv = field(default_factory=DuplicateDBEnv)
+
+    def get_controller(self) -> AdaptiveController | None:
+        if not self.env.dup_adaptive:
+            return None
+        return AdaptiveController(
+            max_concurrency=self.env.dup_parallel_tables,
+            batch_rows=self.env.dup_batch_rows,
+            max_batch_rows=self.env.dup_max_batch_rows,
+            target_latency_s=self.env.dup_target_batch_seconds,
+            source_max_active=self.env.dup_source_max_active,
+            target_max_active=self.env.dup_target_max_active,
+        )
 
+    @staticmethod
+    async def active_sessions(db: IPostgresDBService) -> int | None:
+        """Sessions running a query on the database, None if it cannot be read."""
+        # query() prints a failure and returns None, one missed sample only keeps
+        # the previous load decision.
+        async with db:
+            rows = await db.query(ACTIVE_SESSIONS_QUERY)
+        if not rows:
+            return None
+        return int(rows[0]["active"])
+
+    async def update_load(
+        self,
+        controller: AdaptiveController,
+        source_db: IPostgresDBService,
+        target_dbs: Sequence[IPostgresDBService],
+    ) -> None:
+        if (
+            controller.source_max_active is None
+            and controller.target_max_active is None
+        ):
+            return
+        source_active = (
+            await self.active_sessions(source_db)
+            if controller.source_max_active
+            else None
+        )
+        target_active = (
+            [await self.active_sessions(db) for db in target_dbs]
+            if controller.target_max_active
+            else []
+        )
+        controller.update_load(source_active, target_active)
+
+    async def for_each_table(
+        self,
+        source_db: IPostgresDBService,
+        config: list[DuplicateDBServiceConfig],
+        copy: Callable[[DuplicateDBServiceConfig, str | None], Awaitable[T]],
+        controller: AdaptiveController | None = None,
+        target_dbs: Sequence[IPostgresDBService] = (),
+    ) -> list[T]:
+        """Run copy for every configured table, dup_parallel_tables at a time or as
+        many as the controller allows. Parallel copies get the id of a snapshot
+        exported by a coordinator transaction, so every reader sees the source at
+        the same point in time."""
+        if controller:
+            if controller.max_concurrency <= 1:
+                return await self.run_adaptive(
+                    source_db, config, copy, controller, target_dbs, None
+                )
+            async with source_db:
+                async with source_db.exported_snapshot() as snapshot:
+                    return await self.run_adaptive(
+                        source_db, config, copy, controller, target_dbs, snapshot
+                    )
+
+        if self.env.dup_parallel_tables <= 1:
+            return [await copy(cfg, None) for cfg in config]
+
+        semaphore = asyncio.Semaphore(self.env.dup_parallel_tables)
+
+        async def run(cfg: DuplicateDBServiceConfig, snapshot: str) -> T:
+            async with semaphore:
+                return await copy(cfg, snapshot)
+
+        async with source_db:
+            async with source_db.exported_snapshot() as snapshot:
+                return list(
+                    await asyncio.gather(*(run(cfg, snapshot) for cfg in config))
+                )
+
+    async def run_adaptive(
+        self,
+        source_db: IPostgresDBService,
+        config: list[DuplicateDBServiceConfig],
+        copy: Callable[[DuplicateDBServiceConfig, str | None], Awaitable[T]],
+        controller: AdaptiveController,
+        target_dbs: Sequence[IPostgresDBService],
+        snapshot: str | None,
+    ) -> list[T]:
+        results: dict[int, T] = {}
+        pending = list(enumerate(config))
+        running: dict[asyncio.Future[T], int] = {}
+        try:
+            while pending or running:
+                # the load is sampled before the tables that would add to it, and
+                # every dup_load_sample_seconds while they run, so a load spike
+                # shrinks the batches of the tables in flight too.
+                await self.update_load(controller, source_db, target_dbs)
+                while pending and (
+                    not running or len(running) < controller.concurrency
+                ):
+                    i, cfg = pending.pop(0)
+                    running[asyncio.ensure_future(copy(cfg, snapshot))] = i
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.env.dup_load_sample_seconds,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    results[running.pop(task)] = task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+        print(
+            f"Adaptive run ended at {controller.concurrency} tables in flight and "
+            f"{controller.batch_rows} rows per batch, backed off "
+            f"{controller.decreases} times"
+        )
+        return [results[i] for i in range(len(config))]
 
-class DuplicateDBService(IDuplicateDBService):
     async def generate_create_table_statement(
         self, db_source: IPostgresDBService, schema_name: str, table_name: str
     ) -> str:
@@ -120,7 +356,8 @@ class DuplicateDBService(IDuplicateDBService):
                 GROUP BY table_schema, table_name;
                 """
 
-                table_definition = await db_source.query(table_def_query)
+                # the view was just created, a replica may not have it yet.
+                table_definition = await db_source.query(table_def_query, "write")
 
                 if not table_definition:
                     raise ValueError(
@@ -182,6 +419,231 @@ class DuplicateDBService(IDuplicateDBService):
 
         print(f"Successfully copied materialized view {schema_name}.{view_name}")
 
+    @staticmethod
+    def get_fingerprint(value: str) -> str:
+        return FINGERPRINT_PREFIX + hashlib.sha256(value.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _nullable(value: Any) -> str | None:
+        return None if value is None or value == "None" else str(value)
+
+    async def get_partition_key(
+        self, db_source: IPostgresDBService, schema_name: str, table_name: str
+    ) -> str | None:
+        """The partition key of a partitioned table, None for any other table."""
+        async with db_source:
+            result = await db_source.query(
+                f"""
+                SELECT pg_get_partkeydef(c.oid) AS partition_key
+                FROM pg_partitioned_table p
+                JOIN pg_class c ON c.oid = p.partrelid
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = '{schema_name}' AND c.relname = '{table_name}';
+                """
+            )
+        return self._nullable(result[0]["partition_key"]) if result else None
+
+    async def get_partitions(
+        self,
+        db: IPostgresDBService,
+        schema_name: str,
+        table_name: str,
+        workload: Workload = "read",
+    ) -> list[Partition]:
+        """All partitions of a partitioned table, each after its parent."""
+        async with db:
+            rows = await db.query(
+                PARTITIONS_QUERY.format(schema_name=schema_name, table_name=table_name),
+                workload,
+            )
+
+        partitions: list[Partition] = []
+        for row in rows:
+            partition = Partition(
+                db_schema=row["db_schema"],
+                name=row["name"],
+                parent=f"{schema_name}.{table_name}",
+                bound=row["bound"],
+                partition_key=self._nullable(row["partition_key"]),
+                comment=self._nullable(row["comment"]),
+            )
+            partitions.append(partition)
+            if partition.partition_key:
+                partitions += await self.get_partitions(
+                    db, partition.db_schema, partition.name, workload
+                )
+        return partitions
+
+    async def read_fingerprint(
+        self, db: IPostgresDBService, partition: Partition, snapshot: str
+    ) -> None:
+        async with db:
+            async for rows in db.fetch_batches(
+                FINGERPRINT_QUERY.format(qualified_name=partition.qualified_name),
+                snapshot=snapshot,
+            ):
+                partition.fingerprint = self.get_fingerprint(rows[0]["fingerprint"])
+
+    async def set_fingerprint(
+        self, db: IPostgresDBService, qualified_name: str, fingerprint: str
+    ) -> None:
+        async with db:
+            await db.execute(f"COMMENT ON TABLE {qualified_name} IS '{fingerprint}';")
+
+    async def sync_partitions(
+        self,
+        db_target: IPostgresDBService,
+        schema_name: str,
+        table_name: str,
+        parent_statement: str,
+        partitions: list[Partition],
+    ) -> set[str]:
+        """Bring the partitioned table of the target to the layout of the source
+        and return the leaf partitions that need their data copied."""
+        leaves = {p.qualified_name for p in partitions if not p.partition_key}
+        parent_fingerprint = self.get_fingerprint(parent_statement)
+
+        existing: dict[str, Partition] | None = None
+        if self.env.dup_skip_unchanged_partitions:
+            async with db_target:
+                result = await db_target.query(
+                    f"""
+                    SELECT obj_description(c.oid, 'pg_class') AS comment
+                    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+                    WHERE n.nspname = '{schema_name}' AND c.relname = '{table_name}'
+                    AND c.relkind = 'p';
+                    """,
+                    "write",
+                )
+            if result and self._nullable(result[0]["comment"]) == parent_fingerprint:
+                existing = {
+                    p.qualified_name: p
+                    for p in await self.get_partitions(
+                        db_target, schema_name, table_name, "write"
+                    )
+                }
+
+        if existing is None:
+            await self.create_table(
+                db_target, schema_name, table_name, parent_statement
+            )
+            for partition in partitions:
+                await self.create_table(
+                    db_target,
+                    partition.db_schema,
+                    partition.name,
+                    partition.create_statement,
+                )
+            await self.set_fingerprint(
+                db_target, f"{schema_name}.{table_name}", parent_fingerprint
+            )
+            return leaves
+
+        source_names = {p.qualified_name for p in partitions}
+        async with db_target:
+            for name in existing.keys() - source_names:
+                await db_target.execute(f"DROP TABLE IF EXISTS {name};")
+
+        to_copy: set[str] = set()
+        recreated: set[str] = set()
+        for partition in partitions:
+            current = existing.get(partition.qualified_name)
+            if (
+                current is None
+                or partition.parent in recreated
+                or current.bound != partition.bound
+                or current.partition_key != partition.partition_key
+            ):
+                await self.create_table(
+                    db_target,
+                    partition.db_schema,
+                    partition.name,
+                    partition.create_statement,
+                )
+                recreated.add(partition.qualified_name)
+            elif current.comment == partition.fingerprint:
+                continue
+            elif partition.qualified_name in leaves:
+                async with db_target:
+                    await db_target.execute(
+                        f"TRUNCATE TABLE {partition.qualified_name};"
+                    )
+            if partition.qualified_name in leaves:
+                to_copy.add(partition.qualified_name)
+        return to_copy
+
+    async def copy_partitioned_table(
+        self,
+        source_db: IPostgresDBService,
+        target_dbs: list[IPostgresDBService],
+        schema_name: str,
+        table_name: str,
+        partition_key: str,
+        snapshot: str | None = None,
+    ) -> None:
+        """Recreate a partitioned table with its partitions on the targets and copy
+        the leaf partitions dup_parallel_partitions at a time, instead of one scan
+        through the parent. With dup_skip_unchanged_partitions the fingerprint of
+        the source data of each copied partition is kept in its comment on the
+        target and the partitions whose fingerprint still matches are not copied
+        again. The fingerprints are read in the snapshot the partitions are copied
+        from, so they describe the copied data."""
+        create_statement = await self.generate_create_table_statement(
+            source_db, schema_name, table_name
+        )
+        parent_statement = (
+            f"{create_statement.strip().rstrip(';')} PARTITION BY {partition_key};"
+        )
+        partitions = await self.get_partitions(source_db, schema_name, table_name)
+        leaves = [p for p in partitions if not p.partition_key]
+        semaphore = asyncio.Semaphore(max(self.env.dup_parallel_partitions, 1))
+
+        async def copy_partitions(snapshot: str | None) -> None:
+            if snapshot and self.env.dup_skip_unchanged_partitions:
+
+                async def read_fingerprint(partition: Partition) -> None:
+                    async with semaphore:
+                        await self.read_fingerprint(source_db, partition, snapshot)
+
+                await asyncio.gather(*(read_fingerprint(p) for p in leaves))
+
+            targets: dict[str, list[IPostgresDBService]] = {
+                p.qualified_name: [] for p in leaves
+            }
+            for db in target_dbs:
+                for name in await self.sync_partitions(
+                    db, schema_name, table_name, parent_statement, partitions
+                ):
+                    targets[name].append(db)
+
+            async def copy(partition: Partition) -> None:
+                dbs = targets[partition.qualified_name]
+                if not dbs:
+                    print(f"Skipped unchanged partition {partition.qualified_name}")
+                    return
+                async with semaphore:
+                    await self.copy_table_data_to_targets(
+                        source_db, dbs, partition.db_schema, partition.name, snapshot
+                    )
+                if partition.fingerprint:
+                    for db in dbs:
+                        await self.set_fingerprint(
+                            db, partition.qualified_name, partition.fingerprint
+                        )
+
+            await asyncio.gather(*(copy(p) for p in leaves))
+
+        if snapshot or (
+            self.env.dup_parallel_partitions <= 1
+            and not self.env.dup_skip_unchanged_partitions
+        ):
+            await copy_partitions(snapshot)
+            return
+
+        async with source_db:
+            async with source_db.exported_snapshot() as snapshot:
+                await copy_partitions(snapshot)
+
     async def create_table(
         self,
         db_target: IPostgresDBService,
@@ -199,37 +661,105 @@ class DuplicateDBService(IDuplicateDBService):
         db_target: IPostgresDBService,
         schema_name: str,
         table_name: str,
-    ) -> None:
-        async with db_target:
-            async with db_source:
-                data_result = await db_source.query(
-                    f"SELECT * FROM {schema_name}.{table_name};"
-                )
+        snapshot: str | None = None,
+    ) -> PipelineMetrics:
+        """Copy the table through a reader and a writer task connected by a queue
+        of at most dup_queue_batches batches, so reading the source and writing the
+        target overlap while the queue bounds the rows held in memory."""
+        return await self.copy_table_data_to_targets(
+            db_source, [db_target], schema_name, table_name, snapshot
+        )
 
-                if data_result:
-                    columns = list(data_result[0].keys())
-                    column_names = ", ".join(columns)
-
-                    for row in data_result:
-                        values = []
-                        for col in columns:
-                            value = row[col]
-                            if value is None or value == "None":
-                                values.append("NULL")
-                            elif isinstance(value, str) and value != "NULL":
-                                # Escape single quotes in strings
-                                escaped_value = value.replace("'", "''")
-                                values.append(f"'{escaped_value}'")
-                            else:
-                                values.append(str(value))
-
-                        values_str = ", ".join(values)
-                        insert_query = (
-                            f"INSERT INTO {schema_name}.{table_name} ({column_names}) "
-                            f"VALUES ({values_str});"
-                        )
+    @staticmethod
+    def format_value(value: Any) -> str:
+        if value is None or value == "None":
+            return "NULL"
+        if isinstance(value, str) and value != "NULL":
+            # Escape single quotes in strings
+            escaped_value = value.replace("'", "''")
+            return f"'{escaped_value}'"
+        return str(value)
+
+    def build_insert_statement(
+        self, schema_name: str, table_name: str, rows: list[dict[str, Any]]
+    ) -> str:
+        columns = list(rows[0].keys())
+        column_names = ", ".join(columns)
+        values = ", ".join(
+            f"({', '.join(self.format_value(row[col]) for col in columns)})"
+            for row in rows
+        )
+        return (
+            f"INSERT INTO {schema_name}.{table_name} ({column_names}) VALUES {values};"
+        )
 
-                        await db_target.execute(insert_query)
+    async def copy_table_data_to_targets(
+        self,
+        db_source: IPostgresDBService,
+        db_targets: list[IPostgresDBService],
+        schema_name: str,
+        table_name: str,
+        snapshot: str | None = None,
+        controller: AdaptiveController | None = None,
+    ) -> PipelineMetrics:
+        """Read the table once and write every batch to all the targets
+        concurrently, each target through its own bounded queue. With a controller
+        the batch size follows it, and each batch reports how long it took to read
+        and hand to the targets, which includes their backpressure."""
+        spool_dir = Path(self.env.dup_spool_dir) if self.env.dup_spool_dir else None
+        writers = [
+            TargetWriter(db, self.env.dup_queue_batches, spool_dir, controller)
+            for db in db_targets
+        ]
+
+        metrics = PipelineMetrics()
+
+        async def read_source() -> None:
+            async with db_source:
+                started = time.monotonic()
+                async for rows in db_source.fetch_batches(
+                    f"SELECT * FROM {schema_name}.{table_name};",
+                    controller.get_batch_rows
+                    if controller
+                    else self.env.dup_batch_rows,
+                    snapshot=snapshot,
+                ):
+                    metrics.read_seconds += time.monotonic() - started
+                    metrics.rows += len(rows)
+                    metrics.batches += 1
+                    statement = self.build_insert_statement(
+                        schema_name, table_name, rows
+                    )
+                    for writer in writers:
+                        await writer.put(statement)
+                    if controller:
+                        controller.record_batch(len(rows), time.monotonic() - started)
+                    started = time.monotonic()
+
+            for writer in writers:
+                await writer.close()
+
+        tasks = [asyncio.ensure_future(read_source())]
+        tasks += [asyncio.ensure_future(writer.run()) for writer in writers]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # a failed target must not leave the reader blocked on its queue.
+            for task in tasks:
+                task.cancel()
+
+        for writer in writers:
+            metrics.blocked_seconds += writer.blocked_seconds
+            metrics.write_seconds += writer.write_seconds / len(writers)
+            metrics.idle_seconds += writer.idle_seconds / len(writers)
+            metrics.max_queue_depth = max(
+                metrics.max_queue_depth, writer.max_queue_depth
+            )
+            if writer.spooled:
+                print(f"Spooled {writer.spooled} batches of {schema_name}.{table_name}")
+
+        print(f"Copied {schema_name}.{table_name}: {metrics.summary()}")
+        return metrics
 
     async def copy_materialized_view_as_table(
         self,
@@ -256,18 +786,90 @@ class DuplicateDBService(IDuplicateDBService):
             f"Successfully copied materialized view {schema_name}.{view_name} as table"
         )
 
+    async def duplicate_to_targets(
+        self,
+        source_db: IPostgresDBService,
+        target_dbs: list[IPostgresDBService],
+        config: list[DuplicateDBServiceConfig],
+    ) -> None:
+        async def copy(cfg: DuplicateDBServiceConfig, snapshot: str | None) -> None:
+            if not cfg.is_view and (
+                partition_key := await self.get_partition_key(
+                    source_db, cfg.db_schema, cfg.tbl_view
+                )
+            ):
+                await self.copy_partitioned_table(
+                    source_db,
+                    target_dbs,
+                    cfg.db_schema,
+                    cfg.tbl_view,
+                    partition_key,
+                    snapshot,
+                )
+                print(
+                    f"Successfully copied {cfg.db_schema}.{cfg.tbl_view} "
+                    f"to {len(target_dbs)} targets"
+                )
+                return
+
+            if cfg.is_view:
+                create_statement = (
+                    await self.generate_create_table_from_materialized_view_statement(
+                        source_db, cfg.db_schema, cfg.tbl_view
+                    )
+                )
+            else:
+                create_statement = await self.generate_create_table_statement(
+                    source_db, cfg.db_schema, cfg.tbl_view
+                )
+
+            await asyncio.gather(
+                *(
+                    self.create_table(db, cfg.db_schema, cfg.tbl_view, create_statement)
+                    for db in target_dbs
+                )
+            )
+            await self.copy_table_data_to_targets(
+                source_db, target_dbs, cfg.db_schema, cfg.tbl_view, snapshot, controller
+            )
+            print(
+                f"Successfully copied {cfg.db_schema}.{cfg.tbl_view} "
+                f"to {len(target_dbs)} targets"
+            )
+
+        controller = self.get_controller()
+        await self.for_each_table(source_db, config, copy, controller, target_dbs)
+
     async def duplicate(
         self,
         source_db: IPostgresDBService,
-        target_db: IPostgresDBService,
+        target_db: IPostgresDBService | list[IPostgresDBService],
         config: list[DuplicateDBServiceConfig],
     ) -> None:
+        target_dbs = target_db if isinstance(target_db, list) else [target_db]
+        if (
+            len(target_dbs) > 1
+            or self.env.dup_parallel_tables > 1
+            or self.env.dup_adaptive
+        ):
+            # parallel copies read in batches at the shared source snapshot.
+            await self.duplicate_to_targets(source_db, target_dbs, config)
+            return
+        target_db = target_dbs[0]
+
         for cfg in config:
             if cfg.is_view:
                 # Handle materialized view - create as regular table
                 await self.copy_materialized_view_as_table(
                     source_db, target_db, cfg.db_schema, cfg.tbl_view
                 )
+            elif partition_key := await self.get_partition_key(
+                source_db, cfg.db_schema, cfg.tbl_view
+            ):
+                await self.copy_partitioned_table(
+                    source_db, [target_db], cfg.db_schema, cfg.tbl_view, partition_key
+                )
+                print(f"Successfully copied table {cfg.db_schema}.{cfg.tbl_view}")
             else:
                 # Handle regular table
                 create_statement = await self.generate_create_table_statement(
@@ -280,3 +882,77 @@ class DuplicateDBService(IDuplicateDBService):
                     source_db, target_db, cfg.db_schema, cfg.tbl_view
                 )
                 print(f"Successfully copied table {cfg.db_schema}.{cfg.tbl_view}")
+
+    async def export_snapshot(
+        self,
+        source_db: IPostgresDBService,
+        config: list[DuplicateDBServiceConfig],
+        snapshot_dir: Path,
+    ) -> SnapshotManifest:
+        # pyarrow is optional, only needed for snapshots.
+        from fabric_sql.services.parquet_snapshot import write_parquet
+
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+        async def export(
+            cfg: DuplicateDBServiceConfig, snapshot: str | None
+        ) -> SnapshotTable:
+            if cfg.is_view:
+                create_statement = (
+                    await self.generate_create_table_from_materialized_view_statement(
+                        source_db, cfg.db_schema, cfg.tbl_view
+                    )
+                )
+            else:
+                create_statement = await self.generate_create_table_statement(
+                    source_db, cfg.db_schema, cfg.tbl_view
+                )
+
+            file = f"{cfg.db_schema}.{cfg.tbl_view}.parquet"
+            async with source_db:
+                rows = await write_parquet(
+                    source_db.query_arrow(
+                        f"SELECT * FROM {cfg.db_schema}.{cfg.tbl_view}",
+                        snapshot=snapshot,
+                    ),
+                    snapshot_dir / file,
+                )
+
+            print(f"Exported {rows} rows of {cfg.db_schema}.{cfg.tbl_view}")
+            return SnapshotTable(
+                db_schema=cfg.db_schema,
+                name=cfg.tbl_view,
+                create_statement=create_statement,
+                file=file if rows else None,
+                rows=rows,
+            )
+
+        tables = await self.for_each_table(source_db, config, export)
+
+        # written last, a snapshot without a manifest is incomplete.
+        manifest = SnapshotManifest(
+            created_at=datetime.now(timezone.utc), tables=tables
+        )
+        (snapshot_dir / "manifest.json").write_text(manifest.model_dump_json(indent=2))
+        return manifest
+
+    async def load_snapshot(
+        self, target_db: IPostgresDBService, snapshot_dir: Path
+    ) -> None:
+        from fabric_sql.services.parquet_snapshot import read_parquet
+
+        manifest = SnapshotManifest.model_validate_json(
+            (snapshot_dir / "manifest.json").read_text()
+        )
+
+        for table in manifest.tables:
+            await self.create_table(
+                target_db, table.db_schema, table.name, table.create_statement
+            )
+            if table.file:
+                async with target_db:
+                    for columns, records in read_parquet(snapshot_dir / table.file):
+                        await target_db.copy_records(
+                            table.db_schema, table.name, columns, records
+                        )
+            print(f"Loaded {table.rows} rows into {table.db_schema}.{table.name}")
@@ -0,0 +1,139 @@
+import asyncio
+import json
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO
+
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    QueryException,
+)
+from fabric_sql.services.adaptive_controller import AdaptiveController
+
+
+@dataclass
+class PipelineMetrics:
+    """Where the time of one table copy went. A reader blocked on full queues
+    means the targets are the bottleneck, writers idle on empty queues mean the
+    source is."""
+
+    rows: int = 0
+    batches: int = 0
+    # reading batches from the source.
+    read_seconds: float = 0.0
+    # the reader waiting for room in the target queues.
+    blocked_seconds: float = 0.0
+    # executing batches, averaged over the targets.
+    write_seconds: float = 0.0
+    # the writers waiting for batches, averaged over the targets.
+    idle_seconds: float = 0.0
+    max_queue_depth: int = 0
+
+    @property
+    def bottleneck(self) -> str:
+        return "target" if self.blocked_seconds > self.idle_seconds else "source"
+
+    def summary(self) -> str:
+        return (
+            f"{self.rows} rows in {self.batches} batches, "
+            f"read {self.read_seconds:.2f}s (blocked {self.blocked_seconds:.2f}s), "
+            f"write {self.write_seconds:.2f}s (idle {self.idle_seconds:.2f}s), "
+            f"max queue {self.max_queue_depth}, bottleneck {self.bottleneck}"
+        )
+
+
+class TargetWriter:
+    """Executes the statements of one fan-out target from a bounded queue.
+
+    Without a spool folder a full queue blocks the reader, so the slowest target
+    sets the pace. With a spool folder the statements that do not fit in the queue
+    are appended to a local file and executed after the source was read, so a slow
+    target neither stalls the source nor the other targets.
+
+    A failed batch is retried with backoff, an INSERT is atomic so a retry cannot
+    duplicate rows, and raised once the retries are used up. With an adaptive
+    controller every failure is reported to it so the run backs off first.
+    """
+
+    retries = 2
+
+    def __init__(
+        self,
+        db: IPostgresDBService,
+        queue_size: int,
+        spool_dir: Path | None = None,
+        controller: AdaptiveController | None = None,
+    ) -> None:
+        self.db = db
+        self.controller = controller
+        self.queue: asyncio.Queue[str | None] = asyncio.Queue(queue_size)
+        self.spool_dir = spool_dir
+        self.spool: IO[str] | None = None
+        self.spooled = 0
+        self.blocked_seconds = 0.0
+        self.write_seconds = 0.0
+        self.idle_seconds = 0.0
+        self.max_queue_depth = 0
+
+    async def put(self, statement: str) -> None:
+        if self.spool_dir is None:
+            started = time.monotonic()
+            await self.queue.put(statement)
+            self.blocked_seconds += time.monotonic() - started
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+            return
+
+        # once spooling, keep spooling so the statements stay in order.
+        if self.spool is None and not self.queue.full():
+            self.queue.put_nowait(statement)
+            self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+            return
+
+        if self.spool is None:
+            self.spool_dir.mkdir(parents=True, exist_ok=True)
+            self.spool = tempfile.TemporaryFile("w+", dir=self.spool_dir)
+        self.spool.write(json.dumps(statement) + "\n")
+        self.spooled += 1
+
+    async def close(self) -> None:
+        """Signal that the source was read completely."""
+        await self.queue.put(None)
+
+    async def execute(self, statement: str) -> None:
+        attempt = 0
+        while True:
+            try:
+                await self.db.execute(statement, raise_errors=True)
+                return
+            except QueryException:
+                if attempt >= self.retries:
+                    raise
+                if self.controller:
+                    self.controller.record_error()
+                attempt += 1
+                await asyncio.sleep(0.5 * 2**attempt)
+
+    async def run(self) -> None:
+        try:
+            async with self.db:
+                while True:
+                    started = time.monotonic()
+                    statement = await self.queue.get()
+                    self.idle_seconds += time.monotonic() - started
+                    if statement is None:
+                        break
+                    started = time.monotonic()
+                    await self.execute(statement)
+                    self.write_seconds += time.monotonic() - started
+
+                if self.spool:
+                    self.spool.seek(0)
+                    for line in self.spool:
+                        started = time.monotonic()
+                        await self.execute(json.loads(line))
+                        self.write_seconds += time.monotonic() - started
+        finally:
+            if self.spool:
+                self.spool.close()
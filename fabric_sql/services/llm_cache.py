@@ -0,0 +1,137 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence
+
+from autogen_core import CacheStore, CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from autogen_ext.models.cache import CHAT_CACHE_VALUE_TYPE
+from pydantic import BaseModel
+
+LLMCacheMode = Literal["off", "read_through", "replay"]
+
+
+class LLMCacheMissException(Exception):
+    pass
+
+
+class DiskCacheStore(CacheStore[CHAT_CACHE_VALUE_TYPE]):
+    """Stores model responses as JSON files, one per request hash. The least
+    recently used responses are removed when the folder grows over max_bytes."""
+
+    def __init__(self, folder: Path, max_bytes: int) -> None:
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def get_path(self, key: str) -> Path:
+        return self.folder / f"{key}.json"
+
+    def get(
+        self, key: str, default: Optional[CHAT_CACHE_VALUE_TYPE] = None
+    ) -> Optional[CHAT_CACHE_VALUE_TYPE]:
+        path = self.get_path(key)
+        try:
+            value = json.loads(path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+        os.utime(path)  # mark as recently used
+        # ChatCompletionCache rebuilds the CreateResult instances from their dicts.
+        return value
+
+    def set(self, key: str, value: CHAT_CACHE_VALUE_TYPE) -> None:
+        if isinstance(value, list):
+            data: Any = [
+                item if isinstance(item, str) else item.model_dump(mode="json")
+                for item in value
+            ]
+        else:
+            data = value.model_dump(mode="json")
+
+        path = self.get_path(key)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(data))
+        tmp_path.replace(path)
+        self.evict()
+
+    def evict(self) -> None:
+        files = [(p, p.stat()) for p in self.folder.glob("*.json")]
+        total = sum(stat.st_size for _, stat in files)
+
+        for path, stat in sorted(files, key=lambda f: f[1].st_mtime):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= stat.st_size
+
+
+class ReplayOnlyClient(ChatCompletionClient):
+    """Wraps a client for strict replay, every request that is not served from the
+    cache fails instead of calling the model."""
+
+    def __init__(self, client: ChatCompletionClient) -> None:
+        self.client = client
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        raise LLMCacheMissException(
+            "No recorded model response for the request in replay mode."
+        )
+
+    def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[str | CreateResult, None]:
+        raise LLMCacheMissException(
+            "No recorded model response for the request in replay mode."
+        )
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(
+        self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []
+    ) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(
+        self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []
+    ) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self.client.capabilities  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self.client.model_info
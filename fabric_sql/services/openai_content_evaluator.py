@@ -1,7 +1,10 @@
-from typing import Any, Literal
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Literal
 
+from openai import AsyncStream
 from openai.types.chat import (
     ChatCompletion,
+    ChatCompletionChunk,
 )
 
 from fabric_sql.protocols.i_openai_content_evaluator import (
@@ -9,6 +12,14 @@ from fabric_sql.protocols.i_openai_content_evaluator import (
     IOpenAIContentEvaluator,
 )
 
+# severities that fail the check for each threshold, looked up for every chunk of a
+# streamed response.
+FAILING_SEVERITIES: dict[str, frozenset[str]] = {
+    "low": frozenset({"low", "medium", "high"}),
+    "medium": frozenset({"medium", "high"}),
+    "high": frozenset({"high"}),
+}
+
 
 class OpenAIContentEvaluator(IOpenAIContentEvaluator):
     def evaluate_severity(
@@ -17,11 +28,7 @@ class OpenAIContentEvaluator(IOpenAIContentEvaluator):
         if "severity" in dict_filters:
             lc_val = dict_filters["severity"].lower()
 
-            if (
-                (lc_val == "high")
-                or (lc_val == "medium" and theshold in ["medium", "low"])
-                or (lc_val == "low" and theshold == "low")
-            ):
+            if lc_val in FAILING_SEVERITIES[theshold]:
                 raise ContentSafeException(
                     f"Content safety check failed. Severity: {lc_val}."
                 )
@@ -58,3 +65,29 @@ class OpenAIContentEvaluator(IOpenAIContentEvaluator):
                     response.choices[0].model_extra["content_filter_results"],  # type: ignore
                     threshold,
                 )  # type: ignore
+
+    def chunk_safety_check(
+        self,
+        chunk: ChatCompletionChunk,
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> None:
+        # the prompt annotations arrive on the first chunk, the completion
+        # annotations on the deltas.
+        for item in (chunk.model_extra or {}).get("prompt_filter_results") or []:
+            if item.get("content_filter_results"):
+                self.validate(item["content_filter_results"], threshold)
+
+        for choice in chunk.choices:
+            filters = (choice.model_extra or {}).get("content_filter_results")
+            if filters:
+                self.validate(filters, threshold)
+
+    async def content_safety_stream(
+        self,
+        stream: AsyncStream[ChatCompletionChunk],
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> AsyncIterator[ChatCompletionChunk]:
+        async with aclosing(stream):
+            async for chunk in stream:
+                self.chunk_safety_check(chunk, threshold)
+                yield chunk
@@ -0,0 +1,52 @@
+from pathlib import Path
+from typing import Any, AsyncIterator, Iterator
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from fabric_sql.services.arrow_converter import convert_items, get_restorer
+
+SNAPSHOT_COMPRESSION = "zstd"
+
+
+async def write_parquet(batches: AsyncIterator[pa.RecordBatch], path: Path) -> int:
+    """Write the record batches to a Parquet file as they arrive, one row group per
+    batch. Returns the number of rows written, no file is created when there are
+    none."""
+    tmp_path = path.with_suffix(".tmp")
+    writer: pq.ParquetWriter | None = None
+    rows = 0
+
+    try:
+        async for batch in batches:
+            if writer is None:
+                writer = pq.ParquetWriter(
+                    tmp_path, batch.schema, compression=SNAPSHOT_COMPRESSION
+                )
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is not None:
+        # only complete files get the final name.
+        tmp_path.replace(path)
+    return rows
+
+
+def read_parquet(
+    path: Path, batch_size: int = 10_000
+) -> Iterator[tuple[list[str], list[tuple[Any, ...]]]]:
+    """Read a Parquet file batch by batch as column names and row tuples, with the
+    values asyncpg decodes for the columns written by ArrowConverter."""
+    parquet_file = pq.ParquetFile(path)
+    restorers = [get_restorer(field) for field in parquet_file.schema_arrow]
+    for batch in parquet_file.iter_batches(batch_size=batch_size):
+        columns = [
+            convert_items(restorer)(values) if restorer else values
+            for restorer, values in zip(
+                restorers, (column.to_pylist() for column in batch.columns)
+            )
+        ]
+        yield batch.schema.names, list(zip(*columns))
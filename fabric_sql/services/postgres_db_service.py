@@ -1,11 +1,34 @@
-from dataclasses import dataclass
-from typing import Self
+import asyncio
+import json
+import re
+import secrets
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Self
 
 import asyncpg
-from azure.identity import DefaultAzureCredential
 from pydantic import BaseModel
 
-from fabric_sql.protocols.i_postgres_db_service import IPostgresDBService
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    QueryException,
+    QueryPage,
+    QueryPlan,
+    QueryStats,
+    Workload,
+)
+from fabric_sql.services.query_metrics import (
+    QueryListener,
+    QueryMetrics,
+    QueryMetricsEnv,
+)
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# format of the ids returned by pg_export_snapshot(), e.g. 00000003-0000001B-1
+SNAPSHOT_ID = re.compile(r"[0-9A-Fa-f]+(-[0-9A-Fa-f]+)+")
 
 
 class DatabaseEnv(BaseModel):
@@ -14,36 +37,94 @@ class DatabaseEnv(BaseModel):
     postgres_database: str
     postgres_password: str | None = None
     postgres_username: str
+    postgres_pool_size: int = 10
+    # reads get their own read only pool when set, so they never wait for a
+    # connection behind bulk writes. 0 shares the write pool.
+    postgres_read_pool_size: int = 0
+    # optional replica for the read pool, defaults to postgres_host.
+    postgres_read_host: str | None = None
+    # held cursors pin a connection each, idle ones are released after the ttl and
+    # the least recently used one when the cap is reached.
+    postgres_max_open_cursors: int = 4
+    postgres_cursor_ttl_seconds: float = 300
+
+
+@dataclass
+class HeldCursor:
+    """A query held open in a transaction on its own connection between pages."""
+
+    query: str
+    pool: asyncpg.Pool
+    conn: Any
+    transaction: Any
+    cursor: Any
+    expires_at: float
+    # the row read ahead to know whether another page exists.
+    pending: list[Any] = field(default_factory=list)
 
 
 @dataclass
 class PostgresDBService(IPostgresDBService):
+    metrics_env: QueryMetricsEnv = field(default_factory=QueryMetricsEnv, kw_only=True)
+
     def get_env(self) -> DatabaseEnv: ...
 
     def __post_init__(self) -> None:
         self._pool: asyncpg.Pool | None = None
+        self._read_pool: asyncpg.Pool | None = None
+        self._cursors: dict[str, HeldCursor] = {}
+        self._users = 0
+        self._pool_lock = asyncio.Lock()
+        self._metrics = QueryMetrics(self.metrics_env)
 
     async def __aenter__(self) -> Self:
         """Async context manager entry."""
+        self._users += 1
         await self._ensure_pool()
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
         """Async context manager exit."""
-        await self.close()
+        self._users = max(self._users - 1, 0)
+        if self._users == 0:
+            await self.close()
 
     async def _ensure_pool(self) -> None:
-        """Ensure the connection pool is created."""
-        if self._pool is None:
+        """Ensure the connection pools are created."""
+        if self._pool is not None:
+            return
+
+        async with self._pool_lock:
+            if self._pool is not None:
+                return
+
             env = self.get_env()
             password = env.postgres_password
 
             if not password:
+                from azure.identity import DefaultAzureCredential
+
                 credential = DefaultAzureCredential()
                 password = credential.get_token(
                     "https://ossrdbms-aad.database.windows.net/.default"
                 ).token
 
+            if env.postgres_read_pool_size:
+                self._read_pool = await asyncpg.create_pool(
+                    host=env.postgres_read_host or env.postgres_host,
+                    database=env.postgres_database,
+                    user=env.postgres_username,
+                    password=password,
+                    port=env.postgres_port,
+                    ssl="require",
+                    min_size=1,
+                    max_size=env.postgres_read_pool_size,
+                    server_settings={
+                        "application_name": "fabric_sql_read",
+                        "default_transaction_read_only": "on",
+                    },
+                )
+
             self._pool = await asyncpg.create_pool(
                 host=env.postgres_host,
                 database=env.postgres_database,
@@ -51,44 +132,395 @@ class PostgresDBService(IPostgresDBService):
                 password=password,
                 port=env.postgres_port,
                 ssl="require",
-                min_size=2,
-                max_size=10,
+                min_size=min(2, env.postgres_pool_size),
+                max_size=env.postgres_pool_size,
+                server_settings={"application_name": "fabric_sql_write"},
             )
 
+    def _get_pool(self, workload: Workload) -> asyncpg.Pool | None:
+        if workload == "read" and self._read_pool is not None:
+            return self._read_pool
+        return self._pool
+
     async def close(self) -> None:
-        """Close the connection pool."""
+        """Close the connection pools."""
+        for token in list(self._cursors):
+            await self.close_cursor(token)
+        if self._read_pool:
+            await self._read_pool.close()
+            self._read_pool = None
         if self._pool:
             await self._pool.close()
             self._pool = None
 
-    async def query(self, query: str) -> list[dict[str, str]] | None:
-        """Execute a query and return results as a list of dictionaries."""
+    @staticmethod
+    def _to_dict(row: asyncpg.Record) -> dict[str, str]:
+        return {key: str(value) for key, value in row.items()}
+
+    async def fetch(
+        self, query: str, workload: Workload = "read"
+    ) -> list[dict[str, str]]:
+        """Execute a query and return results as a list of dictionaries, raises
+        QueryException if the query fails."""
         await self._ensure_pool()
-        if not self._pool:
-            return None
+        pool = self._get_pool(workload)
+        if not pool:
+            raise QueryException("Connection pool is not available")
 
+        timer = self._metrics.start(query)
         try:
-            async with self._pool.acquire() as conn:
+            async with pool.acquire() as conn:
+                timer.acquired()
                 rows = await conn.fetch(query)
-                results = []
-                for row in rows:
-                    results.append({key: str(value) for key, value in row.items()})
-                return results
+                timer.rows = len(rows)
+                return [self._to_dict(row) for row in rows]
         except Exception as e:
+            timer.error = True
+            raise QueryException(str(e)) from e
+        finally:
+            timer.stop()
+
+    @staticmethod
+    def _transaction(conn: asyncpg.Connection, snapshot: str | None) -> Any:
+        if snapshot:
+            # an imported snapshot needs the isolation level of its exporter.
+            return conn.transaction(isolation="repeatable_read", readonly=True)
+        return conn.transaction()
+
+    @staticmethod
+    async def _set_transaction(
+        conn: asyncpg.Connection,
+        statement_timeout_ms: int | None,
+        snapshot: str | None,
+    ) -> None:
+        if snapshot:
+            if not SNAPSHOT_ID.fullmatch(snapshot):
+                raise QueryException(f"Invalid snapshot id {snapshot!r}")
+            # must be the first statement of the transaction.
+            await conn.execute(f"SET TRANSACTION SNAPSHOT '{snapshot}';")
+        if statement_timeout_ms:
+            # transaction scoped, same as SET LOCAL statement_timeout
+            await conn.execute(
+                "SELECT set_config('statement_timeout', $1, true);",
+                str(statement_timeout_ms),
+            )
+
+    @asynccontextmanager
+    async def exported_snapshot(
+        self, workload: Workload = "read"
+    ) -> AsyncIterator[str]:
+        """Hold a repeatable read transaction open and yield its exported snapshot
+        id, readers passing it as snapshot see the database as this transaction
+        does until the context exits."""
+        await self._ensure_pool()
+        pool = self._get_pool(workload)
+        if not pool:
+            raise QueryException("Connection pool is not available")
+
+        async with pool.acquire() as conn:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                try:
+                    snapshot = await conn.fetchval("SELECT pg_export_snapshot();")
+                except Exception as e:
+                    raise QueryException(str(e)) from e
+                yield snapshot
+
+    async def fetch_batches(
+        self,
+        query: str,
+        batch_size: int | Callable[[], int] = 1000,
+        statement_timeout_ms: int | None = None,
+        workload: Workload = "read",
+        snapshot: str | None = None,
+    ) -> AsyncIterator[list[dict[str, str]]]:
+        """Execute a query and stream the results in batches through a server side
+        cursor, raises QueryException if the query fails."""
+        await self._ensure_pool()
+        pool = self._get_pool(workload)
+        if not pool:
+            raise QueryException("Connection pool is not available")
+
+        timer = self._metrics.start(query)
+        try:
+            async with pool.acquire() as conn:
+                timer.acquired()
+                async with self._transaction(conn, snapshot):
+                    try:
+                        await self._set_transaction(
+                            conn, statement_timeout_ms, snapshot
+                        )
+                        cursor = await conn.cursor(query)
+                    except Exception as e:
+                        timer.error = True
+                        raise QueryException(str(e)) from e
+
+                    while True:
+                        try:
+                            rows = await cursor.fetch(
+                                batch_size() if callable(batch_size) else batch_size
+                            )
+                        except Exception as e:
+                            timer.error = True
+                            raise QueryException(str(e)) from e
+                        if not rows:
+                            break
+                        timer.rows += len(rows)
+                        timer.suspend()
+                        yield [self._to_dict(row) for row in rows]
+                        timer.resume()
+        finally:
+            timer.stop()
+
+    async def query_arrow(
+        self,
+        query: str,
+        batch_size: int = 10_000,
+        statement_timeout_ms: int | None = None,
+        workload: Workload = "read",
+        snapshot: str | None = None,
+    ) -> AsyncIterator["pa.RecordBatch"]:
+        """Execute a query and stream the results as arrow record batches typed
+        after the result columns, raises QueryException if the query fails."""
+        # pyarrow is optional, only needed by the callers of this method.
+        from fabric_sql.services.arrow_converter import ArrowConverter
+
+        await self._ensure_pool()
+        pool = self._get_pool(workload)
+        if not pool:
+            raise QueryException("Connection pool is not available")
+
+        timer = self._metrics.start(query)
+        try:
+            async with pool.acquire() as conn:
+                timer.acquired()
+                async with self._transaction(conn, snapshot):
+                    try:
+                        await self._set_transaction(
+                            conn, statement_timeout_ms, snapshot
+                        )
+                        statement = await conn.prepare(query)
+                        converter = ArrowConverter(statement.get_attributes())
+                        cursor = await statement.cursor()
+                    except Exception as e:
+                        timer.error = True
+                        raise QueryException(str(e)) from e
+
+                    while True:
+                        try:
+                            rows = await cursor.fetch(batch_size)
+                        except Exception as e:
+                            timer.error = True
+                            raise QueryException(str(e)) from e
+                        if not rows:
+                            break
+                        timer.rows += len(rows)
+                        timer.suspend()
+                        yield converter.to_record_batch(rows)
+                        timer.resume()
+        finally:
+            timer.stop()
+
+    async def _release_cursor(self, held: HeldCursor) -> None:
+        try:
+            await held.transaction.rollback()
+        except Exception:
+            pass  # the connection is reset when it returns to the pool.
+        finally:
+            await held.pool.release(held.conn)
+
+    async def _expire_cursors(self) -> None:
+        now = time.monotonic()
+        expired = [t for t, held in self._cursors.items() if held.expires_at < now]
+        for token in expired:
+            await self.close_cursor(token)
+
+    async def _read_page(
+        self, token: str, held: HeldCursor, page_size: int
+    ) -> QueryPage:
+        try:
+            rows = held.pending + await held.cursor.fetch(
+                page_size + 1 - len(held.pending)
+            )
+        except Exception as e:
+            await self._release_cursor(held)
+            raise QueryException(str(e)) from e
+        except BaseException:
+            # the cursor is no longer held, nothing else would release it.
+            await self._release_cursor(held)
+            raise
+
+        if len(rows) <= page_size:
+            await self._release_cursor(held)
+            return QueryPage(rows=[self._to_dict(row) for row in rows])
+
+        env = self.get_env()
+        held.pending = rows[page_size:]
+        held.expires_at = time.monotonic() + env.postgres_cursor_ttl_seconds
+        self._cursors[token] = held
+        while len(self._cursors) > env.postgres_max_open_cursors:
+            await self.close_cursor(next(iter(self._cursors)))
+
+        return QueryPage(
+            rows=[self._to_dict(row) for row in rows[:page_size]],
+            cursor=token,
+        )
+
+    async def fetch_page(
+        self,
+        query: str,
+        page_size: int = 100,
+        statement_timeout_ms: int | None = None,
+    ) -> QueryPage:
+        """Execute a query and return its first page, the rest of the result stays
+        in a server side cursor. Raises QueryException if the query fails."""
+        await self._ensure_pool()
+        pool = self._get_pool("read")
+        if not pool:
+            raise QueryException("Connection pool is not available")
+        await self._expire_cursors()
+
+        timer = self._metrics.start(query)
+        try:
+            conn = await pool.acquire()
+            timer.acquired()
+            transaction = conn.transaction()
+            held = HeldCursor(query, pool, conn, transaction, None, 0)
+            try:
+                await transaction.start()
+                if statement_timeout_ms:
+                    await conn.execute(
+                        "SELECT set_config('statement_timeout', $1, true);",
+                        str(statement_timeout_ms),
+                    )
+                held.cursor = await conn.cursor(query)
+            except Exception as e:
+                await self._release_cursor(held)
+                raise QueryException(str(e)) from e
+            except BaseException:
+                # cancelled, the connection must not stay pinned in the transaction.
+                await self._release_cursor(held)
+                raise
+
+            page = await self._read_page(secrets.token_urlsafe(12), held, page_size)
+            timer.rows = len(page.rows)
+            return page
+        except Exception:
+            timer.error = True
+            raise
+        finally:
+            timer.stop()
+
+    async def fetch_next_page(self, cursor: str, page_size: int = 100) -> QueryPage:
+        """Fetch the next page of a held cursor, raises QueryException if the cursor
+        is unknown, expired or the fetch fails."""
+        await self._expire_cursors()
+        held = self._cursors.pop(cursor, None)
+        if held is None:
+            raise QueryException(
+                "The cursor is unknown or expired, execute the query again."
+            )
+
+        # every page is timed as an execution of the query, on the held connection.
+        timer = self._metrics.start(held.query)
+        timer.acquired()
+        try:
+            page = await self._read_page(cursor, held, page_size)
+            timer.rows = len(page.rows)
+            return page
+        except Exception:
+            timer.error = True
+            raise
+        finally:
+            timer.stop()
+
+    async def close_cursor(self, cursor: str) -> None:
+        """Release the connection of a held cursor."""
+        held = self._cursors.pop(cursor, None)
+        if held:
+            await self._release_cursor(held)
+
+    async def query(
+        self, query: str, workload: Workload = "read"
+    ) -> list[dict[str, str]] | None:
+        """Execute a query and return results as a list of dictionaries."""
+        try:
+            return await self.fetch(query, workload)
+        except QueryException as e:
             print(f"Query failed: {e}")
             return None
 
-    async def execute(self, query: str) -> None:
+    async def explain(self, query: str) -> QueryPlan:
+        """Get the planner estimates of a query, raises QueryException if the query
+        cannot be planned."""
+        rows = await self.fetch(f"EXPLAIN (FORMAT JSON) {query.strip().rstrip(';')}")
+        plan = json.loads(rows[0]["QUERY PLAN"])[0]["Plan"]
+        return QueryPlan(total_cost=plan["Total Cost"], plan_rows=plan["Plan Rows"])
+
+    def query_metrics(self) -> list[QueryStats]:
+        return self._metrics.snapshot()
+
+    def reset_query_metrics(self) -> None:
+        self._metrics.reset()
+
+    def add_query_listener(self, listener: QueryListener) -> None:
+        self._metrics.listeners.append(listener)
+
+    @staticmethod
+    def _affected_rows(status: str) -> int:
+        # command tags end with the row count, e.g. INSERT 0 5 or UPDATE 3
+        count = status.rsplit(" ", 1)[-1] if isinstance(status, str) else ""
+        return int(count) if count.isdigit() else 0
+
+    async def execute(self, query: str, raise_errors: bool = False) -> None:
         """Execute a command (INSERT, UPDATE, DELETE, etc.)."""
         await self._ensure_pool()
         if not self._pool:
+            if raise_errors:
+                raise QueryException("Connection pool is not available")
             return
 
+        timer = self._metrics.start(query)
         try:
             async with self._pool.acquire() as conn:
-                await conn.execute(query)
+                timer.acquired()
+                status = await conn.execute(query)
+                timer.rows = self._affected_rows(status)
         except Exception as e:
+            timer.error = True
+            if raise_errors:
+                raise QueryException(str(e)) from e
             print(f"Execute failed: {e}")
+        finally:
+            timer.stop()
+
+    async def copy_records(
+        self,
+        schema_name: str,
+        table_name: str,
+        columns: list[str],
+        records: list[tuple[Any, ...]],
+    ) -> None:
+        """Bulk load rows with COPY, raises QueryException if the copy fails."""
+        await self._ensure_pool()
+        if not self._pool:
+            raise QueryException("Connection pool is not available")
+
+        timer = self._metrics.start(f"COPY {schema_name}.{table_name}")
+        try:
+            async with self._pool.acquire() as conn:
+                timer.acquired()
+                await conn.copy_records_to_table(
+                    table_name,
+                    records=records,
+                    columns=columns,
+                    schema_name=schema_name,
+                )
+                timer.rows = len(records)
+        except Exception as e:
+            timer.error = True
+            raise QueryException(str(e)) from e
+        finally:
+            timer.stop()
 
     async def show_view_definition(
         self, schema: str, view_name: str
@@ -0,0 +1,54 @@
+from dataclasses import dataclass
+from typing import Any, AsyncIterator
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_postgres_db_service import IPostgresDBService, QueryPage
+from fabric_sql.protocols.i_query_guard import IQueryGuard, QueryRejectedException
+
+
+class QueryGuardEnv(Env):
+    query_max_cost: float = 1_000_000
+    # queries estimated to return more rows are rejected, the validator limits the
+    # rows of the top-level statement to SQL_MAX_ROWS before they get here.
+    query_max_plan_rows: int = 100_000
+    query_statement_timeout_ms: int = 30_000
+
+
+@dataclass
+class QueryGuard(IQueryGuard):
+    env: QueryGuardEnv
+
+    async def guard(self, db: IPostgresDBService, query: str) -> str:
+        plan = await db.explain(query)
+
+        if plan.plan_rows > self.env.query_max_plan_rows:
+            raise QueryRejectedException(
+                f"Query rejected, estimated {plan.plan_rows} rows exceed "
+                f"{self.env.query_max_plan_rows}. Add filters, aggregate or add a "
+                "LIMIT."
+            )
+        if plan.total_cost > self.env.query_max_cost:
+            raise QueryRejectedException(
+                f"Query rejected, estimated cost {plan.total_cost:.0f} exceeds "
+                f"{self.env.query_max_cost:.0f}. Simplify the query or add filters."
+            )
+        return query
+
+    async def fetch_batches(
+        self, db: IPostgresDBService, query: str
+    ) -> AsyncIterator[list[dict[str, Any]]]:
+        query = await self.guard(db, query)
+        async for batch in db.fetch_batches(
+            query, statement_timeout_ms=self.env.query_statement_timeout_ms
+        ):
+            yield batch
+
+    async def fetch_page(
+        self, db: IPostgresDBService, query: str, page_size: int
+    ) -> QueryPage:
+        return await db.fetch_page(
+            await self.guard(db, query),
+            page_size,
+            statement_timeout_ms=self.env.query_statement_timeout_ms,
+        )
@@ -0,0 +1,165 @@
+import logging
+import re
+import time
+from typing import Callable
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_postgres_db_service import LATENCY_BUCKETS_MS, QueryStats
+
+logger = logging.getLogger(__name__)
+
+# statements beyond this many fingerprints are recorded under OTHER_FINGERPRINT,
+# generated SQL would grow the metrics without bound otherwise.
+MAX_FINGERPRINTS = 500
+OTHER_FINGERPRINT = "<other>"
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERALS = re.compile(
+    r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\b(?:null|true|false)\b", re.IGNORECASE
+)
+_VALUE_LISTS = re.compile(
+    r"\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+# called with the fingerprint, duration ms, pool wait ms, rows and error flag.
+QueryListener = Callable[[str, float, float, int, bool], None]
+
+
+def fingerprint_query(query: str) -> str:
+    """Normalize a statement so executions that only differ in their literal values
+    share one fingerprint, e.g. every batch INSERT of a table."""
+    query = _COMMENTS.sub(" ", query)
+    query = _LITERALS.sub("?", query)
+    query = _VALUE_LISTS.sub("(?)", query)
+    return _WHITESPACE.sub(" ", query).strip().rstrip(";").lower()
+
+
+class QueryMetricsEnv(Env):
+    # record per statement timings, read them with query_metrics().
+    postgres_metrics: bool = False
+    # log the fingerprint of statements slower than this, also without metrics.
+    postgres_slow_query_ms: int | None = None
+
+
+class QueryTimer:
+    """Times one statement from the moment it waits for a connection."""
+
+    def __init__(self, metrics: "QueryMetrics", query: str) -> None:
+        self.metrics = metrics
+        self.query = query
+        self.started = time.perf_counter()
+        self.acquired_at = self.started
+        self.suspended_at = 0.0
+        self.suspended = 0.0
+        self.rows = 0
+        self.error = False
+
+    def acquired(self) -> None:
+        self.acquired_at = time.perf_counter()
+
+    def suspend(self) -> None:
+        """A streaming statement hands a batch to its consumer, the time until it
+        resumes is not the database's."""
+        self.suspended_at = time.perf_counter()
+
+    def resume(self) -> None:
+        self.suspended += time.perf_counter() - self.suspended_at
+
+    def stop(self) -> None:
+        stopped = time.perf_counter()
+        self.metrics.record(
+            self.query,
+            (stopped - self.acquired_at - self.suspended) * 1000,
+            (self.acquired_at - self.started) * 1000,
+            self.rows,
+            self.error,
+        )
+
+
+class NullTimer(QueryTimer):
+    """Stands in for the timer when nothing is recorded, so the instrumented code
+    has no branches and does not read the clock."""
+
+    def __init__(self) -> None:
+        self.rows = 0
+        self.error = False
+
+    def acquired(self) -> None:
+        pass
+
+    def suspend(self) -> None:
+        pass
+
+    def resume(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class QueryMetrics:
+    """In-process statement metrics of one database service, keyed by fingerprint."""
+
+    def __init__(self, env: QueryMetricsEnv) -> None:
+        self.enabled = env.postgres_metrics
+        self.slow_query_ms = env.postgres_slow_query_ms
+        self._stats: dict[str, QueryStats] = {}
+        self.listeners: list[QueryListener] = []
+
+    def start(self, query: str) -> QueryTimer:
+        if not self.enabled and self.slow_query_ms is None and not self.listeners:
+            return NULL_TIMER
+        return QueryTimer(self, query)
+
+    def record(
+        self, query: str, duration_ms: float, wait_ms: float, rows: int, error: bool
+    ) -> None:
+        fingerprint = fingerprint_query(query)
+        if self.slow_query_ms is not None and duration_ms >= self.slow_query_ms:
+            logger.warning(
+                "Slow query %.0f ms, %d rows, %.0f ms pool wait: %s",
+                duration_ms,
+                rows,
+                wait_ms,
+                fingerprint,
+            )
+        for listener in self.listeners:
+            listener(fingerprint, duration_ms, wait_ms, rows, error)
+        if not self.enabled:
+            return
+
+        stats = self._stats.get(fingerprint)
+        if stats is None:
+            if len(self._stats) >= MAX_FINGERPRINTS:
+                fingerprint = OTHER_FINGERPRINT
+            stats = self._stats.setdefault(
+                fingerprint, QueryStats(fingerprint=fingerprint)
+            )
+
+        stats.calls += 1
+        stats.errors += error
+        stats.rows += rows
+        stats.total_ms += duration_ms
+        stats.max_ms = max(stats.max_ms, duration_ms)
+        stats.acquire_wait_ms += wait_ms
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                stats.buckets[i] += 1
+                break
+        else:
+            stats.buckets[-1] += 1
+
+    def snapshot(self) -> list[QueryStats]:
+        return sorted(
+            (stats.model_copy(deep=True) for stats in self._stats.values()),
+            key=lambda stats: stats.total_ms,
+            reverse=True,
+        )
+
+    def reset(self) -> None:
+        self._stats.clear()
@@ -0,0 +1,151 @@
+import csv
+import io
+import os
+import tempfile
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import IO, Any, AsyncIterator, Literal
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_result_renderer import IResultRenderer
+from fabric_sql.services.sql_validator import SQLValidatorEnv
+
+
+class ResultRendererEnv(Env):
+    result_format: Literal["markdown", "csv"] = "markdown"
+    # caps for the rows inlined in the rendered result, the rows read beyond them
+    # only count towards the omitted rows or go to the spill file.
+    result_max_rows: int = 100
+    result_max_bytes: int = 16_000
+    result_max_cell_chars: int = 200
+    # when set, results that exceed the inline caps are written to a CSV file in
+    # this folder.
+    result_spill_dir: str | None = None
+
+
+@dataclass
+class ResultRenderer(IResultRenderer):
+    env: ResultRendererEnv
+    # rows are no longer read from the database beyond SQL_MAX_ROWS, the same cap
+    # the validator puts on the query.
+    validator_env: SQLValidatorEnv = field(
+        default_factory=SQLValidatorEnv, kw_only=True
+    )
+
+    def truncate(self, value: Any) -> str:
+        text = str(value)
+        max_chars = self.env.result_max_cell_chars
+        return text if len(text) <= max_chars else f"{text[: max_chars - 3]}..."
+
+    def format_row(self, values: list[str]) -> str:
+        if self.env.result_format == "csv":
+            buff = io.StringIO()
+            csv.writer(buff, lineterminator="").writerow(values)
+            return buff.getvalue()
+
+        cells = [v.replace("|", "\\|").replace("\n", " ") for v in values]
+        return f"| {' | '.join(cells)} |"
+
+    def format_header(self, columns: list[str]) -> list[str]:
+        header = [self.format_row(columns)]
+        if self.env.result_format == "markdown":
+            header.append(self.format_row(["---"] * len(columns)))
+        return header
+
+    def open_spill_file(self, columns: list[str]) -> tuple[IO[str], Any] | None:
+        if not self.env.result_spill_dir:
+            return None
+
+        spill_file = tempfile.NamedTemporaryFile(
+            "w",
+            dir=self.env.result_spill_dir,
+            prefix="query_result_",
+            suffix=".csv",
+            newline="",
+            delete=False,
+        )
+        writer = csv.writer(spill_file)
+        writer.writerow(columns)
+        return spill_file, writer
+
+    def format_footer(
+        self, omitted: int, truncated: bool, spill_file: IO[str] | None
+    ) -> str:
+        footer = f"{'at least ' if truncated else ''}{omitted} more rows omitted"
+        if spill_file:
+            footer += f", full result written to {spill_file.name}"
+        return f"({footer})"
+
+    async def iter_rows(
+        self, batches: AsyncIterator[list[dict[str, Any]]]
+    ) -> AsyncIterator[dict[str, Any]]:
+        """Flatten the batches, the database cursor is closed at the fetch cap."""
+        fetched = 0
+        async with aclosing(batches) as stream:
+            async for batch in stream:
+                for row in batch:
+                    yield row
+                    fetched += 1
+                    if fetched >= self.validator_env.sql_max_rows:
+                        return
+
+    def render_page(self, rows: list[dict[str, Any]]) -> str:
+        if not rows:
+            return "No rows returned."
+
+        # the row and byte caps would drop rows the cursor cannot return again.
+        columns = list(rows[0].keys())
+        lines = self.format_header(columns)
+        for row in rows:
+            lines.append(self.format_row([self.truncate(row[c]) for c in columns]))
+        return "\n".join(lines)
+
+    async def render(self, batches: AsyncIterator[list[dict[str, Any]]]) -> str:
+        columns: list[str] | None = None
+        lines: list[str] = []
+        size = 0
+        total = omitted = 0
+        spill: tuple[IO[str], Any] | None = None
+
+        try:
+            async with aclosing(self.iter_rows(batches)) as rows:
+                async for row in rows:
+                    if columns is None:
+                        columns = list(row.keys())
+                        lines = self.format_header(columns)
+                        size = sum(len(line.encode()) + 1 for line in lines)
+                        spill = self.open_spill_file(columns)
+
+                    total += 1
+                    values = [row[c] for c in columns]
+                    if spill:
+                        spill[1].writerow(values)
+
+                    line = None
+                    if not omitted and total <= self.env.result_max_rows:
+                        line = self.format_row([self.truncate(v) for v in values])
+
+                    if (
+                        line
+                        and size + len(line.encode()) + 1 <= self.env.result_max_bytes
+                    ):
+                        lines.append(line)
+                        size += len(line.encode()) + 1
+                    else:
+                        omitted += 1
+        finally:
+            if spill:
+                spill[0].close()
+
+        if columns is None:
+            return "No rows returned."
+
+        if omitted:
+            truncated = total >= self.validator_env.sql_max_rows
+            lines.append(self.format_footer(omitted, truncated, spill and spill[0]))
+        elif spill:
+            # everything was inlined, the spill file is not needed.
+            os.remove(spill[0].name)
+
+        return "\n".join(lines)
@@ -12,6 +12,11 @@ class SourceDatabaseEnv(Env):
     src_postgres_database: str
     src_postgres_password: str | None = None
     src_postgres_username: str
+    src_postgres_pool_size: int = 10
+    src_postgres_read_pool_size: int = 0
+    src_postgres_read_host: str | None = None
+    src_postgres_max_open_cursors: int = 4
+    src_postgres_cursor_ttl_seconds: float = 300
 
 
 @dataclass
@@ -25,4 +30,9 @@ class SourceDatabase(PostgresDBService, ISourceDatabase):
             postgres_database=self.src_env.src_postgres_database,
             postgres_password=self.src_env.src_postgres_password,
             postgres_username=self.src_env.src_postgres_username,
+            postgres_pool_size=self.src_env.src_postgres_pool_size,
+            postgres_read_pool_size=self.src_env.src_postgres_read_pool_size,
+            postgres_read_host=self.src_env.src_postgres_read_host,
+            postgres_max_open_cursors=self.src_env.src_postgres_max_open_cursors,
+            postgres_cursor_ttl_seconds=self.src_env.src_postgres_cursor_ttl_seconds,
         )
@@ -0,0 +1,178 @@
+import hashlib
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_sql_cache import ISQLCache, SQLCacheStats
+
+WORD_PATTERN = re.compile(r"[a-z0-9_\-\.]+")
+# tokens that identify a specific entity (quoted values, numbers, ids such as
+# "prod-eu-1"); two questions only share SQL when these match exactly.
+ENTITY_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\b\S*[\d_\-]\S*\b")
+EMBEDDING_DIMENSIONS = 1024
+
+
+class SQLCacheEnv(Env):
+    sql_cache_max_entries: int = 512
+    sql_cache_ttl_seconds: int = 24 * 60 * 60
+    # 0 disables the embedding similarity lookup, only exact (normalized) matches
+    # are served from the cache.
+    sql_cache_similarity_threshold: float = 0.0
+
+
+@dataclass
+class CacheEntry:
+    question: str
+    sql: str
+    schema_fingerprint: str
+    entities: frozenset[str]
+    embedding: dict[int, float]
+    created_at: float
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(WORD_PATTERN.findall(question.lower()))
+
+
+def normalize_sql(sql: str) -> str:
+    return " ".join(sql.strip().rstrip(";").split())
+
+
+def extract_entities(question: str) -> frozenset[str]:
+    return frozenset(m.strip("'\"").lower() for m in ENTITY_PATTERN.findall(question))
+
+
+def embed(text: str) -> dict[int, float]:
+    """Hashed bag of words and character trigrams, L2 normalized."""
+    features: dict[int, float] = {}
+    words = text.split()
+    grams = words + [w[i : i + 3] for w in words for i in range(max(len(w) - 2, 1))]
+    for gram in grams:
+        digest = hashlib.blake2b(gram.encode(), digest_size=4).digest()
+        index = int.from_bytes(digest) % EMBEDDING_DIMENSIONS
+        features[index] = features.get(index, 0.0) + 1.0
+
+    norm = math.sqrt(sum(v * v for v in features.values()))
+    return {k: v / norm for k, v in features.items()} if norm else features
+
+
+def cosine_similarity(a: dict[int, float], b: dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+@dataclass
+class SQLCache(ISQLCache):
+    env: SQLCacheEnv
+
+    def __post_init__(self) -> None:
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        # generated SQL that did not execute yet, it is never served.
+        self._pending: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._stats = SQLCacheStats()
+
+    def _is_expired(self, entry: CacheEntry) -> bool:
+        return time.monotonic() - entry.created_at > self.env.sql_cache_ttl_seconds
+
+    def _evict(self, key: str) -> None:
+        del self._entries[key]
+        self._stats.evictions += 1
+
+    def _find_similar(
+        self, question: str, schema_fingerprint: str
+    ) -> tuple[str, CacheEntry] | None:
+        entities = extract_entities(question)
+        embedding = embed(normalize_question(question))
+        best: tuple[float, str, CacheEntry] | None = None
+
+        for key, entry in self._entries.items():
+            if (
+                entry.schema_fingerprint != schema_fingerprint
+                or entry.entities != entities
+            ):
+                continue
+            score = cosine_similarity(embedding, entry.embedding)
+            if score >= self.env.sql_cache_similarity_threshold and (
+                best is None or score > best[0]
+            ):
+                best = (score, key, entry)
+
+        return (best[1], best[2]) if best else None
+
+    def _lookup(
+        self, question: str, schema_fingerprint: str
+    ) -> tuple[str, CacheEntry] | None:
+        key = normalize_question(question)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if (
+                self._is_expired(entry)
+                or entry.schema_fingerprint != schema_fingerprint
+            ):
+                self._evict(key)
+            else:
+                return key, entry
+
+        if self.env.sql_cache_similarity_threshold > 0:
+            for expired in [k for k, e in self._entries.items() if self._is_expired(e)]:
+                self._evict(expired)
+            return self._find_similar(question, schema_fingerprint)
+
+        return None
+
+    def get(self, question: str, schema_fingerprint: str) -> str | None:
+        found = self._lookup(question, schema_fingerprint)
+        if found is None:
+            self._stats.misses += 1
+            return None
+
+        key, entry = found
+        self._entries.move_to_end(key)
+        self._stats.hits += 1
+        return entry.sql
+
+    def propose(self, question: str, sql: str, schema_fingerprint: str) -> None:
+        key = normalize_question(question)
+        self._pending[key] = CacheEntry(
+            question=question,
+            sql=sql,
+            schema_fingerprint=schema_fingerprint,
+            entities=extract_entities(question),
+            embedding=embed(key),
+            created_at=time.monotonic(),
+        )
+        self._pending.move_to_end(key)
+
+        while len(self._pending) > self.env.sql_cache_max_entries:
+            del self._pending[next(iter(self._pending))]
+
+    def confirm(self, sql: str) -> None:
+        sql = normalize_sql(sql)
+        for key, entry in list(self._pending.items()):
+            if normalize_sql(entry.sql) == sql:
+                del self._pending[key]
+                if self._is_expired(entry):
+                    continue
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.env.sql_cache_max_entries:
+                    self._evict(next(iter(self._entries)))
+
+    def reject(self, sql: str) -> None:
+        sql = normalize_sql(sql)
+        for key, entry in list(self._pending.items()):
+            if normalize_sql(entry.sql) == sql:
+                del self._pending[key]
+        # also the entries served for similar questions.
+        for key, entry in list(self._entries.items()):
+            if normalize_sql(entry.sql) == sql:
+                self._evict(key)
+
+    def stats(self) -> SQLCacheStats:
+        return self._stats.model_copy(update={"entries": len(self._entries)})
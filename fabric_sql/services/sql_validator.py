@@ -0,0 +1,591 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
+from fabric_sql.protocols.i_sql_validator import (
+    ISQLValidator,
+    SQLValidationException,
+    ValidatedSQL,
+)
+
+TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>[eE]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*')
+    | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+    | (?P<quoted>"(?:[^"]|"")+")
+    | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<param>\$\d+)
+    | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+    | (?P<op>::|[-+*/<>=~!@\#%^&|?]+)
+    | (?P<punct>[(),;.\[\]:])
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+KEYWORDS = frozenset(
+    """
+    all and any array as asc at between both by case cast character collate cross
+    current current_date current_time current_timestamp current_user date day desc
+    distinct double else end epoch escape except exists extract false fetch filter
+    first following for from full group having hour ilike in inner intersect
+    interval is join lateral leading left like limit localtime localtimestamp
+    last materialized minute month natural next not null nulls offset on only or order
+    outer over overlay partition position preceding precision range recursive right
+    row rows second select similar some substring symmetric then ties time
+    timestamp to trailing trim true unbounded union using values varying week when
+    where window with within without year zone
+    """.split()
+)
+# keywords of statements that write, other statements are rejected by their first
+# keyword already. INTO catches SELECT INTO.
+WRITE_KEYWORDS = frozenset("delete insert into merge update".split())
+# keywords taking arguments in parentheses like a function, FROM inside them is not
+# a FROM clause.
+CALL_KEYWORDS = frozenset(
+    "any array cast exists extract overlay position some substring trim".split()
+)
+# keywords starting a clause, relations follow FROM and JOIN.
+CLAUSE_KEYWORDS = frozenset(
+    """
+    select from join where group having order limit offset fetch window union
+    intersect except on using
+    """.split()
+)
+# keywords after which a word is part of the expression rather than an alias.
+EXPRESSION_END_KEYWORDS = frozenset("end null true false".split())
+
+# an operator ending in + or - must contain one of these, as in the Postgres lexer.
+OPERATOR_SIGN_CHARS = frozenset("~!@#%^&|`?")
+
+# no space before these tokens in the canonical form, nor after the second set.
+NO_SPACE_BEFORE = frozenset(", ) . :: ] [".split())
+NO_SPACE_AFTER = frozenset("( . :: [".split())
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+    @property
+    def is_word(self) -> bool:
+        return self.kind in ("word", "quoted")
+
+    @property
+    def is_keyword(self) -> bool:
+        return self.kind == "word" and self.text.lower() in KEYWORDS
+
+    @property
+    def is_identifier(self) -> bool:
+        return self.is_word and not self.is_keyword
+
+    @property
+    def name(self) -> str:
+        """The name of an identifier, unquoted identifiers are case insensitive."""
+        if self.kind == "quoted":
+            return self.text[1:-1].replace('""', '"')
+        return self.text.lower()
+
+    def canonical(self) -> str:
+        if self.kind == "word":
+            return self.text.upper() if self.is_keyword else self.text.lower()
+        return self.text
+
+
+def operator_length(text: str) -> int:
+    """The length of the operator at the start of a run of operator characters,
+    split the way Postgres does: "=-1" is = and -1, "~*" is one operator."""
+    for comment in ("--", "/*"):
+        if comment in text[1:]:
+            text = text[: text.index(comment, 1)]
+    if not OPERATOR_SIGN_CHARS.intersection(text):
+        text = text.rstrip("+-") or text[0]
+    return len(text)
+
+
+def tokenize(query: str) -> list[Token]:
+    tokens = []
+    position = 0
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        if match is None:
+            char = query[position]
+            problem = {
+                "'": "Unterminated string literal",
+                '"': "Unterminated quoted identifier",
+                "$": "Unterminated dollar quoted string",
+            }.get(char, f"Unexpected character {char!r}")
+            raise SQLValidationException(
+                f"Syntax error: {problem} at position {position}."
+            )
+        kind = match.lastgroup
+        if kind == "tag":
+            kind = "dollar"
+        text = match.group()
+        if kind == "op":
+            text = text[: operator_length(text)]
+        if kind not in ("space", "comment"):
+            tokens.append(Token(kind or "", text))
+        position += len(text)
+    return tokens
+
+
+def canonical_sql(tokens: list[Token]) -> str:
+    parts: list[str] = []
+    previous: Token | None = None
+    for token in tokens:
+        text = token.canonical()
+        if previous is not None:
+            call = token.text == "(" and (
+                previous.is_identifier or previous.text.lower() in CALL_KEYWORDS
+            )
+            if not (
+                call or token.text in NO_SPACE_BEFORE or previous.text in NO_SPACE_AFTER
+            ):
+                parts.append(" ")
+        parts.append(text)
+        previous = token
+    return "".join(parts)
+
+
+@dataclass
+class Frame:
+    """The state of the parser in one level of parentheses."""
+
+    call: bool = False
+    clause: str = ""
+    # the next word is the name of a relation, a CTE or an alias of those.
+    relation_start: bool = False
+    cte_start: bool = False
+    alias_of: str | None = None
+    expects_alias: bool = False
+    # the parentheses are a subquery in a FROM clause, an alias follows them.
+    subquery: bool = False
+
+
+# the columns of every view and table by schema qualified name, None when unknown.
+Schema = dict[str, set[str] | None]
+
+
+@dataclass
+class SQLAnalysis:
+    """Parses a query just far enough to find the relations and the columns it
+    references, the database stays the judge of everything else."""
+
+    tokens: list[Token]
+    schema: Schema
+
+    def __post_init__(self) -> None:
+        self.roles: list[str] = [""] * len(self.tokens)
+        self.relations: list[str] = []
+        # aliases and relation names usable as qualifiers, None for derived tables.
+        self.qualifiers: dict[str, str | None] = {}
+        self.ctes: set[str] = set()
+        # output names of the query: aliases, CTE columns and function names.
+        self.names: set[str] = set()
+        self.unknown_columns = False
+
+    def next_text(self, i: int) -> str:
+        return self.tokens[i].text if i < len(self.tokens) else ""
+
+    def find_relation(self, schema: str | None, name: str) -> str | None:
+        if schema:
+            qualified = f"{schema}.{name}"
+            return qualified if qualified in self.schema else None
+        if f"public.{name}" in self.schema:
+            return f"public.{name}"
+        matches = [r for r in self.schema if r.split(".", 1)[1] == name]
+        return matches[0] if len(matches) == 1 else None
+
+    def analyze(self) -> None:
+        tokens = self.tokens
+        if not tokens:
+            raise SQLValidationException("Syntax error: the query is empty.")
+        if tokens[0].text.lower() not in ("select", "with"):
+            raise SQLValidationException("Only read only SELECT queries are allowed.")
+        for i, token in enumerate(tokens):
+            if token.kind == "word" and token.text.lower() in WRITE_KEYWORDS:
+                raise SQLValidationException(
+                    f"Only read only SELECT queries are allowed, found {token.text}."
+                )
+            if token.text == ";" and i != len(tokens) - 1:
+                raise SQLValidationException("Only a single SQL statement is allowed.")
+
+        stack = [Frame()]
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            lower = token.text.lower()
+            frame = stack[-1]
+
+            if token.text == "(":
+                previous = tokens[i - 1] if i else None
+                # EXISTS (SELECT ...) and ANY(SELECT ...) hold a query, not arguments.
+                call = (
+                    previous is not None
+                    and self.next_text(i + 1).lower() not in ("select", "with")
+                    and (
+                        previous.is_identifier
+                        or (
+                            previous.is_keyword
+                            and previous.text.lower() in CALL_KEYWORDS
+                        )
+                    )
+                )
+                subquery = frame.relation_start
+                frame.relation_start = False
+                stack.append(Frame(call=call, subquery=subquery))
+                if subquery and self.next_text(i + 1).lower() not in (
+                    "select",
+                    "with",
+                    "values",
+                ):
+                    # a parenthesized join
+                    stack[-1].clause, stack[-1].relation_start = "from", True
+                i += 1
+                continue
+            if token.text == ")":
+                if len(stack) == 1:
+                    raise SQLValidationException(
+                        "Syntax error: unbalanced parentheses."
+                    )
+                closed = stack.pop()
+                if closed.subquery:
+                    stack[-1].expects_alias = True
+                    stack[-1].alias_of = None
+                i += 1
+                continue
+            if token.text == "::":
+                i = self.skip_type(i + 1)
+                continue
+
+            if frame.cte_start and token.is_identifier:
+                i = self.read_cte(i, frame)
+                continue
+            if frame.relation_start and token.is_word and lower not in KEYWORDS:
+                i = self.read_relation(i, frame)
+                continue
+            if frame.expects_alias:
+                alias_end = self.read_alias(i, frame)
+                if alias_end != i:
+                    i = alias_end
+                    continue
+
+            if token.kind == "word" and lower in ("with", "recursive"):
+                frame.clause = "with"
+                frame.cte_start = True
+            elif token.kind == "word" and lower in ("lateral", "only"):
+                pass
+            elif token.kind == "word" and lower in CLAUSE_KEYWORDS:
+                if lower in ("from", "join") and not frame.call:
+                    frame.clause = "from"
+                    frame.relation_start = True
+                elif lower != "from":
+                    frame.clause = lower
+                    frame.relation_start = False
+            elif token.text == ",":
+                if frame.clause == "from":
+                    frame.relation_start = True
+                elif frame.clause == "with":
+                    frame.cte_start = True
+            elif lower == "as" and token.kind == "word":
+                following = tokens[i + 1] if i + 1 < len(tokens) else None
+                if following is not None and following.is_identifier:
+                    self.add_alias(i + 1)
+                    i += 2
+                    continue
+            elif token.is_identifier:
+                previous_text = tokens[i - 1].text.lower() if i else ""
+                if self.next_text(i + 1) == "(":
+                    self.roles[i] = "function"
+                    self.names.add(token.name)
+                elif (
+                    previous_text == "("
+                    and i > 1
+                    and (tokens[i - 2].text.lower() == "extract")
+                ):
+                    # EXTRACT(DOW FROM ...), the field is not a column.
+                    self.roles[i] = "field"
+                elif previous_text == "over" or (
+                    frame.clause == "window" and self.next_text(i + 1).lower() == "as"
+                ):
+                    # WINDOW w AS (...) and OVER w
+                    self.roles[i] = "window"
+                elif frame.clause == "select" and self.ends_expression(i - 1):
+                    self.add_alias(i)
+            i += 1
+
+        if len(stack) != 1:
+            raise SQLValidationException("Syntax error: unbalanced parentheses.")
+
+    def ends_expression(self, i: int) -> bool:
+        if i < 0:
+            return False
+        token = self.tokens[i]
+        return (
+            token.is_identifier
+            or token.kind in ("number", "string", "dollar", "param")
+            or token.text == ")"
+            or token.text.lower() in EXPRESSION_END_KEYWORDS
+        ) and self.next_text(i + 1) != "."
+
+    def add_alias(self, i: int) -> None:
+        self.roles[i] = "alias"
+        self.names.add(self.tokens[i].name)
+
+    def skip_type(self, i: int) -> int:
+        # ::type, ::type(n), ::timestamp with time zone
+        if i < len(self.tokens) and self.tokens[i].is_word:
+            self.roles[i] = "type"
+            lower = self.tokens[i].text.lower()
+            i += 1
+            if lower in ("double", "character") and self.next_text(i).lower() in (
+                "precision",
+                "varying",
+            ):
+                i += 1
+            if lower in ("timestamp", "time") and self.next_text(i).lower() in (
+                "with",
+                "without",
+            ):
+                i += 3
+            if self.next_text(i) == "(":
+                while i < len(self.tokens) and self.tokens[i].text != ")":
+                    self.roles[i] = "type"
+                    i += 1
+                i += 1
+        return i
+
+    def read_names(self, i: int) -> int:
+        """Read a parenthesized list of column names, e.g. of a CTE or an alias."""
+        i += 1
+        while i < len(self.tokens) and self.tokens[i].text != ")":
+            if self.tokens[i].is_word:
+                self.add_alias(i)
+            i += 1
+        return i + 1
+
+    def read_cte(self, i: int, frame: Frame) -> int:
+        frame.cte_start = False
+        self.roles[i] = "cte"
+        self.ctes.add(self.tokens[i].name)
+        self.qualifiers[self.tokens[i].name] = None
+        i += 1
+        if self.next_text(i) == "(":
+            i = self.read_names(i)
+        return i
+
+    def read_relation(self, i: int, frame: Frame) -> int:
+        frame.relation_start = False
+        tokens = self.tokens
+        schema, name_index = None, i
+        if self.next_text(i + 1) == "." and i + 2 < len(tokens):
+            schema, name_index = tokens[i].name, i + 2
+        name = tokens[name_index].name
+
+        if self.next_text(name_index + 1) == "(":
+            # a set returning function, its columns are unknown.
+            for j in range(i, name_index + 1):
+                self.roles[j] = "function"
+            self.unknown_columns = True
+            frame.expects_alias, frame.alias_of = True, None
+            return name_index + 1
+
+        for j in range(i, name_index + 1):
+            self.roles[j] = "relation"
+        if schema is None and name in self.ctes:
+            relation = None
+        else:
+            relation = self.find_relation(schema, name)
+            if relation is None:
+                qualified = f"{schema}.{name}" if schema else name
+                views = ", ".join(sorted(self.schema))
+                raise SQLValidationException(
+                    f"Relation {qualified} does not exist. "
+                    f"The available views and tables are: {views}."
+                )
+            self.relations.append(relation)
+            if self.schema[relation] is None:
+                self.unknown_columns = True
+        self.qualifiers[name] = relation
+        frame.expects_alias, frame.alias_of = True, relation
+        return name_index + 1
+
+    def read_alias(self, i: int, frame: Frame) -> int:
+        """Read the optional alias of a relation, returns i if there is none."""
+        frame.expects_alias = False
+        tokens = self.tokens
+        j = i
+        if tokens[j].text.lower() == "as" and j + 1 < len(tokens):
+            j += 1
+        if not tokens[j].is_identifier:
+            return i
+        self.roles[j] = "alias"
+        self.qualifiers[tokens[j].name] = frame.alias_of
+        j += 1
+        if self.next_text(j) == "(":
+            j = self.read_names(j)
+        return j
+
+    def check_columns(self) -> None:
+        """Check the unqualified column references against the columns of all the
+        relations of the query together, not per subquery scope. A column of a
+        relation read elsewhere in the query passes and is left to the database,
+        the checks here only reject names no relation has."""
+        tokens = self.tokens
+        columns: set[str] = set()
+        for relation in self.relations:
+            columns |= self.schema[relation] or set()
+        known = columns | self.names
+
+        for i, token in enumerate(tokens):
+            if self.roles[i] or not token.is_identifier:
+                continue
+            if i and tokens[i - 1].text == ".":
+                continue
+
+            if self.next_text(i + 1) == ".":
+                self.check_qualified(i)
+                continue
+            # a relation or its alias as a value is the whole row, e.g. json_agg(v)
+            if token.name in self.qualifiers:
+                continue
+            if not self.unknown_columns and token.name not in known:
+                raise SQLValidationException(
+                    f"Column {token.name} does not exist in "
+                    f"{', '.join(sorted(set(self.relations))) or 'the query'}, "
+                    f"the columns are: {', '.join(sorted(columns))}."
+                )
+
+    def check_qualified(self, i: int) -> None:
+        tokens = self.tokens
+        qualifier = tokens[i].name
+        column_index = i + 2
+        if self.next_text(i + 3) == "(":
+            # schema.function()
+            return
+        if qualifier in self.qualifiers:
+            relation = self.qualifiers[qualifier]
+        elif self.next_text(i + 3) == "." and column_index < len(tokens):
+            # schema.view.column
+            relation = self.find_relation(qualifier, tokens[column_index].name)
+            column_index = i + 4
+            if relation not in self.relations:
+                raise SQLValidationException(
+                    f"Missing FROM clause entry for {qualifier}.{tokens[i + 2].name}."
+                )
+        else:
+            raise SQLValidationException(f"Missing FROM clause entry for {qualifier}.")
+
+        if relation is None or column_index >= len(tokens):
+            return
+        column = tokens[column_index]
+        columns = self.schema.get(relation)
+        if columns is None or not column.is_word or column.name in columns:
+            return
+        raise SQLValidationException(
+            f"Column {column.name} does not exist in {relation}, "
+            f"its columns are: {', '.join(sorted(columns))}."
+        )
+
+    def enforce_limit(self, max_rows: int) -> int:
+        """Clamp the LIMIT or FETCH FIRST of the outer query to max_rows, or add a
+        LIMIT if there is none."""
+        tokens = self.tokens
+        depth = 0
+        for i, token in enumerate(tokens):
+            depth += (token.text == "(") - (token.text == ")")
+            lower = token.text.lower()
+            if depth or token.kind != "word":
+                continue
+            if lower == "limit":
+                value_index = i + 1
+            elif lower == "fetch" and self.next_text(i + 1).lower() in (
+                "first",
+                "next",
+            ):
+                value_index = i + 2
+                if self.next_text(value_index).lower() in ("row", "rows"):
+                    # FETCH FIRST ROW ONLY
+                    return 1
+            else:
+                continue
+
+            value = self.next_text(value_index)
+            if lower == "limit" and value.lower() == "all":
+                tokens[value_index] = Token("number", str(max_rows))
+                return max_rows
+            if not value.isdigit():
+                raise SQLValidationException("LIMIT must be a whole number of rows.")
+            if int(value) > max_rows:
+                tokens[value_index] = Token("number", str(max_rows))
+                return max_rows
+            return int(value)
+
+        if tokens[-1].text == ";":
+            tokens.pop()
+        tokens += [Token("word", "LIMIT"), Token("number", str(max_rows))]
+        return max_rows
+
+
+def validate_sql(query: str, schema: Schema, max_rows: int) -> ValidatedSQL:
+    """Validate a query against the schema and return its canonical form."""
+    analysis = SQLAnalysis(tokenize(query), schema)
+    analysis.analyze()
+    analysis.check_columns()
+    limit = analysis.enforce_limit(max_rows)
+
+    tokens = analysis.tokens
+    if tokens[-1].text == ";":
+        tokens.pop()
+    sql = canonical_sql(tokens)
+    return ValidatedSQL(
+        sql=sql,
+        cache_key=hashlib.sha256(sql.encode()).hexdigest(),
+        relations=sorted(set(analysis.relations)),
+        limit=limit,
+    )
+
+
+class SQLValidatorEnv(Env):
+    # check generated SQL against the schema definitions before executing it.
+    sql_validation: bool = True
+    # rows a query returns at most. A LIMIT is added to queries without one, larger
+    # limits are lowered to it, and the result renderer stops reading there.
+    sql_max_rows: int = 1_000
+
+
+@dataclass
+class SQLValidator(ISQLValidator):
+    db_definitions: IDatabaseDefinitions
+    env: SQLValidatorEnv = field(default_factory=SQLValidatorEnv)
+
+    def __post_init__(self) -> None:
+        self.schema: Schema | None = None
+
+    async def get_schema(self) -> Schema:
+        if self.schema is None:
+            schema: Schema = {}
+            for table in self.db_definitions.get_table_definitions():
+                schema[f"{table.db_schema}.{table.name}".lower()] = None
+            view_schemas = await self.db_definitions.get_view_schemas()
+            for view in self.db_definitions.get_view_definitions():
+                name = f"{view.db_schema}.{view.name}"
+                columns = {c["column_name"] for c in view_schemas.get(name) or []}
+                # a view missing from the database has no columns to check against.
+                schema[name.lower()] = columns or None
+            self.schema = schema
+        return self.schema
+
+    async def validate(self, query: str) -> ValidatedSQL:
+        if not self.env.sql_validation:
+            sql = query.strip().rstrip(";").strip()
+            return ValidatedSQL(
+                sql=sql, cache_key=hashlib.sha256(sql.encode()).hexdigest()
+            )
+        return validate_sql(query, await self.get_schema(), self.env.sql_max_rows)
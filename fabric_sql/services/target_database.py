@@ -12,6 +12,11 @@ class TargetDatabaseEnv(Env):
     dest_postgres_database: str
     dest_postgres_password: str | None = None
     dest_postgres_username: str
+    dest_postgres_pool_size: int = 10
+    dest_postgres_read_pool_size: int = 0
+    dest_postgres_read_host: str | None = None
+    dest_postgres_max_open_cursors: int = 4
+    dest_postgres_cursor_ttl_seconds: float = 300
 
 
 @dataclass
@@ -25,4 +30,9 @@ class TargetDatabase(PostgresDBService, ITargetDatabase):
             postgres_database=self.src_env.dest_postgres_database,
             postgres_password=self.src_env.dest_postgres_password,
             postgres_username=self.src_env.dest_postgres_username,
+            postgres_pool_size=self.src_env.dest_postgres_pool_size,
+            postgres_read_pool_size=self.src_env.dest_postgres_read_pool_size,
+            postgres_read_host=self.src_env.dest_postgres_read_host,
+            postgres_max_open_cursors=self.src_env.dest_postgres_max_open_cursors,
+            postgres_cursor_ttl_seconds=self.src_env.dest_postgres_cursor_ttl_seconds,
         )
@@ -0,0 +1,137 @@
+import time
+from typing import Any, AsyncGenerator, Literal, Mapping, Optional, Sequence
+
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from pydantic import BaseModel
+
+from fabric_sql.protocols.i_turn_tracer import ITurnTracer
+
+
+def get_usage(result: CreateResult) -> dict[str, Any]:
+    return {
+        "prompt_tokens": result.usage.prompt_tokens,
+        "completion_tokens": result.usage.completion_tokens,
+        "cached": result.cached,
+    }
+
+
+class TracingClient(ChatCompletionClient):
+    """Wraps a client to record every model call as an llm span of the current
+    turn. Wrap the cached client so cache hits are recorded as such."""
+
+    def __init__(
+        self, client: ChatCompletionClient, tracer: ITurnTracer, name: str
+    ) -> None:
+        self.client = client
+        self.tracer = tracer
+        self.name = name
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        started = time.perf_counter()
+        try:
+            result = await self.client.create(
+                messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            )
+        except BaseException as e:
+            self.tracer.record(
+                self.name,
+                "llm",
+                (time.perf_counter() - started) * 1000,
+                error=type(e).__name__,
+            )
+            raise
+
+        self.tracer.record(
+            self.name,
+            "llm",
+            (time.perf_counter() - started) * 1000,
+            **get_usage(result),
+        )
+        return result
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[str | CreateResult, None]:
+        started = time.perf_counter()
+        first_chunk: float | None = None
+        attributes: dict[str, Any] = {}
+        try:
+            async for item in self.client.create_stream(
+                messages,
+                tools=tools,
+                tool_choice=tool_choice,
+                json_output=json_output,
+                extra_create_args=extra_create_args,
+                cancellation_token=cancellation_token,
+            ):
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                if isinstance(item, CreateResult):
+                    attributes.update(get_usage(item))
+                yield item
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            if first_chunk is not None:
+                attributes["first_chunk_ms"] = (first_chunk - started) * 1000
+            self.tracer.record(
+                self.name, "llm", (time.perf_counter() - started) * 1000, **attributes
+            )
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(
+        self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []
+    ) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(
+        self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []
+    ) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self.client.capabilities  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self.client.model_info
@@ -0,0 +1,204 @@
+import itertools
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterator
+
+from lagom.environment import Env
+
+from fabric_sql.protocols.i_turn_tracer import ITurnTracer, SpanKind
+
+if TYPE_CHECKING:
+    from autogen_core.models import ChatCompletionClient
+
+
+class TraceEnv(Env):
+    # JSON lines file the spans of every chat turn are appended to, tracing is
+    # disabled when empty.
+    chat_trace_file: str | None = None
+
+
+@dataclass
+class Span:
+    turn: int
+    id: int
+    parent: int | None
+    name: str
+    kind: SpanKind
+    # epoch seconds
+    start: float
+    duration_ms: float = 0.0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SpanTotals:
+    calls: int = 0
+    total_ms: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+
+
+# the span the running code is in, tasks inherit it from the code starting them.
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class TurnTracer(ITurnTracer):
+    env: TraceEnv = field(default_factory=TraceEnv)
+
+    def __post_init__(self) -> None:
+        self._ids = itertools.count(1)
+        self._turns = 0
+        self._turn: Span | None = None
+        self._spans: list[Span] = []
+        # the agent currently producing messages and when the last one arrived.
+        self._agent: Span | None = None
+        self._last_event = 0.0
+        self._totals: dict[tuple[str, str], SpanTotals] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.env.chat_trace_file)
+
+    def _new_span(self, name: str, kind: SpanKind, start: float) -> Span:
+        assert self._turn is not None
+        parent = _current_span.get() or self._turn
+        return Span(self._turns, next(self._ids), parent.id, name, kind, start)
+
+    def start_turn(self, task: str) -> None:
+        if not self.enabled:
+            return
+        self.end_turn()
+        self._turns += 1
+        now = time.time()
+        self._turn = Span(
+            self._turns, next(self._ids), None, "turn", "turn", now, 0.0, {"task": task}
+        )
+        self._last_event = now
+
+    def end_turn(self) -> None:
+        if self._turn is None:
+            return
+        self._close_agent(self._last_event)
+        self._turn.duration_ms = (time.time() - self._turn.start) * 1000
+        spans = [self._turn, *self._spans]
+        self._turn, self._spans = None, []
+
+        for span in spans:
+            totals = self._totals.setdefault((span.kind, span.name), SpanTotals())
+            totals.calls += 1
+            totals.total_ms += span.duration_ms
+            totals.prompt_tokens += span.attributes.get("prompt_tokens", 0)
+            totals.completion_tokens += span.attributes.get("completion_tokens", 0)
+            totals.cache_hits += bool(span.attributes.get("cached"))
+            totals.errors += bool(span.attributes.get("error"))
+
+        path = Path(self.env.chat_trace_file or "")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a") as f:
+            for span in spans:
+                f.write(json.dumps(asdict(span), default=str) + "\n")
+
+    @contextmanager
+    def span(self, name: str, kind: SpanKind) -> Iterator[dict[str, Any]]:
+        if self._turn is None:
+            yield {}
+            return
+
+        span = self._new_span(name, kind, time.time())
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span.attributes
+        except BaseException as e:
+            span.attributes["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            span.duration_ms = (time.perf_counter() - started) * 1000
+            self._spans.append(span)
+
+    def record(
+        self, name: str, kind: SpanKind, duration_ms: float, **attributes: Any
+    ) -> None:
+        if self._turn is None:
+            return
+        span = self._new_span(name, kind, time.time() - duration_ms / 1000)
+        span.duration_ms = duration_ms
+        span.attributes = attributes
+        self._spans.append(span)
+
+    def _close_agent(self, end: float) -> None:
+        if self._agent:
+            self._agent.duration_ms = (end - self._agent.start) * 1000
+            self._spans.append(self._agent)
+            self._agent = None
+
+    def observe(self, source: str) -> None:
+        # an agent works from the last message of the previous speaker to its own
+        # last message, the selector's model calls included.
+        if self._turn is None:
+            return
+        if self._agent is None or self._agent.name != source:
+            self._close_agent(self._last_event)
+            self._agent = Span(
+                self._turns,
+                next(self._ids),
+                self._turn.id,
+                source,
+                "agent",
+                self._last_event,
+            )
+        self._last_event = time.time()
+
+    def on_query(
+        self,
+        fingerprint: str,
+        duration_ms: float,
+        wait_ms: float,
+        rows: int,
+        error: bool,
+    ) -> None:
+        self.record(
+            "query",
+            "db",
+            duration_ms,
+            query=fingerprint,
+            rows=rows,
+            wait_ms=wait_ms,
+            error=error,
+        )
+
+    def wrap_client(
+        self, client: "ChatCompletionClient", name: str
+    ) -> "ChatCompletionClient":
+        if not self.enabled:
+            return client
+        from fabric_sql.services.tracing_client import TracingClient
+
+        return TracingClient(client, self, name)
+
+    def summary(self) -> str:
+        lines = [f"{self._turns} turns traced to {self.env.chat_trace_file}"]
+        ranked = sorted(self._totals.items(), key=lambda item: -item[1].total_ms)
+        for (kind, name), totals in ranked:
+            line = (
+                f"{kind:<5} {name:<24} {totals.calls:>5} calls "
+                f"{totals.total_ms / 1000:>8.2f}s"
+            )
+            if totals.prompt_tokens or totals.completion_tokens:
+                line += (
+                    f"  {totals.prompt_tokens} prompt / "
+                    f"{totals.completion_tokens} completion tokens, "
+                    f"{totals.cache_hits} cache hits"
+                )
+            if totals.errors:
+                line += f"  {totals.errors} errors"
+            lines.append(line)
+        return "\n".join(lines)
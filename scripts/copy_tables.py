@@ -1,4 +1,6 @@
+import argparse
 import asyncio
+from pathlib import Path
 
 from fabric_sql.hosting import container
 from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
@@ -6,16 +8,13 @@ from fabric_sql.protocols.i_duplicate_db_service import (
     DuplicateDBServiceConfig,
     IDuplicateDBService,
 )
+from fabric_sql.protocols.i_postgres_db_service import IPostgresDBService
 from fabric_sql.protocols.i_source_database import ISourceDatabase
 from fabric_sql.protocols.i_target_database import ITargetDatabase
 
-db_source = container[ISourceDatabase]
-db_target = container[ITargetDatabase]
-dup_service = container[IDuplicateDBService]
-db_definition = container[IDatabaseDefinitions]
-
 
 def get_tbl_config() -> list[DuplicateDBServiceConfig]:
+    db_definition = container[IDatabaseDefinitions]
     return [
         DuplicateDBServiceConfig(
             db_schema=tbl.db_schema, tbl_view=tbl.name, is_view=tbl.is_view
@@ -24,7 +23,28 @@ def get_tbl_config() -> list[DuplicateDBServiceConfig]:
     ]
 
 
-async def create_views_from_sql_file() -> None:
+def get_targets(target_envs: list[str] | None) -> list[IPostgresDBService]:
+    """The target of the .env file, or one target per env file with DEST_POSTGRES_*
+    variables."""
+    if not target_envs:
+        return [container[ITargetDatabase]]
+
+    from dotenv import dotenv_values
+
+    from fabric_sql.services.target_database import TargetDatabase, TargetDatabaseEnv
+
+    return [
+        TargetDatabase(
+            src_env=TargetDatabaseEnv(
+                **{k.lower(): v for k, v in dotenv_values(path).items()}
+            )
+        )
+        for path in target_envs
+    ]
+
+
+async def create_views_from_sql_file(db_target: IPostgresDBService) -> None:
+    db_definition = container[IDatabaseDefinitions]
     async with db_target:
         for view in db_definition.get_view_definitions():
             await db_target.execute(
@@ -33,7 +53,22 @@ async def create_views_from_sql_file() -> None:
             print(f"Successfully created {view.name} view")
 
 
-async def main():
+async def drop_views_from_sql_file(db_target: IPostgresDBService) -> None:
+    db_definition = container[IDatabaseDefinitions]
+    async with db_target:
+        for view in db_definition.get_view_definitions():
+            await db_target.execute(f"DROP VIEW IF EXISTS {view.name} CASCADE;")
+
+
+def keep_target_schema() -> bool:
+    """The partitions copied by the previous run are kept and compared with the
+    source when unchanged partitions are skipped."""
+    from fabric_sql.services.duplicate_db_service import DuplicateDBEnv
+
+    return container[DuplicateDBEnv].dup_skip_unchanged_partitions
+
+
+async def reset_target_schema(db_target: IPostgresDBService) -> None:
     async with db_target:
         try:
             await db_target.execute("DROP SCHEMA IF EXISTS public CASCADE;")
@@ -41,14 +76,72 @@ async def main():
             pass
         await db_target.execute("CREATE SCHEMA public;")
 
-    await dup_service.duplicate(
-        source_db=db_source,
-        target_db=db_target,
-        config=get_tbl_config(),
-    )
 
-    await create_views_from_sql_file()
+async def main(
+    export_snapshot: str | None = None,
+    load_snapshot: str | None = None,
+    target_envs: list[str] | None = None,
+):
+    dup_service = container[IDuplicateDBService]
+    if export_snapshot:
+        await dup_service.export_snapshot(
+            source_db=container[ISourceDatabase],
+            config=get_tbl_config(),
+            snapshot_dir=Path(export_snapshot),
+        )
+        return
+
+    db_targets = get_targets(target_envs)
+    keep_schema = not load_snapshot and keep_target_schema()
+    for db_target in db_targets:
+        if keep_schema:
+            # the views depend on the tables that are dropped and created again.
+            await drop_views_from_sql_file(db_target)
+        else:
+            await reset_target_schema(db_target)
+
+    if load_snapshot:
+        for db_target in db_targets:
+            await dup_service.load_snapshot(
+                target_db=db_target, snapshot_dir=Path(load_snapshot)
+            )
+    else:
+        # every table is read once from the source for all the targets.
+        await dup_service.duplicate(
+            source_db=container[ISourceDatabase],
+            target_db=db_targets,
+            config=get_tbl_config(),
+        )
+
+    for db_target in db_targets:
+        await create_views_from_sql_file(db_target)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Duplicates the source database into the target database."
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--export-snapshot",
+        metavar="DIR",
+        help="only export the source tables to a Parquet snapshot in DIR",
+    )
+    mode.add_argument(
+        "--load-snapshot",
+        metavar="DIR",
+        help="load the target from the Parquet snapshot in DIR, without the source",
+    )
+    parser.add_argument(
+        "--target-env",
+        metavar="FILE",
+        action="append",
+        help="env file with the DEST_POSTGRES_* variables of a target, repeat the "
+        "option to copy to several targets at once",
+    )
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    asyncio.run(main(args.export_snapshot, args.load_snapshot, args.target_env))
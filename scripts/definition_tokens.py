@@ -0,0 +1,15 @@
+import asyncio
+
+from fabric_sql.hosting import container
+from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
+
+
+async def main():
+    db_definition = container[IDatabaseDefinitions]
+    counts = await db_definition.count_definition_tokens()
+    for format, tokens in counts.items():
+        print(f"{format:<8} {tokens:>7} tokens")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
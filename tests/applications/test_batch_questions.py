@@ -0,0 +1,38 @@
+from typing import AsyncGenerator
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import TextMessage
+from pytest_mock import MockerFixture
+
+from applications.batch_questions import get_answer
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+from fabric_sql.services.batch_runner import run_batch, summarize
+
+
+async def respond_sql(*args, **kwargs) -> AsyncGenerator[Response, None]:
+    yield Response(
+        chat_message=TextMessage(content="SELECT missing FROM t", source="agent")
+    )
+
+
+@pytest.mark.asyncio
+async def test_answer_query_failed(mocker: MockerFixture):
+    agent = MagicMock()
+    agent.on_messages_stream = MagicMock(side_effect=respond_sql)
+    compliance_agent = mocker.patch("applications.batch_questions.ComplianceAgent")
+    compliance_agent.return_value.get_agent = AsyncMock(return_value=agent)
+    mocker.patch(
+        "fabric_sql.agents.sql_pipeline.run_query",
+        AsyncMock(side_effect=QueryException('column "missing" does not exist')),
+    )
+
+    results = await run_batch(["Which controls?"], get_answer(MagicMock()), 1)
+
+    # the repairs ran out, the question failed even though it got an answer.
+    assert results[0].error == 'QueryException: column "missing" does not exist'
+    assert results[0].answer == 'Query failed: column "missing" does not exist'
+    assert results[0].sql == "SELECT missing FROM t"
+    assert results[0].repairs == 2
+    assert ", 1 failed" in summarize(results, 1.0)
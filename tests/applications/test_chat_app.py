@@ -0,0 +1,55 @@
+import pytest
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
+
+from applications.chat_app import get_speaker_router
+
+route = get_speaker_router("compliance_agent", "db_query_agent", "user_proxy")
+
+
+def message(source: str, content: str = "text") -> TextMessage:
+    return TextMessage(content=content, source=source)
+
+
+@pytest.mark.parametrize("source", ["user", "user_proxy"])
+def test_route_user_to_compliance(source: str):
+    assert route([message(source, "Which controls failed?")]) == "compliance_agent"
+
+
+def test_route_sql_to_db_query():
+    sql = "```sql\nSELECT account_id FROM v_compliance\n```"
+    assert route([message("user"), message("compliance_agent", sql)]) == (
+        "db_query_agent"
+    )
+
+
+@pytest.mark.parametrize(
+    "source, content",
+    [("compliance_agent", " none "), ("db_query_agent", "| id |\n| 1 |")],
+)
+def test_route_to_user(source: str, content: str):
+    assert route([message("user"), message(source, content)]) == "user_proxy"
+
+
+@pytest.mark.parametrize(
+    "messages",
+    [
+        [],
+        # only events, no chat message.
+        [ModelClientStreamingChunkEvent(content="SEL", source="compliance_agent")],
+        # neither SQL nor NONE, the selector model decides.
+        [message("compliance_agent", "Could you name the framework?")],
+        [message("unknown_agent")],
+    ],
+)
+def test_route_fallback(messages: list):
+    assert route(messages) is None
+
+
+def test_route_last_chat_message():
+    # streaming events after the message do not change the route.
+    messages = [
+        message("db_query_agent"),
+        message("user"),
+        ModelClientStreamingChunkEvent(content="SEL", source="compliance_agent"),
+    ]
+    assert route(messages) == "compliance_agent"
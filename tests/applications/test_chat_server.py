@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from applications.chat_server import (
+    ChatServer,
+    ChatServerEnv,
+    ChatSession,
+    HttpError,
+)
+
+
+def get_server(**kwargs) -> ChatServer:
+    return ChatServer(MagicMock(), ChatServerEnv(**kwargs))
+
+
+def add_session(server: ChatServer, session_id: str) -> None:
+    pipeline = MagicMock()
+    pipeline.run = AsyncMock(return_value="")
+    server.sessions[session_id] = ChatSession(pipeline=pipeline)
+
+
+async def request(
+    server: ChatServer, method: str, path: str, body: bytes = b"", **headers: str
+) -> tuple[int, dict[str, Any]]:
+    fields = {name.replace("_", "-"): value for name, value in headers.items()}
+    fields.setdefault("Content-Length", str(len(body)))
+    head = "".join(f"{name}: {value}\r\n" for name, value in fields.items())
+    reader = asyncio.StreamReader()
+    reader.feed_data(f"{method} {path} HTTP/1.1\r\n{head}\r\n".encode() + body)
+    reader.feed_eof()
+    writer = MagicMock()
+    writer.drain = AsyncMock()
+
+    await server.handle(reader, writer)
+
+    data = b"".join(c.args[0] for c in writer.write.call_args_list)
+    status, _, payload = data.partition(b"\r\n\r\n")
+    return int(status.split()[1]), json.loads(payload)
+
+
+@pytest.mark.asyncio
+async def test_route_session_lifecycle(mocker: MockerFixture):
+    compliance_agent = mocker.patch("applications.chat_server.ComplianceAgent")
+    compliance_agent.return_value.get_agent = AsyncMock()
+    server = get_server()
+
+    status, payload = await request(server, "POST", "/sessions")
+    assert status == HTTPStatus.OK
+    session_id = payload["session_id"]
+    server.sessions[session_id].pipeline.run = AsyncMock(return_value="2 controls")
+
+    status, payload = await request(
+        server, "POST", f"/sessions/{session_id}/messages", b'{"message": "Count"}'
+    )
+    assert (status, payload) == (HTTPStatus.OK, {"response": "2 controls"})
+
+    assert await request(server, "DELETE", f"/sessions/{session_id}") == (
+        HTTPStatus.OK,
+        {},
+    )
+    status, payload = await request(
+        server, "POST", f"/sessions/{session_id}/messages", b'{"message": "Count"}'
+    )
+    assert status == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.asyncio
+async def test_route_unknown():
+    status, payload = await request(get_server(), "GET", "/sessions")
+    assert status == HTTPStatus.NOT_FOUND
+    assert payload == {"error": "No route for GET /sessions"}
+
+
+@pytest.mark.parametrize(
+    "body, expected",
+    [
+        (b'{"message": "Count"}', ("Count", False)),
+        (b'{"message": "Count", "stream": true}', ("Count", True)),
+    ],
+)
+def test_parse_message(body: bytes, expected: tuple[str, bool]):
+    assert get_server().parse_message(body) == expected
+
+
+@pytest.mark.parametrize("body", [b"not json", b'{"text": "Count"}', b"[]"])
+def test_parse_message_invalid(body: bytes):
+    with pytest.raises(HttpError) as error:
+        get_server().parse_message(body)
+    assert error.value.status == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.asyncio
+async def test_turn_already_running():
+    server = get_server()
+    add_session(server, "s1")
+
+    async with server.sessions["s1"].lock:
+        status, payload = await request(
+            server, "POST", "/sessions/s1/messages", b'{"message": "Count"}'
+        )
+
+    assert status == HTTPStatus.TOO_MANY_REQUESTS
+    assert payload == {"error": "A turn is already running"}
+
+
+@pytest.mark.asyncio
+async def test_evict_idle_sessions():
+    server = get_server(chat_server_session_ttl_seconds=60)
+    for session_id in ("idle", "running", "active"):
+        add_session(server, session_id)
+    server.sessions["idle"].last_active = time.monotonic() - 61
+    server.sessions["running"].last_active = time.monotonic() - 61
+
+    # a session running a turn is not evicted, however long the turn takes.
+    async with server.sessions["running"].lock:
+        server.evict_idle_sessions()
+
+    assert list(server.sessions) == ["running", "active"]
+
+
+@pytest.mark.asyncio
+async def test_max_sessions():
+    server = get_server(chat_server_max_sessions=1)
+    add_session(server, "s1")
+
+    status, _ = await request(server, "POST", "/sessions")
+    assert status == HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@pytest.mark.parametrize(
+    "content_length, expected",
+    [
+        ("abc", HTTPStatus.BAD_REQUEST),
+        ("-1", HTTPStatus.BAD_REQUEST),
+        (str(1024 * 1024), HTTPStatus.REQUEST_ENTITY_TOO_LARGE),
+    ],
+)
+@pytest.mark.asyncio
+async def test_invalid_content_length(content_length: str, expected: HTTPStatus):
+    status, _ = await request(
+        get_server(), "POST", "/sessions", Content_Length=content_length
+    )
+    assert status == expected
@@ -0,0 +1,58 @@
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_agentchat.messages import TextMessage
+from autogen_core import CancellationToken
+from autogen_core.models import AssistantMessage, UserMessage
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from fabric_sql.agents.cached_sql_agent import CachedSQLAgent
+from fabric_sql.services.sql_cache import SQLCache, SQLCacheEnv
+
+
+def get_agent(cache: SQLCache, *responses: str) -> CachedSQLAgent:
+    agent = AssistantAgent(
+        "compliance_agent", model_client=ReplayChatCompletionClient(list(responses))
+    )
+    return CachedSQLAgent(agent, cache, "v1")
+
+
+async def ask(agent: CachedSQLAgent, question: str) -> str:
+    response = await agent.on_messages(
+        [TextMessage(content=question, source="user")], CancellationToken()
+    )
+    return response.chat_message.to_text()
+
+
+@pytest.mark.asyncio
+async def test_first_question_cached():
+    cache = SQLCache(env=SQLCacheEnv())
+    first = get_agent(cache, "SELECT 1")
+    assert await ask(first, "failed controls") == "SELECT 1"
+    # only SQL that executed is served.
+    cache.confirm("SELECT 1")
+
+    # another conversation, the model is not called.
+    second = get_agent(cache)
+    assert await ask(second, "Failed controls?") == "SELECT 1"
+    # the wrapped agent knows the turn for the follow up questions.
+    assert await second._agent.model_context.get_messages() == [
+        UserMessage(content="Failed controls?", source="user"),
+        AssistantMessage(content="SELECT 1", source="compliance_agent"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_follow_up_not_cached():
+    cache = SQLCache(env=SQLCacheEnv())
+    cache.propose("only the high severity ones", "SELECT 1", "v1")
+    cache.confirm("SELECT 1")
+
+    agent = get_agent(cache, "SELECT 2", "SELECT 3")
+    assert await ask(agent, "failed controls") == "SELECT 2"
+    # refers to the first question, neither served from nor stored in the cache.
+    assert await ask(agent, "only the high severity ones") == "SELECT 3"
+    cache.confirm("SELECT 3")
+    assert cache.get("only the high severity ones", "v1") == "SELECT 1"
+
+    await agent.on_reset(CancellationToken())
+    assert await ask(agent, "only the high severity ones") == "SELECT 1"
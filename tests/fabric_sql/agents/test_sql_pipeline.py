@@ -0,0 +1,98 @@
+from unittest.mock import AsyncMock
+
+import pytest
+from autogen_agentchat.agents import AssistantAgent
+from autogen_ext.models.replay import ReplayChatCompletionClient
+from pytest_mock import MockerFixture
+
+from fabric_sql.agents.cached_sql_agent import extract_sql
+from fabric_sql.agents.sql_pipeline import SQLPipeline
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+
+
+def get_pipeline(*responses: str, max_repairs: int = 2) -> SQLPipeline:
+    agent = AssistantAgent(
+        "compliance_agent", model_client=ReplayChatCompletionClient(list(responses))
+    )
+    return SQLPipeline(agent, max_repairs=max_repairs)
+
+
+def mock_run_query(mocker: MockerFixture, *results: str | Exception) -> AsyncMock:
+    return mocker.patch(
+        "fabric_sql.agents.sql_pipeline.run_query", AsyncMock(side_effect=results)
+    )
+
+
+@pytest.mark.asyncio
+async def test_run_repair(mocker: MockerFixture):
+    run_query = mock_run_query(
+        mocker, QueryException('column "missing" does not exist'), "| id |\n| 1 |"
+    )
+    pipeline = get_pipeline("SELECT missing FROM t", "```sql\nSELECT id FROM t\n```")
+
+    assert await pipeline.run("Which controls?") == "| id |\n| 1 |"
+
+    assert [c.args[0] for c in run_query.await_args_list] == [
+        "SELECT missing FROM t",
+        "SELECT id FROM t",
+    ]
+    assert (pipeline.sql, pipeline.repairs, pipeline.error) == (
+        "SELECT id FROM t",
+        1,
+        None,
+    )
+    # the model was asked to fix the SQL with the error of the failed query.
+    assert isinstance(pipeline.compliance_agent, AssistantAgent)
+    messages = await pipeline.compliance_agent.model_context.get_messages()
+    assert 'column "missing" does not exist' in str(messages[2].content)
+
+
+@pytest.mark.asyncio
+async def test_run_repairs_run_out(mocker: MockerFixture):
+    run_query = mock_run_query(
+        mocker, *[QueryException("syntax error")] * 3, "not reached"
+    )
+    pipeline = get_pipeline(*["SELECT FROM"] * 4)
+
+    result = await pipeline.run("Which controls?")
+
+    # the first query and max_repairs repairs, then the error is returned.
+    assert result == "Query failed: syntax error"
+    assert run_query.await_count == 3
+    assert (pipeline.repairs, pipeline.error) == (2, "syntax error")
+
+
+@pytest.mark.asyncio
+async def test_run_without_repairs(mocker: MockerFixture):
+    run_query = mock_run_query(mocker, QueryException("syntax error"))
+    pipeline = get_pipeline("SELECT FROM", max_repairs=0)
+
+    assert await pipeline.run("Which controls?") == "Query failed: syntax error"
+    assert run_query.await_count == 1
+    assert (pipeline.repairs, pipeline.error) == (0, "syntax error")
+
+
+@pytest.mark.asyncio
+async def test_run_no_sql(mocker: MockerFixture):
+    run_query = mock_run_query(mocker)
+    pipeline = get_pipeline("Could you name the framework?")
+
+    assert await pipeline.run("Which controls?") == "Could you name the framework?"
+    run_query.assert_not_awaited()
+    assert pipeline.sql is None
+
+
+@pytest.mark.parametrize(
+    "text, sql",
+    [
+        ("```sql\nSELECT 1\n```", "SELECT 1"),
+        (
+            "with t AS (SELECT 1) SELECT * FROM t",
+            "with t AS (SELECT 1) SELECT * FROM t",
+        ),
+        ("NONE", None),
+        ("```sql\nDELETE FROM t\n```", None),
+    ],
+)
+def test_extract_sql(text: str, sql: str | None):
+    assert extract_sql(text) == sql
@@ -0,0 +1,79 @@
+from fabric_sql.services.adaptive_controller import AdaptiveController
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def get_controller(clock: FakeClock, **kwargs) -> AdaptiveController:
+    return AdaptiveController(
+        max_concurrency=4,
+        batch_rows=1000,
+        max_batch_rows=3000,
+        target_latency_s=1.0,
+        clock=clock,
+        **kwargs,
+    )
+
+
+def test_additive_increase():
+    clock = FakeClock()
+    controller = get_controller(clock)
+
+    for _ in range(10):
+        for _ in range(controller.concurrency):
+            clock.now += 0.5
+            controller.record_batch(1000, 0.5)
+
+    assert controller.concurrency == 4
+    assert controller.batch_rows == 3000
+
+
+def test_multiplicative_decrease():
+    clock = FakeClock()
+    controller = get_controller(clock)
+    controller.concurrency = 4
+    controller.batch_rows = 3000
+
+    controller.record_batch(1000, 1.5)
+    assert (controller.concurrency, controller.batch_rows) == (2, 1500)
+
+    controller.record_error()
+    assert (controller.concurrency, controller.batch_rows) == (1, 750)
+    assert controller.decreases == 2
+
+
+def test_hold_when_throughput_drops():
+    clock = FakeClock()
+    controller = get_controller(clock)
+
+    clock.now += 0.1
+    controller.record_batch(1000, 0.1)
+    assert controller.concurrency == 2
+
+    # more workers but fewer rows per second, the controller stops growing.
+    clock.now += 0.9
+    controller.record_batch(500, 0.4)
+    controller.record_batch(500, 0.4)
+    assert controller.concurrency == 2
+
+
+def test_load_caps():
+    clock = FakeClock()
+    controller = get_controller(clock, source_max_active=10, target_max_active=5)
+    controller.concurrency = 4
+
+    controller.update_load(10, [3])
+    # at the cap, batches may grow but no worker is added.
+    for _ in range(4):
+        clock.now += 0.1
+        controller.record_batch(1000, 0.1)
+    assert controller.concurrency == 4
+    assert controller.batch_rows == 2000
+
+    controller.update_load(3, [3, 6])
+    assert controller.concurrency == 2
@@ -0,0 +1,63 @@
+import datetime
+import uuid
+from decimal import Decimal
+
+import pytest
+from asyncpg.types import Attribute, Type
+
+pa = pytest.importorskip("pyarrow")
+
+from fabric_sql.services.arrow_converter import ArrowConverter  # noqa: E402
+
+
+def get_attribute(name: str, type_name: str) -> Attribute:
+    return Attribute(
+        name=name, type=Type(oid=0, name=type_name, kind="scalar", schema="pg_catalog")
+    )
+
+
+def test_schema():
+    converter = ArrowConverter(
+        [
+            get_attribute("id", "int4"),
+            get_attribute("name", "text"),
+            get_attribute("created", "timestamptz"),
+            get_attribute("amount", "numeric"),
+            get_attribute("tags", "_text"),
+        ]
+    )
+
+    assert converter.schema.types == [
+        pa.int32(),
+        pa.string(),
+        pa.timestamp("us", tz="UTC"),
+        pa.string(),
+        pa.list_(pa.string()),
+    ]
+    assert converter.schema.field("tags").metadata == {b"pg_type": b"_text"}
+
+
+def test_to_record_batch():
+    converter = ArrowConverter(
+        [
+            get_attribute("id", "int8"),
+            get_attribute("day", "date"),
+            get_attribute("amount", "numeric"),
+            get_attribute("key", "uuid"),
+        ]
+    )
+    key = uuid.uuid4()
+
+    batch = converter.to_record_batch(
+        [
+            (1, datetime.date(2024, 6, 1), Decimal("1.50"), key),
+            (2, None, None, None),
+        ]
+    )
+
+    assert batch.num_rows == 2
+    assert batch.column("id").to_pylist() == [1, 2]
+    assert batch.column("day").to_pylist() == [datetime.date(2024, 6, 1), None]
+    # every digit of numeric values is kept.
+    assert batch.column("amount").to_pylist() == ["1.50", None]
+    assert batch.column("key").to_pylist() == [str(key), None]
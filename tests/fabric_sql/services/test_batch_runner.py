@@ -0,0 +1,74 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from fabric_sql.services.batch_runner import (
+    BatchResult,
+    ResultWriter,
+    read_questions,
+    run_batch,
+    summarize,
+)
+
+
+def test_read_questions(tmp_path: Path):
+    text = tmp_path / "questions.txt"
+    text.write_text("# nightly\nWhich connections are inactive?\n\n  Count them  \n")
+    assert read_questions(text) == ["Which connections are inactive?", "Count them"]
+
+    lines = tmp_path / "questions.jsonl"
+    lines.write_text('{"question": "Which frameworks?"}\n')
+    assert read_questions(lines) == ["Which frameworks?"]
+
+
+@pytest.mark.asyncio
+async def test_run_batch_bounded():
+    running = 0
+    max_running = 0
+
+    async def answer(result: BatchResult) -> None:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if result.question == "bad":
+            raise ValueError("no SQL")
+        result.answer = result.question.upper()
+
+    completed: list[BatchResult] = []
+    questions = ["a", "bad", "c", "d", "e"]
+    results = await run_batch(questions, answer, 2, completed.append)
+
+    assert max_running == 2
+    assert [r.question for r in results] == questions
+    assert [r.answer for r in results] == ["A", None, "C", "D", "E"]
+    assert results[1].error == "ValueError: no SQL"
+    assert len(completed) == 5
+    assert all(r.duration_ms > 0 for r in results)
+    assert summarize(results, 1.0).startswith("5 questions in 1.0s, 1 failed")
+
+
+def test_result_writer(tmp_path: Path):
+    results = [
+        BatchResult(1, "b", error="QueryException: timeout"),
+        BatchResult(0, "a", answer="1 row", sql="SELECT 1", duration_ms=5.0),
+    ]
+
+    writer = ResultWriter(tmp_path / "out.jsonl")
+    for result in results:
+        writer.write(result)
+    writer.close()
+    lines = (tmp_path / "out.jsonl").read_text().splitlines()
+    assert [json.loads(line)["index"] for line in lines] == [1, 0]
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    writer = ResultWriter(tmp_path / "out.parquet")
+    for result in results:
+        writer.write(result)
+    writer.close()
+    table = pq.read_table(tmp_path / "out.parquet")
+    assert table.column("question").to_pylist() == ["a", "b"]
+    assert table.column("duration_ms").to_pylist() == [5.0, 0.0]
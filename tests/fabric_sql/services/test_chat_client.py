@@ -1,6 +1,8 @@
+from autogen_ext.models.cache import ChatCompletionCache
 from pytest_mock import MockerFixture
 
 from fabric_sql.services.chat_client import ChatClient, ChatClientEnv
+from fabric_sql.services.llm_cache import ReplayOnlyClient
 
 
 def test_get_client_with_api_key(mocker: MockerFixture):
@@ -69,3 +71,37 @@ def test_get_model_client(mocker: MockerFixture):
     )
     chat_client = ChatClient(env=env)
     assert chat_client.get_model_client() is not None
+
+
+def test_is_streaming(mocker: MockerFixture):
+    mocker.patch("fabric_sql.services.chat_client.AzureOpenAIChatCompletionClient")
+
+    env = ChatClientEnv(
+        azure_openai_endpoint="https://example.com",
+        azure_openai_api_key="test_api_key",
+        azure_openai_api_version="2023-03-15-preview",
+        azure_openai_model_name="gpt-4",
+        azure_openai_stream=False,
+    )
+    assert ChatClient(env=env).is_streaming() is False
+
+
+def test_get_model_client_cached(mocker: MockerFixture, tmp_path):
+    mocked_default_cred = mocker.patch(
+        "fabric_sql.services.chat_client.DefaultAzureCredential"
+    )
+    mocker.patch("fabric_sql.services.chat_client.AzureOpenAIChatCompletionClient")
+
+    env = ChatClientEnv(
+        azure_openai_endpoint="https://example.com",
+        azure_openai_api_version="2023-03-15-preview",
+        azure_openai_model_name="gpt-4",
+        azure_openai_cache_mode="replay",
+        azure_openai_cache_dir=str(tmp_path),
+    )
+    model_client = ChatClient(env=env).get_model_client()
+
+    mocked_default_cred.assert_not_called()
+    assert isinstance(model_client, ChatCompletionCache)
+    assert isinstance(model_client.client, ReplayOnlyClient)
+    assert (tmp_path / "gpt-4").is_dir()
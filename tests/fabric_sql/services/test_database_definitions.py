@@ -1,9 +1,17 @@
+import os
+from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+from pytest_mock import MockerFixture
 
+from fabric_sql import DB_DEFINITION_PATH
 from fabric_sql.protocols.i_target_database import ITargetDatabase
-from fabric_sql.services.database_definitions import DatabaseDefinitions
+from fabric_sql.services import database_definitions
+from fabric_sql.services.database_definitions import (
+    DatabaseDefinitions,
+    load_definition,
+)
 
 
 def tet_post_init() -> None:
@@ -57,3 +65,117 @@ def test_get_view_definitions() -> None:
     svc = DatabaseDefinitions(target_db=MagicMock(), view_definitions={})
     views = svc.get_view_definitions()
     assert len(views) > 0
+
+
+@pytest.mark.asyncio
+async def test_get_definitions_cached() -> None:
+    mock_target_db = MagicMock(spec=ITargetDatabase)
+    mock_target_db.show_view_definition = AsyncMock(return_value=[])
+
+    svc = DatabaseDefinitions(target_db=mock_target_db, view_definitions={})
+    svc.render_definitions = AsyncMock(return_value="definitions")
+
+    assert await svc.get_definitions() == "definitions"
+    assert await svc.get_definitions() == "definitions"
+    svc.render_definitions.assert_awaited_once()
+
+
+def test_load_definition_cached(tmp_path: Path, mocker: MockerFixture) -> None:
+    path = tmp_path / "definitions.yaml"
+    path.write_bytes(DB_DEFINITION_PATH.read_bytes())
+    parse = mocker.spy(database_definitions, "parse_definition")
+
+    first = load_definition(path, str(tmp_path / "cache"))
+    second = load_definition(path, str(tmp_path / "cache"))
+
+    assert second == first
+    assert parse.call_count == 1
+
+    # touched without changes, the content hash still matches.
+    os.utime(path, ns=(0, 0))
+    assert load_definition(path, str(tmp_path / "cache")) == first
+    assert parse.call_count == 1
+
+
+def test_load_definition_edited(tmp_path: Path) -> None:
+    path = tmp_path / "definitions.yaml"
+    path.write_bytes(DB_DEFINITION_PATH.read_bytes())
+    first = load_definition(path, str(tmp_path / "cache"))
+
+    edited = f"{first.version[:-1]}x"
+    content = DB_DEFINITION_PATH.read_bytes()
+    path.write_bytes(content.replace(first.version.encode(), edited.encode()))
+
+    assert load_definition(path, str(tmp_path / "cache")).version == edited
+
+
+def test_load_definition_corrupt_cache(tmp_path: Path) -> None:
+    path = tmp_path / "definitions.yaml"
+    path.write_bytes(DB_DEFINITION_PATH.read_bytes())
+    load_definition(path, str(tmp_path / "cache"))
+
+    for cache_file in (tmp_path / "cache").iterdir():
+        cache_file.write_bytes(b"not a pickle")
+
+    assert load_definition(path, str(tmp_path / "cache")).tables
+
+
+VIEW_COLUMNS = [
+    {
+        "column_name": "account_id",
+        "data_type": "character varying",
+        "full_data_type": "character varying(255)",
+        "is_nullable": "YES",
+        "column_default": None,
+        "ordinal_position": 1,
+    },
+    {
+        "column_name": "framework_order",
+        "data_type": "integer",
+        "full_data_type": "integer(32)",
+        "is_nullable": "YES",
+        "column_default": None,
+        "ordinal_position": 2,
+    },
+]
+
+
+@pytest.mark.asyncio
+async def test_render_compact_deterministic(mocker: MockerFixture) -> None:
+    mocker.patch.object(database_definitions, "_get_encoding", return_value=None)
+    mock_target_db = MagicMock(spec=ITargetDatabase)
+    mock_target_db.show_view_definition = AsyncMock(return_value=VIEW_COLUMNS)
+    svc = DatabaseDefinitions(target_db=mock_target_db, view_definitions={})
+
+    compact = await svc.render_definitions("compact")
+    view = svc.defn.views[0]
+    assert (
+        f"{view.db_schema}.{view.name}(account_id varchar(255), framework_order int)"
+        in compact
+    )
+    assert "+--" not in compact
+
+    # fetched in another order by another session, rendered the same.
+    shuffled = DatabaseDefinitions(
+        target_db=mock_target_db,
+        view_definitions={
+            name: list(reversed(cols))
+            for name, cols in reversed(svc.view_definitions.items())
+        },
+    )
+    assert await shuffled.render_definitions("compact") == compact
+
+    counts = await svc.count_definition_tokens()
+    assert 0 < counts["compact"] < counts["grid"]
+
+
+@pytest.mark.asyncio
+async def test_render_definitions_format() -> None:
+    svc = DatabaseDefinitions(target_db=MagicMock(), view_definitions={"abc": []})
+    assert (await svc.render_definitions("grid")).startswith("Column Definitions:")
+
+    svc.env.db_definitions_format = "grid"
+    assert (await svc.get_definitions()).startswith("Column Definitions:")
+
+    with pytest.raises(ValueError):
+        await svc.render_definitions("yaml")  # type: ignore
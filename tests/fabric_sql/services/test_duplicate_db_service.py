@@ -1,10 +1,14 @@
+import asyncio
+import re
+from contextlib import asynccontextmanager
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from fabric_sql.protocols.i_duplicate_db_service import DuplicateDBServiceConfig
 from fabric_sql.protocols.i_postgres_db_service import IPostgresDBService
-from fabric_sql.services.duplicate_db_service import DuplicateDBService
+from fabric_sql.services.adaptive_controller import AdaptiveController
+from fabric_sql.services.duplicate_db_service import DuplicateDBEnv, DuplicateDBService
 
 
 @pytest.mark.asyncio
@@ -56,33 +60,59 @@ async def test_create_table():
 
 @pytest.mark.asyncio
 async def test_copy_table_data():
+    async def fetch_batches(query: str, batch_size: int, snapshot: str | None):
+        yield [{"id": 1}, {"id": "a"}]
+        yield [{"id": "a'"}, {"id": None}]
+
     mock_source_db = MagicMock(spec=IPostgresDBService)
-    mock_source_db.query = AsyncMock(
-        return_value=[
-            {"id": 1},
-            {"id": "a"},
-            {"id": "a'"},
-            {"id": None},
-        ]
-    )
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
 
     mock_target_db = MagicMock(spec=IPostgresDBService)
     mock_target_db.execute = AsyncMock()
 
     dup_service = DuplicateDBService()
-    await dup_service.copy_table_data(mock_source_db, mock_target_db, "public", "test")
+    metrics = await dup_service.copy_table_data(
+        mock_source_db, mock_target_db, "public", "test"
+    )
 
-    mock_source_db.query.assert_awaited_once_with("SELECT * FROM public.test;")
-    assert mock_target_db.execute.call_count == 4
-    mock_target_db.execute.assert_any_call("INSERT INTO public.test (id) VALUES (1);")
-    mock_target_db.execute.assert_any_call("INSERT INTO public.test (id) VALUES ('a');")
+    mock_source_db.fetch_batches.assert_called_once_with(
+        "SELECT * FROM public.test;", 1000, snapshot=None
+    )
+    assert mock_target_db.execute.call_count == 2
     mock_target_db.execute.assert_any_call(
-        "INSERT INTO public.test (id) VALUES ('a''');"
+        "INSERT INTO public.test (id) VALUES (1), ('a');", raise_errors=True
     )
     mock_target_db.execute.assert_any_call(
-        "INSERT INTO public.test (id) VALUES (NULL);"
+        "INSERT INTO public.test (id) VALUES ('a'''), (NULL);", raise_errors=True
+    )
+    assert (metrics.rows, metrics.batches) == (4, 2)
+
+
+@pytest.mark.asyncio
+async def test_copy_table_data_overlaps_slow_target():
+    async def fetch_batches(query: str, batch_size: int, snapshot: str | None):
+        for i in range(6):
+            await asyncio.sleep(0.01)
+            yield [{"id": i}]
+
+    async def execute(statement: str, raise_errors: bool = False):
+        await asyncio.sleep(0.05)
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock(side_effect=execute)
+
+    dup_service = DuplicateDBService(DuplicateDBEnv(dup_queue_batches=2))
+    metrics = await dup_service.copy_table_data(
+        mock_source_db, mock_target_db, "public", "test"
     )
 
+    assert metrics.rows == 6
+    assert metrics.max_queue_depth == 2
+    # the reader waited on the full queue, the target sets the pace.
+    assert metrics.bottleneck == "target"
+
 
 @pytest.mark.asyncio
 async def test_generate_create_materialized_view_statement():
@@ -261,6 +291,7 @@ async def test_duplicate_with_materialized_views():
     ]
 
     dup_service = DuplicateDBService()
+    dup_service.get_partition_key = AsyncMock(return_value=None)
 
     # Mock table methods (now used for both tables and materialized views as tables)
     dup_service.generate_create_table_statement = AsyncMock()
@@ -300,6 +331,7 @@ async def test_duplicate():
     ]
 
     dup_service = DuplicateDBService()
+    dup_service.get_partition_key = AsyncMock(return_value=None)
     dup_service.generate_create_table_statement = AsyncMock()
     dup_service.create_table = AsyncMock()
     dup_service.copy_table_data = AsyncMock()
@@ -432,3 +464,374 @@ async def test_copy_materialized_view_as_table():
     dup_service.copy_table_data.assert_called_once_with(
         mock_source_db, mock_target_db, "public", "user_stats"
     )
+
+
+@pytest.mark.asyncio
+async def test_export_load_snapshot(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    schema = pa.schema([("id", pa.int32()), ("name", pa.string())])
+
+    async def query_arrow(query: str, snapshot: str | None):
+        yield pa.RecordBatch.from_pylist([{"id": 1, "name": "a"}], schema=schema)
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.query_arrow = query_arrow
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock()
+    mock_target_db.copy_records = AsyncMock()
+
+    dup_service = DuplicateDBService()
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.test (id INT, name TEXT);"
+    )
+
+    manifest = await dup_service.export_snapshot(
+        mock_source_db,
+        [DuplicateDBServiceConfig(db_schema="public", tbl_view="test")],
+        tmp_path,
+    )
+    assert manifest.tables[0].rows == 1
+    assert (tmp_path / "manifest.json").exists()
+
+    await dup_service.load_snapshot(mock_target_db, tmp_path)
+
+    mock_target_db.execute.assert_any_call(
+        "CREATE TABLE public.test (id INT, name TEXT);"
+    )
+    mock_target_db.copy_records.assert_awaited_once_with(
+        "public", "test", ["id", "name"], [(1, "a")]
+    )
+
+
+@pytest.mark.asyncio
+async def test_duplicate_to_targets():
+    async def fetch_batches(query: str, batch_size: int, snapshot: str | None):
+        yield [{"id": "1"}, {"id": "2"}]
+        yield [{"id": "3"}]
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
+    mock_target_dbs = [MagicMock(spec=IPostgresDBService) for _ in range(2)]
+    for mock_target_db in mock_target_dbs:
+        mock_target_db.execute = AsyncMock()
+
+    dup_service = DuplicateDBService()
+    dup_service.get_partition_key = AsyncMock(return_value=None)
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.test (id INT);"
+    )
+
+    await dup_service.duplicate(
+        mock_source_db,
+        mock_target_dbs,  # type: ignore
+        [DuplicateDBServiceConfig(db_schema="public", tbl_view="test")],
+    )
+
+    # the source is read once for both targets.
+    dup_service.generate_create_table_statement.assert_awaited_once()
+    mock_source_db.fetch_batches.assert_called_once_with(
+        "SELECT * FROM public.test;", 1000, snapshot=None
+    )
+    for mock_target_db in mock_target_dbs:
+        mock_target_db.execute.assert_any_call(
+            "INSERT INTO public.test (id) VALUES ('1'), ('2');", raise_errors=True
+        )
+        mock_target_db.execute.assert_any_call(
+            "INSERT INTO public.test (id) VALUES ('3');", raise_errors=True
+        )
+
+
+@pytest.mark.asyncio
+async def test_duplicate_parallel_tables_share_snapshot():
+    async def fetch_batches(query: str, batch_size: int, snapshot: str | None):
+        yield [{"id": "1"}]
+
+    @asynccontextmanager
+    async def exported_snapshot():
+        yield "00000003-0000001B-1"
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
+    mock_source_db.exported_snapshot = MagicMock(side_effect=exported_snapshot)
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock()
+
+    dup_service = DuplicateDBService(DuplicateDBEnv(dup_parallel_tables=2))
+    dup_service.get_partition_key = AsyncMock(return_value=None)
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.test (id INT);"
+    )
+
+    await dup_service.duplicate(
+        mock_source_db,
+        mock_target_db,
+        [
+            DuplicateDBServiceConfig(db_schema="public", tbl_view="a"),
+            DuplicateDBServiceConfig(db_schema="public", tbl_view="b"),
+        ],
+    )
+
+    # one coordinator transaction, every reader imports its snapshot.
+    mock_source_db.exported_snapshot.assert_called_once()
+    assert [
+        c.kwargs["snapshot"] for c in mock_source_db.fetch_batches.call_args_list
+    ] == [
+        "00000003-0000001B-1",
+        "00000003-0000001B-1",
+    ]
+    mock_target_db.execute.assert_any_call(
+        "INSERT INTO public.a (id) VALUES ('1');", raise_errors=True
+    )
+    mock_target_db.execute.assert_any_call(
+        "INSERT INTO public.b (id) VALUES ('1');", raise_errors=True
+    )
+
+
+@pytest.mark.asyncio
+async def test_duplicate_adaptive():
+    in_flight = []
+    max_in_flight = 0
+
+    async def fetch_batches(query: str, batch_size, snapshot: str | None):
+        nonlocal max_in_flight
+        in_flight.append(query)
+        max_in_flight = max(max_in_flight, len(in_flight))
+        await asyncio.sleep(0.01)
+        yield [{"id": str(i)} for i in range(batch_size())]
+        in_flight.remove(query)
+
+    @asynccontextmanager
+    async def exported_snapshot():
+        yield "00000003-0000001B-1"
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
+    mock_source_db.exported_snapshot = MagicMock(side_effect=exported_snapshot)
+    # the source is over its cap, the run must not add tables in flight.
+    mock_source_db.query = AsyncMock(return_value=[{"active": "20"}])
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock()
+
+    dup_service = DuplicateDBService(
+        DuplicateDBEnv(
+            dup_adaptive=True,
+            dup_parallel_tables=4,
+            dup_batch_rows=2,
+            dup_source_max_active=10,
+        )
+    )
+    dup_service.get_partition_key = AsyncMock(return_value=None)
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.test (id INT);"
+    )
+
+    await dup_service.duplicate(
+        mock_source_db,
+        mock_target_db,
+        [
+            DuplicateDBServiceConfig(db_schema="public", tbl_view=name)
+            for name in ("a", "b", "c")
+        ],
+    )
+
+    mock_source_db.query.assert_awaited()
+    inserts = [
+        c.args[0][: len("INSERT INTO public.a")]
+        for c in mock_target_db.execute.await_args_list
+        if c.args[0].startswith("INSERT")
+    ]
+    assert sorted(inserts) == [f"INSERT INTO public.{name}" for name in "abc"]
+    assert max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_run_adaptive_load_rises_mid_table():
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    # idle when the table is admitted, over the cap while it is copied.
+    mock_source_db.query = AsyncMock(
+        side_effect=[[{"active": "1"}], *([[{"active": "20"}]] * 100)]
+    )
+    dup_service = DuplicateDBService(
+        DuplicateDBEnv(dup_load_sample_seconds=0.01, dup_source_max_active=10)
+    )
+    controller = AdaptiveController(
+        max_concurrency=2,
+        batch_rows=1000,
+        max_batch_rows=1000,
+        target_latency_s=1.0,
+        source_max_active=10,
+    )
+    batch_rows = []
+
+    async def copy(cfg: DuplicateDBServiceConfig, snapshot: str | None) -> None:
+        for _ in range(3):
+            batch_rows.append(controller.get_batch_rows())
+            await asyncio.sleep(0.03)
+
+    await dup_service.run_adaptive(
+        mock_source_db,
+        [DuplicateDBServiceConfig(db_schema="public", tbl_view="a")],
+        copy,
+        controller,
+        [],
+        None,
+    )
+
+    # every table was admitted before the spike, the batches still back off.
+    assert batch_rows[0] == 1000
+    assert batch_rows[-1] < 1000
+    assert controller.decreases > 0
+
+
+@pytest.mark.asyncio
+async def test_active_sessions_unavailable():
+    mock_db = MagicMock(spec=IPostgresDBService)
+    # query() prints a failure and returns None.
+    mock_db.query = AsyncMock(return_value=None)
+    assert await DuplicateDBService.active_sessions(mock_db) is None
+
+    mock_db.query = AsyncMock(return_value=[{"active": "3"}])
+    assert await DuplicateDBService.active_sessions(mock_db) == 3
+
+
+def get_partition_rows(**comments: str) -> list[dict[str, str]]:
+    return [
+        {
+            "db_schema": "public",
+            "name": name,
+            "bound": bound,
+            "partition_key": "None",
+            "comment": comments.get(name, "None"),
+        }
+        for name, bound in [
+            ("events_2024", "FOR VALUES FROM ('2024-01-01') TO ('2025-01-01')"),
+            ("events_2025", "FOR VALUES FROM ('2025-01-01') TO ('2026-01-01')"),
+        ]
+    ]
+
+
+@pytest.mark.asyncio
+async def test_copy_partitioned_table():
+    @asynccontextmanager
+    async def exported_snapshot():
+        yield "00000003-0000001B-1"
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.query = AsyncMock(return_value=get_partition_rows())
+    mock_source_db.exported_snapshot = MagicMock(side_effect=exported_snapshot)
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock()
+
+    dup_service = DuplicateDBService()
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.events (day date);"
+    )
+    dup_service.copy_table_data_to_targets = AsyncMock()
+
+    await dup_service.copy_partitioned_table(
+        mock_source_db, [mock_target_db], "public", "events", "RANGE (day)"
+    )
+
+    mock_target_db.execute.assert_any_call(
+        "CREATE TABLE public.events (day date) PARTITION BY RANGE (day);"
+    )
+    mock_target_db.execute.assert_any_call(
+        "CREATE TABLE public.events_2024 PARTITION OF public.events "
+        "FOR VALUES FROM ('2024-01-01') TO ('2025-01-01');"
+    )
+    # every partition is read on its own, in parallel at one snapshot.
+    dup_service.copy_table_data_to_targets.assert_any_await(
+        mock_source_db, [mock_target_db], "public", "events_2024", "00000003-0000001B-1"
+    )
+    dup_service.copy_table_data_to_targets.assert_any_await(
+        mock_source_db, [mock_target_db], "public", "events_2025", "00000003-0000001B-1"
+    )
+    # without dup_skip_unchanged_partitions no fingerprint is read or kept.
+    mock_source_db.fetch_batches.assert_not_called()
+    assert not any(
+        c.args[0].startswith("COMMENT ON TABLE public.events_")
+        for c in mock_target_db.execute.await_args_list
+    )
+
+
+def get_partitioned_target_db() -> MagicMock:
+    """A target that keeps its tables and their comments from one run to the next."""
+    comments: dict[str, str | None] = {}
+
+    async def execute(statement: str, raise_errors: bool = False) -> None:
+        if match := re.match(r"COMMENT ON TABLE (\S+) IS '(.*)';", statement):
+            comments[match[1]] = match[2]
+        elif match := re.match(r"DROP TABLE IF EXISTS (\S+);", statement):
+            comments.pop(match[1], None)
+        elif match := re.match(r"CREATE TABLE (\S+) ", statement):
+            comments[match[1]] = None
+
+    async def query(query: str, workload: str = "read") -> list[dict[str, str]]:
+        if "pg_inherits" not in query:
+            return [{"comment": str(comments.get("public.events"))}]
+        return get_partition_rows(
+            **{
+                name.removeprefix("public."): comment
+                for name, comment in comments.items()
+                if comment and name != "public.events"
+            }
+        )
+
+    mock_target_db = MagicMock(spec=IPostgresDBService)
+    mock_target_db.execute = AsyncMock(side_effect=execute)
+    mock_target_db.query = AsyncMock(side_effect=query)
+    return mock_target_db
+
+
+@pytest.mark.asyncio
+async def test_copy_partitioned_table_skip_unchanged():
+    # row count and sum of xmin of the source partitions.
+    source_data = {"public.events_2024": "10:500", "public.events_2025": "20:900"}
+
+    async def fetch_batches(query: str, snapshot: str | None = None, **kwargs):
+        assert snapshot == "00000003-0000001B-1"
+        yield [{"fingerprint": source_data[query.split("FROM ")[1].split(";")[0]]}]
+
+    @asynccontextmanager
+    async def exported_snapshot():
+        yield "00000003-0000001B-1"
+
+    mock_source_db = MagicMock(spec=IPostgresDBService)
+    mock_source_db.query = AsyncMock(return_value=get_partition_rows())
+    mock_source_db.fetch_batches = MagicMock(side_effect=fetch_batches)
+    mock_source_db.exported_snapshot = MagicMock(side_effect=exported_snapshot)
+    mock_target_db = get_partitioned_target_db()
+
+    dup_service = DuplicateDBService(
+        DuplicateDBEnv(dup_skip_unchanged_partitions=True, dup_parallel_partitions=1)
+    )
+    dup_service.generate_create_table_statement = AsyncMock(
+        return_value="CREATE TABLE public.events (day date);"
+    )
+    dup_service.copy_table_data_to_targets = AsyncMock()
+
+    async def copy_partitioned_table() -> list[str]:
+        dup_service.copy_table_data_to_targets.reset_mock()
+        mock_target_db.execute.reset_mock()
+        await dup_service.copy_partitioned_table(
+            mock_source_db, [mock_target_db], "public", "events", "RANGE (day)"
+        )
+        # the partitions are read at the snapshot of their fingerprint.
+        return sorted(
+            c.args[3]
+            for c in dup_service.copy_table_data_to_targets.await_args_list
+            if c.args[4] == "00000003-0000001B-1"
+        )
+
+    assert await copy_partitioned_table() == ["events_2024", "events_2025"]
+    assert await copy_partitioned_table() == []
+    assert not any(
+        c.args[0].startswith(("CREATE", "DROP", "TRUNCATE"))
+        for c in mock_target_db.execute.await_args_list
+    )
+
+    # a row of 2025 was updated.
+    source_data["public.events_2025"] = "20:1400"
+    assert await copy_partitioned_table() == ["events_2025"]
+    mock_target_db.execute.assert_any_call("TRUNCATE TABLE public.events_2025;")
+    assert await copy_partitioned_table() == []
@@ -0,0 +1,114 @@
+import asyncio
+from contextlib import asynccontextmanager
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    QueryException,
+)
+from fabric_sql.services.fan_out import TargetWriter
+from fabric_sql.services.postgres_db_service import PostgresDBService
+
+
+def get_db() -> MagicMock:
+    db = MagicMock(spec=IPostgresDBService)
+    db.execute = AsyncMock()
+    return db
+
+
+@pytest.mark.asyncio
+async def test_target_writer():
+    db = get_db()
+    writer = TargetWriter(db, queue_size=2)
+    task = asyncio.ensure_future(writer.run())
+
+    for i in range(5):
+        await writer.put(f"INSERT {i}")
+    await writer.close()
+    await task
+
+    assert [c.args[0] for c in db.execute.await_args_list] == [
+        f"INSERT {i}" for i in range(5)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_target_writer_backpressure():
+    writer = TargetWriter(get_db(), queue_size=1)
+    await writer.put("INSERT 0")
+
+    # the writer is not running, the full queue holds back the reader.
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(writer.put("INSERT 1"), 0.05)
+
+
+@pytest.mark.asyncio
+async def test_target_writer_spool(tmp_path: Path):
+    db = get_db()
+    writer = TargetWriter(db, queue_size=1, spool_dir=tmp_path)
+
+    # the writer is not running, the reader is never blocked.
+    for i in range(4):
+        await asyncio.wait_for(writer.put(f"INSERT '{i}'"), 0.05)
+    assert writer.spooled == 3
+
+    task = asyncio.ensure_future(writer.run())
+    await writer.close()
+    await task
+
+    assert [c.args[0] for c in db.execute.await_args_list] == [
+        f"INSERT '{i}'" for i in range(4)
+    ]
+
+
+def get_failing_db(
+    mocker, failures: list[Exception | str]
+) -> tuple[PostgresDBService, AsyncMock]:
+    """A database service whose connection fails the statements as listed, so the
+    errors take the service's own error handling."""
+    conn = AsyncMock()
+    conn.execute = AsyncMock(side_effect=failures)
+
+    @asynccontextmanager
+    async def acquire():
+        yield conn
+
+    mocker.patch.object(PostgresDBService, "get_env", return_value=MagicMock())
+    db = PostgresDBService()
+    db._pool = MagicMock()
+    db._pool.acquire = acquire
+    db._ensure_pool = AsyncMock()  # type: ignore
+    db.close = AsyncMock()  # type: ignore
+    return db, conn
+
+
+@pytest.mark.asyncio
+async def test_target_writer_retries_with_controller(mocker):
+    mocker.patch("fabric_sql.services.fan_out.asyncio.sleep", AsyncMock())
+    db, conn = get_failing_db(mocker, [Exception("canceling statement"), "INSERT 0 1"])
+    controller = MagicMock()
+    writer = TargetWriter(db, queue_size=2, controller=controller)
+
+    await writer.put("INSERT 1")
+    await writer.close()
+    await writer.run()
+
+    controller.record_error.assert_called_once()
+    assert conn.execute.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_target_writer_failed_batch_raises(mocker):
+    mocker.patch("fabric_sql.services.fan_out.asyncio.sleep", AsyncMock())
+    db, conn = get_failing_db(mocker, [Exception("duplicate key")] * 3)
+    writer = TargetWriter(db, queue_size=2)
+
+    await writer.put("INSERT 1")
+    await writer.close()
+    # the batch is not dropped silently once the retries are used up.
+    with pytest.raises(QueryException, match="duplicate key"):
+        await writer.run()
+    assert conn.execute.await_count == 1 + TargetWriter.retries
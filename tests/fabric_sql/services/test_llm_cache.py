@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+
+import pytest
+from autogen_core.models import CreateResult, RequestUsage, UserMessage
+from autogen_ext.models.cache import ChatCompletionCache
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from fabric_sql.services.llm_cache import (
+    DiskCacheStore,
+    LLMCacheMissException,
+    ReplayOnlyClient,
+)
+
+MESSAGES = [UserMessage(content="List the failed controls", source="user")]
+
+
+def get_result(content: str) -> CreateResult:
+    return CreateResult(
+        finish_reason="stop",
+        content=content,
+        usage=RequestUsage(prompt_tokens=1, completion_tokens=1),
+        cached=False,
+    )
+
+
+def test_store_set_get(tmp_path: Path):
+    store = DiskCacheStore(tmp_path, max_bytes=1024 * 1024)
+    store.set("key", get_result("SELECT 1"))
+
+    assert store.get("key") == get_result("SELECT 1").model_dump(mode="json")
+    assert store.get("missing", None) is None
+
+
+def test_store_evicts_least_recently_used(tmp_path: Path):
+    store = DiskCacheStore(tmp_path, max_bytes=1024 * 1024)
+    store.set("a", get_result("SELECT 1"))
+    store.set("b", get_result("SELECT 2"))
+    os.utime(tmp_path / "a.json", (0, 0))
+    os.utime(tmp_path / "b.json", (1, 1))
+    store.get("a")
+
+    store.max_bytes = (tmp_path / "a.json").stat().st_size * 2
+    store.set("c", get_result("SELECT 3"))
+
+    assert store.get("a") is not None
+    assert store.get("b") is None
+    assert store.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_read_through_then_replay(tmp_path: Path):
+    model_client = ReplayChatCompletionClient(["SELECT 1"])
+    recorder = ChatCompletionCache(model_client, DiskCacheStore(tmp_path, 1024 * 1024))
+    recorded = await recorder.create(MESSAGES)
+    assert recorded.content == "SELECT 1"
+
+    replay = ChatCompletionCache(
+        ReplayOnlyClient(ReplayChatCompletionClient([])),
+        DiskCacheStore(tmp_path, 1024 * 1024),
+    )
+    replayed = await replay.create(MESSAGES)
+    assert replayed.content == "SELECT 1"
+    assert replayed.cached
+
+    with pytest.raises(LLMCacheMissException):
+        await replay.create([UserMessage(content="Something else", source="user")])
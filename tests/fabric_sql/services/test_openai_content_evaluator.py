@@ -1,6 +1,7 @@
 from unittest.mock import MagicMock
 
 import pytest
+from openai.types.chat import ChatCompletionChunk
 
 from fabric_sql.services.openai_content_evaluator import (
     ContentSafeException,
@@ -74,3 +75,76 @@ async def test_content_safety_check_output():
 
     with pytest.raises(ContentSafeException):
         OpenAIContentEvaluator().content_safety_check(response=test_data)
+
+
+def get_chunk(content: str, severity: str = "safe") -> ChatCompletionChunk:
+    return ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "created": 0,
+            "model": "gpt-4",
+            "object": "chat.completion.chunk",
+            "choices": [
+                {
+                    "index": 0,
+                    "delta": {"content": content},
+                    "content_filter_results": {
+                        "hate": {"filtered": False, "severity": severity},
+                    },
+                }
+            ],
+        }
+    )
+
+
+def test_chunk_safety_check_threshold():
+    evaluator = OpenAIContentEvaluator()
+    evaluator.chunk_safety_check(get_chunk("a", "medium"), threshold="high")
+
+    with pytest.raises(ContentSafeException):
+        evaluator.chunk_safety_check(get_chunk("a", "medium"), threshold="medium")
+
+
+def test_chunk_safety_check_prompt():
+    chunk = ChatCompletionChunk.model_validate(
+        {
+            "id": "chunk",
+            "created": 0,
+            "model": "",
+            "object": "chat.completion.chunk",
+            "choices": [],
+            "prompt_filter_results": [
+                {
+                    "prompt_index": 0,
+                    "content_filter_results": {"jailbreak": {"detected": True}},
+                }
+            ],
+        }
+    )
+
+    with pytest.raises(ContentSafeException):
+        OpenAIContentEvaluator().chunk_safety_check(chunk)
+
+
+@pytest.mark.asyncio
+async def test_content_safety_stream_aborts_early():
+    produced: list[str] = []
+    closed = False
+
+    async def stream():
+        nonlocal closed
+        try:
+            for content, severity in [("a", "safe"), ("b", "high"), ("c", "safe")]:
+                produced.append(content)
+                yield get_chunk(content, severity)
+        finally:
+            closed = True
+
+    received: list[str] = []
+    with pytest.raises(ContentSafeException):
+        async for chunk in OpenAIContentEvaluator().content_safety_stream(stream()):  # type: ignore
+            received.append(chunk.choices[0].delta.content or "")
+
+    assert received == ["a"]
+    assert produced == ["a", "b"]
+    assert closed
@@ -0,0 +1,80 @@
+import datetime
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from asyncpg.types import Attribute, Type
+
+pa = pytest.importorskip("pyarrow")
+
+from fabric_sql.services.arrow_converter import ArrowConverter  # noqa: E402
+from fabric_sql.services.parquet_snapshot import (  # noqa: E402
+    read_parquet,
+    write_parquet,
+)
+
+
+async def batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+@pytest.mark.asyncio
+async def test_write_read_parquet(tmp_path: Path):
+    schema = pa.schema([("id", pa.int32()), ("name", pa.string())])
+    path = tmp_path / "public.test.parquet"
+
+    rows = await write_parquet(
+        batches(
+            pa.RecordBatch.from_pylist([{"id": 1, "name": "a"}], schema=schema),
+            pa.RecordBatch.from_pylist([{"id": 2, "name": None}], schema=schema),
+        ),
+        path,
+    )
+
+    assert rows == 2
+    assert list(read_parquet(path)) == [(["id", "name"], [(1, "a"), (2, None)])]
+
+
+@pytest.mark.asyncio
+async def test_write_parquet_empty(tmp_path: Path):
+    path = tmp_path / "public.test.parquet"
+
+    assert await write_parquet(batches(), path) == 0
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_round_trip(tmp_path: Path):
+    columns = {
+        "amount": "numeric",
+        "amounts": "_numeric",
+        "tags": "_text",
+        "key": "uuid",
+        "keys": "_uuid",
+        "period": "interval",
+    }
+    converter = ArrowConverter(
+        [
+            Attribute(name, Type(oid=0, name=t, kind="scalar", schema="pg_catalog"))
+            for name, t in columns.items()
+        ]
+    )
+    # the values asyncpg decodes, the load must COPY the same values.
+    rows = [
+        (
+            Decimal("0.1"),
+            [Decimal("12345678901234567890.123456789"), None],
+            ["a", "b"],
+            uuid.uuid4(),
+            [uuid.uuid4()],
+            datetime.timedelta(days=30, microseconds=1),
+        ),
+        (None, None, [], None, None, None),
+    ]
+    path = tmp_path / "public.test.parquet"
+
+    await write_parquet(batches(converter.to_record_batch(rows)), path)
+
+    assert list(read_parquet(path)) == [(list(columns), rows)]
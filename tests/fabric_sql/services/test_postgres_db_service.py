@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from unittest import mock
 
@@ -5,7 +6,20 @@ import pytest
 import pytest_asyncio
 from pytest_mock import MockerFixture
 
-from fabric_sql.services.postgres_db_service import PostgresDBService
+from fabric_sql.protocols.i_postgres_db_service import QueryException
+from fabric_sql.services.postgres_db_service import DatabaseEnv, PostgresDBService
+from fabric_sql.services.query_metrics import QueryMetrics, QueryMetricsEnv
+
+
+def get_env(**kwargs) -> DatabaseEnv:
+    return DatabaseEnv(
+        postgres_host="localhost",
+        postgres_port=5432,
+        postgres_database="test",
+        postgres_password="password",
+        postgres_username="user",
+        **kwargs,
+    )
 
 
 @pytest_asyncio.fixture
@@ -22,6 +36,7 @@ async def mock_service(mocker: MockerFixture) -> PostgresDBService:
     )
     mocker.patch(
         "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(),
     )
 
     # Create an instance of PostgresDBService
@@ -58,7 +73,7 @@ async def test_postgres_db_service_default_cred(mocker: MockerFixture):
         side_effect=mock_create_pool,
     )
     mocker.patch(
-        "fabric_sql.services.postgres_db_service.DefaultAzureCredential",
+        "azure.identity.DefaultAzureCredential",
         return_value=mock_credential,
     )
 
@@ -68,6 +83,8 @@ async def test_postgres_db_service_default_cred(mocker: MockerFixture):
     mock_env.postgres_port = 5432
     mock_env.postgres_database = "test"
     mock_env.postgres_username = "user"
+    mock_env.postgres_pool_size = 10
+    mock_env.postgres_read_pool_size = 0
 
     mocker.patch(
         "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
@@ -175,6 +192,9 @@ async def test_execute_error(mock_service: PostgresDBService, mocker: MockerFixt
 
     # Should not raise an exception, just print the error
     await mock_service.execute(command)
+    # a write that must not be lost raises instead.
+    with pytest.raises(QueryException, match="Execute failed"):
+        await mock_service.execute(command, raise_errors=True)
 
 
 @pytest.mark.asyncio
@@ -192,6 +212,7 @@ async def test_async_context_manager(mocker: MockerFixture):
     )
     mocker.patch(
         "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(),
     )
 
     # Test async context manager
@@ -223,6 +244,7 @@ async def test_query_no_pool(mocker: MockerFixture):
     # Mock get_env but don't create pool
     mocker.patch(
         "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(),
     )
 
     # Mock _ensure_pool to not actually create a pool
@@ -243,6 +265,7 @@ async def test_execute_no_pool(mocker: MockerFixture):
     # Mock get_env but don't create pool
     mocker.patch(
         "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(),
     )
 
     # Mock _ensure_pool to not actually create a pool
@@ -278,3 +301,455 @@ async def test_show_view_definition(
 
     mock_service.query.assert_called_once()
     assert result == mock_rows
+
+
+@pytest.mark.asyncio
+async def test_fetch_error(mock_service: PostgresDBService):
+    mock_conn = mock.AsyncMock()
+    mock_conn.fetch.side_effect = Exception("relation does not exist")
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    with pytest.raises(QueryException, match="relation does not exist"):
+        await mock_service.fetch("SELECT * FROM test_table")
+
+
+@pytest.mark.asyncio
+async def test_fetch_no_pool(mocker: MockerFixture):
+    db_service = PostgresDBService()
+    mocker.patch.object(db_service, "_ensure_pool")
+
+    with pytest.raises(QueryException):
+        await db_service.fetch("SELECT 1")
+
+
+@pytest.mark.asyncio
+async def test_async_context_manager_nested(mocker: MockerFixture):
+    """The pool is shared by nested users and closed when the last one exits."""
+    mock_pool = mock.AsyncMock()
+
+    async def mock_create_pool(**kwargs):
+        return mock_pool
+
+    create_pool = mocker.patch(
+        "fabric_sql.services.postgres_db_service.asyncpg.create_pool",
+        side_effect=mock_create_pool,
+    )
+    mocker.patch(
+        "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(),
+    )
+
+    db_service = PostgresDBService()
+    async with db_service:
+        async with db_service:
+            pass
+        assert db_service._pool is mock_pool
+
+    assert db_service._pool is None
+    create_pool.assert_called_once()
+    mock_pool.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_batches(mock_service: PostgresDBService):
+    mock_cursor = mock.AsyncMock()
+    mock_cursor.fetch = mock.AsyncMock(
+        side_effect=[[{"id": 1}, {"id": 2}], [{"id": 3}], []]
+    )
+    mock_conn = mock.MagicMock()
+    mock_conn.cursor = mock.AsyncMock(return_value=mock_cursor)
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    batches = [b async for b in mock_service.fetch_batches("SELECT id FROM t", 2)]
+
+    mock_conn.cursor.assert_awaited_once_with("SELECT id FROM t")
+    mock_cursor.fetch.assert_awaited_with(2)
+    assert batches == [[{"id": "1"}, {"id": "2"}], [{"id": "3"}]]
+
+
+@pytest.mark.asyncio
+async def test_fetch_batches_error(mock_service: PostgresDBService):
+    mock_conn = mock.MagicMock()
+    mock_conn.cursor = mock.AsyncMock(side_effect=Exception("syntax error"))
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    with pytest.raises(QueryException, match="syntax error"):
+        async for _ in mock_service.fetch_batches("SELEC 1"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_fetch_batches_statement_timeout(mock_service: PostgresDBService):
+    mock_cursor = mock.AsyncMock()
+    mock_cursor.fetch = mock.AsyncMock(return_value=[])
+    mock_conn = mock.MagicMock()
+    mock_conn.execute = mock.AsyncMock()
+    mock_conn.cursor = mock.AsyncMock(return_value=mock_cursor)
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    async for _ in mock_service.fetch_batches("SELECT 1", statement_timeout_ms=500):
+        pass
+
+    mock_conn.execute.assert_awaited_once_with(
+        "SELECT set_config('statement_timeout', $1, true);", "500"
+    )
+
+
+@pytest.mark.asyncio
+async def test_fetch_batches_snapshot(mock_service: PostgresDBService):
+    mock_cursor = mock.AsyncMock()
+    mock_cursor.fetch = mock.AsyncMock(return_value=[])
+    mock_conn = mock.MagicMock()
+    mock_conn.execute = mock.AsyncMock()
+    mock_conn.cursor = mock.AsyncMock(return_value=mock_cursor)
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    async for _ in mock_service.fetch_batches(
+        "SELECT 1", snapshot="00000003-0000001B-1", statement_timeout_ms=500
+    ):
+        pass
+
+    mock_conn.transaction.assert_called_once_with(
+        isolation="repeatable_read", readonly=True
+    )
+    # the snapshot is imported before any other statement of the transaction.
+    assert mock_conn.execute.await_args_list[0] == mock.call(
+        "SET TRANSACTION SNAPSHOT '00000003-0000001B-1';"
+    )
+
+    with pytest.raises(QueryException):
+        async for _ in mock_service.fetch_batches("SELECT 1", snapshot="1'; DROP"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_exported_snapshot(mock_service: PostgresDBService):
+    mock_conn = mock.MagicMock()
+    mock_conn.fetchval = mock.AsyncMock(return_value="00000003-0000001B-1")
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    async with mock_service.exported_snapshot() as snapshot:
+        assert snapshot == "00000003-0000001B-1"
+        mock_conn.transaction.assert_called_once_with(
+            isolation="repeatable_read", readonly=True
+        )
+        # the coordinator transaction stays open while the snapshot is in use.
+        mock_conn.transaction.return_value.__aexit__.assert_not_called()
+
+    mock_conn.fetchval.assert_awaited_once_with("SELECT pg_export_snapshot();")
+    mock_conn.transaction.return_value.__aexit__.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_explain(mock_service: PostgresDBService):
+    mock_service.fetch = mock.AsyncMock(
+        return_value=[
+            {"QUERY PLAN": '[{"Plan": {"Total Cost": 12.5, "Plan Rows": 42}}]'}
+        ]
+    )
+
+    plan = await mock_service.explain("SELECT * FROM t;")
+
+    mock_service.fetch.assert_awaited_once_with("EXPLAIN (FORMAT JSON) SELECT * FROM t")
+    assert plan.total_cost == 12.5
+    assert plan.plan_rows == 42
+
+
+@pytest.mark.asyncio
+async def test_read_pool(mocker: MockerFixture):
+    write_pool, read_pool = mock.AsyncMock(), mock.AsyncMock()
+
+    async def mock_create_pool(**kwargs):
+        return read_pool if kwargs["host"] == "replica" else write_pool
+
+    create_pool = mocker.patch(
+        "fabric_sql.services.postgres_db_service.asyncpg.create_pool",
+        side_effect=mock_create_pool,
+    )
+    mocker.patch(
+        "fabric_sql.services.postgres_db_service.PostgresDBService.get_env",
+        return_value=get_env(postgres_read_pool_size=3, postgres_read_host="replica"),
+    )
+
+    async with PostgresDBService() as db_service:
+        assert db_service._get_pool("read") is read_pool
+        assert db_service._get_pool("write") is write_pool
+
+    read_kwargs = create_pool.call_args_list[0].kwargs
+    assert read_kwargs["max_size"] == 3
+    assert read_kwargs["server_settings"]["default_transaction_read_only"] == "on"
+    read_pool.close.assert_awaited_once()
+    write_pool.close.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_read_pool_shared(mock_service: PostgresDBService):
+    assert mock_service._get_pool("read") is mock_service._pool
+
+
+def get_cursor_pool(rows: list[dict]) -> tuple[mock.MagicMock, mock.MagicMock]:
+    remaining = list(rows)
+
+    async def fetch(n: int) -> list[dict]:
+        page = remaining[:n]
+        del remaining[:n]
+        return page
+
+    mock_cursor = mock.MagicMock()
+    mock_cursor.fetch = mock.AsyncMock(side_effect=fetch)
+    mock_conn = mock.MagicMock()
+    mock_conn.transaction.return_value = mock.AsyncMock()
+    mock_conn.cursor = mock.AsyncMock(return_value=mock_cursor)
+    mock_pool = mock.MagicMock()
+    mock_pool.acquire = mock.AsyncMock(return_value=mock_conn)
+    mock_pool.release = mock.AsyncMock()
+    mock_pool.close = mock.AsyncMock()
+    return mock_pool, mock_conn
+
+
+@pytest.mark.asyncio
+async def test_fetch_page(mock_service: PostgresDBService):
+    mock_pool, mock_conn = get_cursor_pool([{"id": i} for i in range(5)])
+    mock_service._pool = mock_pool
+
+    first = await mock_service.fetch_page("SELECT id FROM t", page_size=2)
+    assert first.rows == [{"id": "0"}, {"id": "1"}]
+    assert first.cursor
+
+    second = await mock_service.fetch_next_page(first.cursor, page_size=2)
+    assert second.rows == [{"id": "2"}, {"id": "3"}]
+    assert second.cursor == first.cursor
+    mock_pool.release.assert_not_awaited()
+
+    last = await mock_service.fetch_next_page(first.cursor, page_size=2)
+    assert last.rows == [{"id": "4"}]
+    assert last.cursor is None
+
+    # the query was executed once, the connection is released after the last page.
+    mock_conn.cursor.assert_awaited_once_with("SELECT id FROM t")
+    mock_pool.release.assert_awaited_once_with(mock_conn)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_single(mock_service: PostgresDBService):
+    mock_pool, mock_conn = get_cursor_pool([{"id": 1}, {"id": 2}])
+    mock_service._pool = mock_pool
+
+    page = await mock_service.fetch_page("SELECT id FROM t", page_size=2)
+
+    assert page.cursor is None
+    mock_pool.release.assert_awaited_once_with(mock_conn)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_cancelled(mock_service: PostgresDBService):
+    mock_pool, mock_conn = get_cursor_pool([{"id": i} for i in range(5)])
+    mock_service._pool = mock_pool
+    mock_conn.cursor.side_effect = asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        await mock_service.fetch_page("SELECT id FROM t", page_size=2)
+
+    mock_conn.transaction.return_value.rollback.assert_awaited_once()
+    mock_pool.release.assert_awaited_once_with(mock_conn)
+
+
+@pytest.mark.asyncio
+async def test_fetch_next_page_cancelled(mock_service: PostgresDBService):
+    mock_pool, mock_conn = get_cursor_pool([{"id": i} for i in range(5)])
+    mock_service._pool = mock_pool
+    first = await mock_service.fetch_page("SELECT id FROM t", page_size=2)
+    mock_conn.cursor.return_value.fetch.side_effect = asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        await mock_service.fetch_next_page(first.cursor, page_size=2)  # type: ignore
+
+    # the cursor was popped before the fetch, its connection is released.
+    assert not mock_service._cursors
+    mock_pool.release.assert_awaited_once_with(mock_conn)
+
+
+@pytest.mark.asyncio
+async def test_fetch_next_page_unknown(mock_service: PostgresDBService):
+    with pytest.raises(QueryException, match="unknown or expired"):
+        await mock_service.fetch_next_page("missing")
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_max_open_cursors(
+    mock_service: PostgresDBService, mocker: MockerFixture
+):
+    mocker.patch.object(
+        mock_service, "get_env", return_value=get_env(postgres_max_open_cursors=2)
+    )
+    mock_pool, _ = get_cursor_pool([{"id": i} for i in range(100)])
+    mock_service._pool = mock_pool
+
+    cursors = [
+        (await mock_service.fetch_page("SELECT 1", page_size=1)).cursor
+        for _ in range(3)
+    ]
+
+    # the least recently used cursor was released to bound the pinned connections.
+    assert list(mock_service._cursors) == cursors[1:]
+    with pytest.raises(QueryException):
+        await mock_service.fetch_next_page(cursors[0])  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_metrics(mock_service: PostgresDBService):
+    mock_service._metrics = QueryMetrics(QueryMetricsEnv(postgres_metrics=True))
+    mock_pool, mock_conn = get_cursor_pool([{"id": i} for i in range(3)])
+    mock_service._pool = mock_pool
+
+    first = await mock_service.fetch_page("SELECT id FROM t WHERE id > 1", 2)
+    await mock_service.fetch_next_page(first.cursor, 2)  # type: ignore
+    mock_conn.cursor.side_effect = Exception("syntax error")
+    with pytest.raises(QueryException):
+        await mock_service.fetch_page("SELECT id FROM t WHERE id > 1", 2)
+
+    # every page counts as an execution of the query.
+    [stats] = mock_service.query_metrics()
+    assert stats.fingerprint == "select id from t where id > ?"
+    assert (stats.calls, stats.rows, stats.errors) == (3, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_close_releases_cursors(mock_service: PostgresDBService):
+    mock_pool, mock_conn = get_cursor_pool([{"id": i} for i in range(5)])
+    mock_service._pool = mock_pool
+    await mock_service.fetch_page("SELECT id FROM t", page_size=2)
+
+    await mock_service.close()
+
+    assert mock_service._cursors == {}
+    mock_pool.release.assert_awaited_once_with(mock_conn)
+
+
+@pytest.mark.asyncio
+async def test_query_arrow(mock_service: PostgresDBService):
+    pytest.importorskip("pyarrow")
+    from asyncpg.types import Attribute, Type
+
+    mock_cursor = mock.AsyncMock()
+    mock_cursor.fetch = mock.AsyncMock(
+        side_effect=[[(1, "a"), (2, "b")], [(3, "c")], []]
+    )
+    mock_statement = mock.MagicMock()
+    mock_statement.get_attributes.return_value = [
+        Attribute("id", Type(0, "int4", "scalar", "pg_catalog")),
+        Attribute("name", Type(0, "text", "scalar", "pg_catalog")),
+    ]
+    mock_statement.cursor = mock.AsyncMock(return_value=mock_cursor)
+    mock_conn = mock.MagicMock()
+    mock_conn.prepare = mock.AsyncMock(return_value=mock_statement)
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    batches = [b async for b in mock_service.query_arrow("SELECT id, name FROM t", 2)]
+
+    mock_conn.prepare.assert_awaited_once_with("SELECT id, name FROM t")
+    assert [b.num_rows for b in batches] == [2, 1]
+    assert batches[0].column("id").to_pylist() == [1, 2]
+    assert batches[1].column("name").to_pylist() == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_query_arrow_error(mock_service: PostgresDBService):
+    pytest.importorskip("pyarrow")
+    mock_conn = mock.MagicMock()
+    mock_conn.prepare = mock.AsyncMock(side_effect=Exception("syntax error"))
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    with pytest.raises(QueryException, match="syntax error"):
+        async for _ in mock_service.query_arrow("SELEC 1"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_copy_records(mock_service: PostgresDBService):
+    mock_conn = mock.AsyncMock()
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    await mock_service.copy_records("public", "t", ["id"], [(1,), (2,)])
+
+    mock_conn.copy_records_to_table.assert_awaited_once_with(
+        "t", records=[(1,), (2,)], columns=["id"], schema_name="public"
+    )
+
+
+@pytest.mark.asyncio
+async def test_query_metrics(mock_service: PostgresDBService):
+    mock_service._metrics = QueryMetrics(QueryMetricsEnv(postgres_metrics=True))
+    mock_conn = mock.MagicMock()
+    mock_conn.fetch = mock.AsyncMock(return_value=[{"id": 1}, {"id": 2}])
+    mock_conn.execute = mock.AsyncMock(side_effect=["INSERT 0 3", Exception("boom")])
+
+    @asynccontextmanager
+    async def mock_acquire():
+        yield mock_conn
+
+    mock_service._pool = mock.AsyncMock()
+    mock_service._pool.acquire = mock_acquire
+
+    await mock_service.fetch("SELECT id FROM t WHERE id > 1")
+    await mock_service.execute("INSERT INTO t VALUES (1), (2), (3)")
+    await mock_service.execute("INSERT INTO t VALUES (4)")
+
+    stats = {s.fingerprint: s for s in mock_service.query_metrics()}
+    assert stats["select id from t where id > ?"].rows == 2
+    insert = stats["insert into t values (?)"]
+    assert (insert.calls, insert.rows, insert.errors) == (2, 3, 1)
@@ -0,0 +1,80 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from fabric_sql.protocols.i_postgres_db_service import (
+    IPostgresDBService,
+    QueryPage,
+    QueryPlan,
+)
+from fabric_sql.protocols.i_query_guard import QueryRejectedException
+from fabric_sql.services.query_guard import QueryGuard, QueryGuardEnv
+
+
+def get_guard() -> QueryGuard:
+    return QueryGuard(
+        env=QueryGuardEnv(
+            query_max_cost=1000,
+            query_max_plan_rows=500,
+            query_statement_timeout_ms=5000,
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_guard_accept():
+    mock_db = MagicMock(spec=IPostgresDBService)
+    mock_db.explain = AsyncMock(return_value=QueryPlan(total_cost=10, plan_rows=10))
+
+    query = "SELECT id FROM t LIMIT 10;"
+    assert await get_guard().guard(mock_db, query) == query
+    mock_db.explain.assert_awaited_once_with(query)
+
+
+@pytest.mark.asyncio
+async def test_guard_reject():
+    mock_db = MagicMock(spec=IPostgresDBService)
+    mock_db.explain = AsyncMock(return_value=QueryPlan(total_cost=5000, plan_rows=10))
+
+    with pytest.raises(QueryRejectedException, match="estimated cost 5000"):
+        await get_guard().guard(mock_db, "SELECT * FROM a, b")
+
+
+@pytest.mark.asyncio
+async def test_guard_reject_rows():
+    mock_db = MagicMock(spec=IPostgresDBService)
+    mock_db.explain = AsyncMock(return_value=QueryPlan(total_cost=50, plan_rows=10_000))
+
+    # the query is not rewritten, a subquery would lose the ORDER BY guarantee.
+    with pytest.raises(QueryRejectedException, match="estimated 10000 rows exceed 500"):
+        await get_guard().guard(mock_db, "SELECT id FROM t ORDER BY id;")
+    mock_db.explain.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_fetch_batches():
+    async def batches(*args, **kwargs):
+        yield [{"id": "1"}]
+
+    mock_db = MagicMock(spec=IPostgresDBService)
+    mock_db.explain = AsyncMock(return_value=QueryPlan(total_cost=10, plan_rows=10))
+    mock_db.fetch_batches = MagicMock(side_effect=batches)
+
+    result = [b async for b in get_guard().fetch_batches(mock_db, "SELECT 1")]
+
+    assert result == [[{"id": "1"}]]
+    mock_db.fetch_batches.assert_called_once_with("SELECT 1", statement_timeout_ms=5000)
+
+
+@pytest.mark.asyncio
+async def test_fetch_page():
+    mock_db = MagicMock(spec=IPostgresDBService)
+    mock_db.explain = AsyncMock(return_value=QueryPlan(total_cost=10, plan_rows=10))
+    mock_db.fetch_page = AsyncMock(return_value=QueryPage(rows=[{"id": "1"}]))
+
+    page = await get_guard().fetch_page(mock_db, "SELECT 1", 50)
+
+    assert page.rows == [{"id": "1"}]
+    mock_db.fetch_page.assert_awaited_once_with(
+        "SELECT 1", 50, statement_timeout_ms=5000
+    )
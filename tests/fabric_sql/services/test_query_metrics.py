@@ -0,0 +1,79 @@
+import logging
+
+from fabric_sql.services import query_metrics
+from fabric_sql.services.query_metrics import (
+    NULL_TIMER,
+    QueryMetrics,
+    QueryMetricsEnv,
+    fingerprint_query,
+)
+
+
+def test_fingerprint_query():
+    assert (
+        fingerprint_query(
+            "SELECT * FROM orders -- recent\nWHERE id = 42 AND name = 'O''Brien';"
+        )
+        == "select * from orders where id = ? and name = ?"
+    )
+    # batch inserts of one table share a fingerprint, whatever the batch size.
+    assert fingerprint_query(
+        "INSERT INTO public.t (a, b) VALUES (1, 'x'), (NULL, 'y');"
+    ) == fingerprint_query("INSERT INTO public.t (a, b) VALUES (2, 'z');")
+    assert fingerprint_query("SELECT c1 FROM events_2024") == (
+        "select c1 from events_2024"
+    )
+
+
+def test_disabled():
+    metrics = QueryMetrics(QueryMetricsEnv())
+
+    assert metrics.start("SELECT 1") is NULL_TIMER
+    assert metrics.snapshot() == []
+
+
+def test_record():
+    metrics = QueryMetrics(QueryMetricsEnv(postgres_metrics=True))
+
+    metrics.record("SELECT 1", 3.0, 1.0, 1, False)
+    metrics.record("SELECT 2", 40.0, 0.0, 1, False)
+    metrics.record("SELECT 3", 20000.0, 5.0, 0, True)
+
+    [stats] = metrics.snapshot()
+    assert stats.fingerprint == "select ?"
+    assert (stats.calls, stats.errors, stats.rows) == (3, 1, 2)
+    assert stats.max_ms == 20000.0
+    assert stats.acquire_wait_ms == 6.0
+    assert stats.buckets[1] == 1 and stats.buckets[4] == 1 and stats.buckets[-1] == 1
+    assert stats.percentile_ms(50) == 50.0
+    assert stats.percentile_ms(100) == 20000.0
+
+    metrics.reset()
+    assert metrics.snapshot() == []
+
+
+def test_max_fingerprints(monkeypatch):
+    monkeypatch.setattr(query_metrics, "MAX_FINGERPRINTS", 2)
+    metrics = QueryMetrics(QueryMetricsEnv(postgres_metrics=True))
+
+    for table in ("a", "b", "c", "d"):
+        metrics.record(f"SELECT * FROM {table}", 1.0, 0.0, 0, False)
+
+    assert sorted(s.fingerprint for s in metrics.snapshot()) == [
+        "<other>",
+        "select * from a",
+        "select * from b",
+    ]
+
+
+def test_slow_query_log(caplog):
+    metrics = QueryMetrics(QueryMetricsEnv(postgres_slow_query_ms=100))
+
+    with caplog.at_level(logging.WARNING):
+        metrics.start("SELECT * FROM t WHERE id = 7").stop()
+        metrics.record("SELECT * FROM t WHERE id = 7", 250.0, 0.0, 1, False)
+
+    assert len(caplog.records) == 1
+    assert "select * from t where id = ?" in caplog.text
+    # slow query logging alone records no metrics.
+    assert metrics.snapshot() == []
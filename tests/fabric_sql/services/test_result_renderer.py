@@ -0,0 +1,131 @@
+import os
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+import pytest
+
+from fabric_sql.services.result_renderer import ResultRenderer, ResultRendererEnv
+from fabric_sql.services.sql_validator import SQLValidatorEnv
+
+
+async def to_batches(
+    rows: list[dict[str, Any]], batch_size: int = 2
+) -> AsyncIterator[list[dict[str, Any]]]:
+    for i in range(0, len(rows), batch_size):
+        yield rows[i : i + batch_size]
+
+
+def get_rows(count: int) -> list[dict[str, Any]]:
+    return [{"id": str(i), "name": f"name {i}"} for i in range(count)]
+
+
+@pytest.mark.asyncio
+async def test_render_markdown():
+    renderer = ResultRenderer(env=ResultRendererEnv())
+    result = await renderer.render(to_batches([{"id": "1", "name": "a|b"}]))
+
+    assert result == "| id | name |\n| --- | --- |\n| 1 | a\\|b |"
+
+
+@pytest.mark.asyncio
+async def test_render_csv():
+    renderer = ResultRenderer(env=ResultRendererEnv(result_format="csv"))
+    result = await renderer.render(to_batches([{"id": "1", "name": "a,b"}]))
+
+    assert result == 'id,name\n1,"a,b"'
+
+
+@pytest.mark.asyncio
+async def test_render_no_rows():
+    renderer = ResultRenderer(env=ResultRendererEnv())
+    assert await renderer.render(to_batches([])) == "No rows returned."
+
+
+@pytest.mark.asyncio
+async def test_render_truncate_cell():
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(result_format="csv", result_max_cell_chars=5)
+    )
+    result = await renderer.render(to_batches([{"name": "abcdefgh"}]))
+
+    assert result == "name\nab..."
+
+
+@pytest.mark.asyncio
+async def test_render_max_rows():
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(result_format="csv", result_max_rows=2)
+    )
+    result = await renderer.render(to_batches(get_rows(5)))
+
+    assert result.splitlines() == [
+        "id,name",
+        "0,name 0",
+        "1,name 1",
+        "(3 more rows omitted)",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_render_max_bytes():
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(result_format="csv", result_max_bytes=20)
+    )
+    result = await renderer.render(to_batches(get_rows(5)))
+
+    assert result.splitlines() == ["id,name", "0,name 0", "(4 more rows omitted)"]
+
+
+@pytest.mark.asyncio
+async def test_render_max_fetch_rows():
+    fetched: list[int] = []
+
+    async def batches() -> AsyncIterator[list[dict[str, Any]]]:
+        for row in get_rows(100):
+            fetched.append(1)
+            yield [row]
+
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(result_max_rows=2),
+        validator_env=SQLValidatorEnv(sql_max_rows=10),
+    )
+    result = await renderer.render(batches())
+
+    assert result.endswith("(at least 8 more rows omitted)")
+    assert len(fetched) == 10
+
+
+@pytest.mark.asyncio
+async def test_render_spill(tmp_path: Path):
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(result_max_rows=2, result_spill_dir=str(tmp_path))
+    )
+    result = await renderer.render(to_batches(get_rows(5)))
+
+    spill_files = os.listdir(tmp_path)
+    assert len(spill_files) == 1
+    assert f"full result written to {tmp_path / spill_files[0]}" in result
+    assert (tmp_path / spill_files[0]).read_text().splitlines()[-1] == "4,name 4"
+
+
+@pytest.mark.asyncio
+async def test_render_spill_not_needed(tmp_path: Path):
+    renderer = ResultRenderer(env=ResultRendererEnv(result_spill_dir=str(tmp_path)))
+    await renderer.render(to_batches(get_rows(5)))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_render_page(tmp_path: Path):
+    renderer = ResultRenderer(
+        env=ResultRendererEnv(
+            result_max_rows=2, result_max_bytes=50, result_spill_dir=str(tmp_path)
+        )
+    )
+    result = renderer.render_page(get_rows(5))
+
+    # the caps do not drop rows of a page, they cannot be fetched again.
+    assert result.splitlines()[-1] == "| 4 | name 4 |"
+    assert len(result.splitlines()) == 7
+    assert not os.listdir(tmp_path)
+    assert renderer.render_page([]) == "No rows returned."
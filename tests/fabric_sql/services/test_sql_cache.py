@@ -0,0 +1,125 @@
+from pytest_mock import MockerFixture
+
+from fabric_sql.services.sql_cache import SQLCache, SQLCacheEnv, extract_entities
+
+
+def get_cache(**kwargs) -> SQLCache:
+    return SQLCache(env=SQLCacheEnv(**kwargs))
+
+
+def put(cache: SQLCache, question: str, sql: str, schema_fingerprint: str) -> None:
+    cache.propose(question, sql, schema_fingerprint)
+    cache.confirm(sql)
+
+
+def test_get_miss():
+    cache = get_cache()
+    assert cache.get("failed controls", "v1") is None
+
+    stats = cache.stats()
+    assert stats.misses == 1
+    assert stats.hit_rate == 0.0
+
+
+def test_get_normalized_hit():
+    cache = get_cache()
+    put(cache, "Failed controls for connection prod-1?", "SELECT 1", "v1")
+
+    assert cache.get("failed  controls for connection PROD-1", "v1") == "SELECT 1"
+
+    stats = cache.stats()
+    assert stats.hits == 1
+    assert stats.entries == 1
+    assert stats.hit_rate == 1.0
+
+
+def test_get_schema_changed():
+    cache = get_cache()
+    put(cache, "failed controls", "SELECT 1", "v1")
+
+    assert cache.get("failed controls", "v2") is None
+    assert cache.stats().evictions == 1
+    assert cache.stats().entries == 0
+
+
+def test_get_expired(mocker: MockerFixture):
+    mocked_time = mocker.patch("fabric_sql.services.sql_cache.time.monotonic")
+    mocked_time.return_value = 100.0
+
+    cache = get_cache(sql_cache_ttl_seconds=10)
+    put(cache, "failed controls", "SELECT 1", "v1")
+
+    mocked_time.return_value = 111.0
+    assert cache.get("failed controls", "v1") is None
+    assert cache.stats().evictions == 1
+
+
+def test_put_evicts_least_recently_used():
+    cache = get_cache(sql_cache_max_entries=2)
+    put(cache, "question one", "SELECT 1", "v1")
+    put(cache, "question two", "SELECT 2", "v1")
+    cache.get("question one", "v1")
+    put(cache, "question three", "SELECT 3", "v1")
+
+    assert cache.get("question one", "v1") == "SELECT 1"
+    assert cache.get("question two", "v1") is None
+    assert cache.stats().evictions == 1
+
+
+def test_get_similar():
+    cache = get_cache(sql_cache_similarity_threshold=0.8)
+    put(cache, "show the failed controls for connection prod-1", "SELECT 1", "v1")
+
+    assert cache.get("show failed controls for connection prod-1", "v1") == "SELECT 1"
+    # same wording, different entity must not share the SQL.
+    assert cache.get("show the failed controls for connection prod-2", "v1") is None
+
+
+def test_get_similar_disabled():
+    cache = get_cache()
+    put(cache, "show the failed controls for connection prod-1", "SELECT 1", "v1")
+
+    assert cache.get("show failed controls for connection prod-1", "v1") is None
+
+
+def test_extract_entities():
+    assert extract_entities("controls for 'My Conn' and prod-eu-1 in 2024") == {
+        "my conn",
+        "prod-eu-1",
+        "2024",
+    }
+
+
+def test_stats_summary():
+    cache = get_cache()
+    put(cache, "failed controls", "SELECT 1", "v1")
+    cache.get("failed controls", "v1")
+    cache.get("passed controls", "v1")
+
+    assert cache.stats().summary() == (
+        "SQL cache: 1 hits, 1 misses (50%), 1 entries, 0 evictions"
+    )
+
+
+def test_propose_confirm():
+    cache = get_cache()
+    cache.propose("failed controls", "SELECT 1;", "v1")
+
+    # not served before it executed.
+    assert cache.get("failed controls", "v1") is None
+    cache.confirm("SELECT  1")
+    assert cache.get("failed controls", "v1") == "SELECT 1;"
+
+
+def test_reject():
+    cache = get_cache(sql_cache_similarity_threshold=0.8)
+    cache.propose("failed controls", "SELECT 1", "v1")
+    cache.reject("SELECT 1")
+    cache.confirm("SELECT 1")
+    assert cache.get("failed controls", "v1") is None
+
+    put(cache, "show the failed controls for connection prod-1", "SELECT 2", "v1")
+    assert cache.get("show failed controls for connection prod-1", "v1") == "SELECT 2"
+    # the SQL served for the similar question failed, the entry it came from goes.
+    cache.reject("SELECT 2")
+    assert cache.stats().entries == 0
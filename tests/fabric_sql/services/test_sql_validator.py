@@ -0,0 +1,182 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from fabric_sql.models.table_definition import TableDefinition
+from fabric_sql.models.view_definition import ViewDefinition
+from fabric_sql.protocols.i_database_definitions import IDatabaseDefinitions
+from fabric_sql.protocols.i_sql_validator import SQLValidationException
+from fabric_sql.services.sql_validator import (
+    SQLValidator,
+    SQLValidatorEnv,
+    validate_sql,
+)
+
+SCHEMA: dict[str, set[str] | None] = {
+    "public.v_compliance": {
+        "account_id",
+        "connection_name",
+        "framework_order",
+        "checked_at",
+    },
+    "public.v_frameworks": {"framework_name", "framework_order"},
+    "public.config": None,
+}
+
+
+def validate(query: str, max_rows: int = 100) -> str:
+    return validate_sql(query, SCHEMA, max_rows).sql
+
+
+def test_canonical_form():
+    first = validate_sql(
+        "select account_id,connection_name -- ids\n"
+        "from V_COMPLIANCE where connection_name ilike 'Prod%' limit 10;",
+        SCHEMA,
+        100,
+    )
+    second = validate_sql(
+        "SELECT  account_id, connection_name\nFROM v_compliance\n"
+        "WHERE connection_name ILIKE 'Prod%' /* prod only */ LIMIT 10",
+        SCHEMA,
+        100,
+    )
+
+    assert first.sql == (
+        "SELECT account_id, connection_name FROM v_compliance "
+        "WHERE connection_name ILIKE 'Prod%' LIMIT 10"
+    )
+    assert second == first
+    assert first.relations == ["public.v_compliance"]
+    assert first.limit == 10
+
+
+def test_limit_enforced():
+    assert validate("SELECT account_id FROM v_compliance").endswith(" LIMIT 100")
+    assert validate("SELECT account_id FROM v_compliance LIMIT 5000").endswith(
+        " LIMIT 100"
+    )
+    assert validate("SELECT account_id FROM v_compliance LIMIT ALL").endswith(
+        " LIMIT 100"
+    )
+    # the LIMIT of the subquery is not the one of the result.
+    assert validate(
+        "SELECT n FROM (SELECT count(*) n FROM v_compliance LIMIT 1) AS t"
+    ).endswith(") AS t LIMIT 100")
+    assert validate(
+        "SELECT account_id FROM v_compliance FETCH FIRST 500 ROWS ONLY"
+    ).endswith("FETCH FIRST 100 ROWS ONLY")
+
+    with pytest.raises(SQLValidationException, match="LIMIT"):
+        validate("SELECT account_id FROM v_compliance LIMIT $1")
+
+
+def test_references_resolved():
+    validate(
+        "WITH totals (name, n) AS ("
+        "  SELECT connection_name, count(*) FROM v_compliance GROUP BY 1"
+        ") "
+        "SELECT t.name, t.n, f.framework_name, c.account_id AS id, "
+        "  extract(year FROM now()) AS y, ts::timestamp with time zone "
+        "FROM totals t "
+        "JOIN public.v_compliance AS c ON c.connection_name = t.name "
+        "LEFT JOIN LATERAL (SELECT framework_name FROM v_frameworks "
+        "  WHERE framework_order = c.framework_order LIMIT 1) f ON true "
+        "CROSS JOIN generate_series(1, 3) AS ts "
+        "ORDER BY id, y"
+    )
+    # the columns of tables are not in the definitions, only the relation is checked.
+    validate("SELECT anything FROM config")
+
+
+@pytest.mark.parametrize(
+    "query, message",
+    [
+        ("SELECT account_id FROM v_missing", "Relation v_missing does not exist"),
+        ("SELECT owner FROM v_compliance", "Column owner does not exist"),
+        ("SELECT c.owner FROM v_compliance c", "its columns are: account_id"),
+        ("SELECT x.account_id FROM v_compliance c", "Missing FROM clause entry"),
+        ("DELETE FROM v_compliance", "read only"),
+        ("WITH d AS (DELETE FROM t RETURNING *) SELECT 1", "read only"),
+        ("SELECT 1; DROP TABLE config", "single SQL statement"),
+        ("SELECT 'open FROM v_compliance", "Unterminated string"),
+        ("SELECT count(account_id FROM v_compliance", "unbalanced parentheses"),
+        ("", "empty"),
+    ],
+)
+def test_rejected(query: str, message: str):
+    with pytest.raises(SQLValidationException, match=message):
+        validate(query)
+
+
+@pytest.mark.asyncio
+async def test_validate_uses_definitions():
+    db_definitions = MagicMock(spec=IDatabaseDefinitions)
+    db_definitions.get_table_definitions.return_value = [TableDefinition(name="config")]
+    db_definitions.get_view_definitions.return_value = [
+        ViewDefinition(name="v_compliance", description="", sql="")
+    ]
+    db_definitions.get_view_schemas = AsyncMock(
+        return_value={"public.v_compliance": [{"column_name": "account_id"}]}
+    )
+    validator = SQLValidator(db_definitions, SQLValidatorEnv(sql_max_rows=10))
+
+    result = await validator.validate("select account_id from v_compliance")
+    assert result.sql == "SELECT account_id FROM v_compliance LIMIT 10"
+    with pytest.raises(SQLValidationException):
+        await validator.validate("SELECT owner FROM v_compliance")
+    db_definitions.get_view_schemas.assert_awaited_once()
+
+    validator.env.sql_validation = False
+    result = await validator.validate("SELECT owner FROM v_compliance;")
+    assert result.sql == "SELECT owner FROM v_compliance"
+
+
+@pytest.mark.parametrize(
+    "condition, canonical",
+    [
+        ("connection_name ~* '^prod'", "connection_name ~* '^prod'"),
+        ("connection_name !~* '^prod'", "connection_name !~* '^prod'"),
+        ("framework_order << 2", "framework_order << 2"),
+        ("account_id ?| ARRAY['a']", "account_id ?| ARRAY['a']"),
+        # an operator does not end in - unless Postgres would read it that way.
+        ("framework_order=-1", "framework_order = - 1"),
+    ],
+)
+def test_operators_kept(condition: str, canonical: str):
+    sql = validate(f"SELECT account_id FROM v_compliance WHERE {condition}")
+    assert f"WHERE {canonical} LIMIT" in sql
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "SELECT account_id FROM v_compliance ORDER BY framework_order NULLS LAST",
+        "SELECT account_id FROM v_compliance c WHERE EXISTS "
+        "(SELECT 1 FROM v_frameworks f WHERE f.framework_order = c.framework_order)",
+        "SELECT account_id FROM v_compliance WHERE NOT EXISTS "
+        "(SELECT framework_name FROM v_frameworks)",
+        "SELECT account_id FROM v_compliance WHERE framework_order = "
+        "ANY(SELECT framework_order FROM v_frameworks)",
+        # EXTRACT fields, window names and whole-row references are not columns.
+        "SELECT account_id FROM v_compliance GROUP BY EXTRACT(DOW FROM checked_at)",
+        "SELECT account_id FROM v_compliance "
+        "WHERE EXTRACT(QUARTER FROM checked_at) = 1",
+        "SELECT account_id, rank() OVER w FROM v_compliance "
+        "WINDOW w AS (PARTITION BY connection_name ORDER BY framework_order)",
+        "SELECT account_id FROM v_compliance v "
+        "GROUP BY 1 HAVING json_agg(v) IS NOT NULL",
+        "SELECT account_id, row_to_json(v_compliance) FROM v_compliance",
+        "SELECT account_id FROM v_compliance WHERE connection_name = E'it\\'s'",
+    ],
+)
+def test_accepted(query: str):
+    assert validate(query).startswith("SELECT account_id")
+
+
+def test_escape_string():
+    # a backslash only escapes the quote in an E string.
+    with pytest.raises(SQLValidationException, match="Column oops does not exist"):
+        validate(
+            "SELECT account_id FROM v_compliance WHERE connection_name = 'a\\' OR oops"
+        )
@@ -0,0 +1,89 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from autogen_core.models import UserMessage
+from autogen_ext.models.cache import ChatCompletionCache
+from autogen_ext.models.replay import ReplayChatCompletionClient
+
+from fabric_sql.services.llm_cache import DiskCacheStore
+from fabric_sql.services.turn_tracer import TraceEnv, TurnTracer
+
+MESSAGES = [UserMessage(content="List the failed controls", source="user")]
+
+
+def get_tracer(tmp_path: Path) -> TurnTracer:
+    return TurnTracer(TraceEnv(chat_trace_file=str(tmp_path / "trace.jsonl")))
+
+
+def read_spans(tmp_path: Path) -> list[dict]:
+    lines = (tmp_path / "trace.jsonl").read_text().splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_disabled():
+    tracer = TurnTracer(TraceEnv())
+    client = ReplayChatCompletionClient(["SELECT 1"])
+
+    tracer.start_turn("question")
+    with tracer.span("run_query", "tool") as attributes:
+        attributes["rows"] = 1
+    tracer.end_turn()
+
+    assert not tracer.enabled
+    assert tracer.wrap_client(client, "agent") is client
+
+
+@pytest.mark.asyncio
+async def test_turn_spans(tmp_path: Path):
+    tracer = get_tracer(tmp_path)
+
+    tracer.start_turn("List the failed controls")
+    tracer.observe("compliance_agent")
+    tracer.observe("compliance_agent")
+    tracer.observe("db_query_agent")
+    with tracer.span("run_query", "tool"):
+        # statements run in tasks started by the tool are its children.
+        await asyncio.ensure_future(
+            asyncio.sleep(0, tracer.on_query("select ?", 12.0, 1.0, 3, False))
+        )
+    tracer.end_turn()
+
+    spans = {span["name"]: span for span in read_spans(tmp_path)}
+    turn = spans["turn"]
+    assert turn["parent"] is None
+    assert turn["attributes"] == {"task": "List the failed controls"}
+    assert spans["compliance_agent"]["kind"] == "agent"
+    assert spans["db_query_agent"]["parent"] == turn["id"]
+    assert spans["run_query"]["parent"] == turn["id"]
+    assert spans["query"]["parent"] == spans["run_query"]["id"]
+    assert spans["query"]["attributes"]["rows"] == 3
+
+    summary = tracer.summary()
+    assert "1 turns" in summary
+    assert "run_query" in summary
+
+
+@pytest.mark.asyncio
+async def test_tracing_client(tmp_path: Path):
+    tracer = get_tracer(tmp_path)
+    cached_client = ChatCompletionCache(
+        ReplayChatCompletionClient(["SELECT 1"]),
+        DiskCacheStore(tmp_path / "llm", max_bytes=1024 * 1024),
+    )
+    client = tracer.wrap_client(cached_client, "compliance_agent")
+
+    tracer.start_turn("question")
+    await client.create(MESSAGES)
+    # the same request again is served from the cache.
+    async for _ in client.create_stream(MESSAGES):
+        pass
+    tracer.end_turn()
+
+    calls = [span for span in read_spans(tmp_path) if span["kind"] == "llm"]
+    assert len(calls) == 2
+    assert calls[0]["attributes"]["prompt_tokens"] > 0
+    assert calls[1]["attributes"]["cached"] is True
+    assert "first_chunk_ms" in calls[1]["attributes"]
+    assert "compliance_agent" in tracer.summary()
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# modules that are slow to import and only needed by some of the entry points.
+HEAVY_MODULES = [
+    "autogen_agentchat",
+    "autogen_core",
+    "autogen_ext",
+    "azure.identity",
+    "dotenv",
+    "openai",
+    "tabulate",
+]
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess[str]:
+    # without the database or model variables, importing must not resolve any
+    # dependency from the container.
+    env = {k: v for k, v in os.environ.items() if not k.endswith(("_HOST", "_KEY"))}
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, env=env, check=True
+    )
+
+
+def get_loaded_modules(module: str) -> set[str]:
+    result = run_python(
+        "-c", f"import json, sys, {module}; print(json.dumps(list(sys.modules)))"
+    )
+    return set(json.loads(result.stdout))
+
+
+def test_copy_tables_skips_heavy_modules():
+    loaded = get_loaded_modules("scripts.copy_tables")
+    assert [m for m in HEAVY_MODULES if m in loaded] == []
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "applications.chat_app",
+        "applications.chat_server",
+        "applications.batch_questions",
+    ],
+)
+def test_import_does_not_resolve_dependencies(module: str):
+    loaded = get_loaded_modules(module)
+    assert "azure.identity" not in loaded
+    assert "dotenv" not in loaded